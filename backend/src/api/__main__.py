@@ -10,6 +10,8 @@ def main() -> None:
         host=API_HOST,
         port=API_PORT,
         reload=CONFIGURATION.is_development(),
+        # The app configures logging itself on startup
+        log_config=None,
     )
 
 
@@ -1,19 +1,36 @@
 from contextlib import asynccontextmanager
 
+import httpx
 from fastapi import FastAPI
 from typing import AsyncIterator
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import meta_router
-from .lib.consts import API_ORIGINS, API_PREFIX, RouterTag, ALL
+from database.db import init_db
+
+from .routers import meta_router, foods_router, logs_router
+from .lib.consts import API_ORIGINS, API_PREFIX, RouterTag, ALL, USDA_TIMEOUT_SECONDS, USDA_MAX_CONNECTIONS
+from .lib.usda import USDASearchProxy
+from .lib.metrics import MetricsMiddleware
+from ..configuration import CONFIGURATION
+from ..logger import setup_logging
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Set up in the lifespan rather than uvicorn's main process, so it also runs in reload workers
+    log_listener = setup_logging(CONFIGURATION.ENVIRONMENT, CONFIGURATION.LOG_FILE_PATH)
     try:
-        yield
+        init_db()
+        # One pooled client for the whole app, so USDA connections are reused across requests
+        async with httpx.AsyncClient(
+            base_url=CONFIGURATION.USDA_API_BASE_URL,
+            timeout=USDA_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=USDA_MAX_CONNECTIONS),
+        ) as usda_client:
+            app.state.usda_proxy = USDASearchProxy(usda_client, CONFIGURATION.USDA_API_KEY)
+            yield
     finally:
-        pass
+        log_listener.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -24,4 +41,7 @@ app.add_middleware(
     allow_methods=[ALL],
     allow_headers=[ALL]
 )
+app.add_middleware(MetricsMiddleware)
 app.include_router(meta_router, prefix=API_PREFIX, tags=[RouterTag.META])
+app.include_router(foods_router, prefix=API_PREFIX, tags=[RouterTag.FOODS])
+app.include_router(logs_router, prefix=API_PREFIX, tags=[RouterTag.LOGS])
@@ -3,6 +3,8 @@ from enum import StrEnum
 
 class RouterTag(StrEnum):
     META = "meta"
+    FOODS = "foods"
+    LOGS = "logs"
 
 
 API_APP_ENTRYPOINT = "src.api:app"
@@ -16,3 +18,27 @@ API_ORIGINS = [
 ]
 
 SESSION_MIDDLEWARE_SAME_SITE_STRICT = "strict"
+
+FOOD_SEARCH_DEFAULT_LIMIT = 20
+FOOD_SEARCH_MAX_LIMIT = 100
+FOOD_SEARCH_MAX_QUERY_LENGTH = 100
+
+MEAL_MAX_ENTRIES = 100
+LOG_PAGE_DEFAULT_LIMIT = 100
+LOG_PAGE_MAX_LIMIT = 500
+
+# Food details rarely change, and clients revalidate cheaply with If-None-Match once this expires
+FOOD_CACHE_CONTROL = "public, max-age=300"
+
+USDA_SEARCH_PATH = "/foods/search"
+USDA_SEARCH_DEFAULT_LIMIT = 25
+USDA_SEARCH_MAX_LIMIT = 50
+USDA_CACHE_SIZE = 1_024
+USDA_CACHE_TTL_SECONDS = 3_600
+USDA_TIMEOUT_SECONDS = 10
+USDA_MAX_CONNECTIONS = 20
+
+# Prometheus' default latency buckets, in seconds
+LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
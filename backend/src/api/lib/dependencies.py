@@ -0,0 +1,20 @@
+from typing import Annotated
+
+from fastapi import Depends, Request
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.db import get_db, get_async_db
+
+from .usda import USDASearchProxy
+
+
+DatabaseSession = Annotated[Session, Depends(get_db)]
+AsyncDatabaseSession = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+def get_usda_proxy(request: Request) -> USDASearchProxy:
+    return request.app.state.usda_proxy
+
+
+USDAProxy = Annotated[USDASearchProxy, Depends(get_usda_proxy)]
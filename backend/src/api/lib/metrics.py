@@ -0,0 +1,146 @@
+import time
+import bisect
+import logging
+import threading
+from collections import defaultdict
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database.instrumentation import track_queries
+
+from .consts import LATENCY_BUCKETS_SECONDS, UNMATCHED_ROUTE
+
+
+request_logger = logging.getLogger("api.requests")
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self._values: dict[Labels, float] = defaultdict(float)
+
+    def inc(self, labels: Labels, amount: float = 1.0) -> None:
+        self._values[labels] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(labels)} {value}" for labels, value in sorted(self._values.items()))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: tuple[float, ...]) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # Per label set: count in each bucket (non-cumulative, plus one for +Inf), sum, count
+        self._values: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        counts, total = self._values.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels((*labels, ('le', le)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Request and database metrics for the process, rendered in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "Time taken to handle HTTP requests.", LATENCY_BUCKETS_SECONDS
+        )
+        self.db_queries = Counter("http_request_db_queries_total", "SQL statements run while handling HTTP requests.")
+        self.db_seconds = Counter("http_request_db_seconds_total", "Time spent running SQL statements while handling HTTP requests.")
+        self.db_slow_queries = Counter("http_request_db_slow_queries_total", "SQL statements over the slow query threshold.")
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, db_queries: int, db_seconds: float, db_slow_queries: int) -> None:
+        labels = (("method", method), ("route", route))
+        with self._lock:
+            self.request_duration.observe((*labels, ("status", str(status))), seconds)
+            self.db_queries.inc(labels, db_queries)
+            self.db_seconds.inc(labels, db_seconds)
+            if db_slow_queries:
+                self.db_slow_queries.inc(labels, db_slow_queries)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = (self.request_duration, self.db_queries, self.db_seconds, self.db_slow_queries)
+            return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency and database work in METRICS and as a structured log event.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry = METRICS) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with track_queries() as queries:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                seconds = time.perf_counter() - started
+                # Label by route template rather than path, so IDs in paths don't explode the label count
+                route = scope.get("route")
+                route_path = route.path if route is not None else UNMATCHED_ROUTE
+                self.registry.observe_request(
+                    scope["method"], route_path, status, seconds, queries.count, queries.seconds, queries.slow
+                )
+                request_logger.info(
+                    "Request handled",
+                    extra={
+                        "method": scope["method"],
+                        "route": route_path,
+                        "status_code": status,
+                        "duration_ms": round(seconds * 1000, 3),
+                        "db_query_count": queries.count,
+                        "db_query_ms": round(queries.seconds * 1000, 3),
+                    },
+                )
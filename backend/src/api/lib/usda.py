@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+import httpx
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.cache import LRUCache, MISSING
+from database.db import AsyncSessionLocal
+from database.importer import parse_usda_api_food, load_micronutrients, write_batch
+
+from .consts import USDA_SEARCH_PATH, USDA_CACHE_SIZE, USDA_CACHE_TTL_SECONDS
+
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class USDANutrient:
+    name: str
+    value: float
+    unit: str
+
+
+@dataclass(frozen=True)
+class USDAFood:
+    fdc_id: int
+    food_id: int | None  # ID of the food written through to our catalogue, if it could be
+    description: str
+    brand_owner: str | None
+    food_category: str | None
+    nutrients: tuple[USDANutrient, ...]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key, so they share one call's result (or exception).
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Shielded so one caller disconnecting doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+
+def normalise_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class USDASearchProxy:
+    """
+    Searches FoodData Central on behalf of clients through one pooled HTTP client.
+
+    Results are cached by normalised query, identical searches in flight at the same time
+    share one upstream request, and the foods found are written through to the catalogue.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, api_key: str, session_factory=AsyncSessionLocal, cache: LRUCache | None = None):
+        self.client = client
+        self.api_key = api_key
+        self.session_factory = session_factory
+        self.cache = cache or LRUCache(USDA_CACHE_SIZE, USDA_CACHE_TTL_SECONDS)
+        self._flights = SingleFlight()
+
+    async def search(self, query: str, limit: int) -> tuple[USDAFood, ...]:
+        """
+        Search FoodData Central.
+
+        Raises:
+            UpstreamError: If the USDA API can't be reached or returns an error
+        """
+        key = (normalise_query(query), limit)
+        cached = self.cache.get(key)
+        if cached is not MISSING:
+            return cached
+        return await self._flights.do(key, lambda: self._fetch(*key))
+
+    async def _fetch(self, query: str, limit: int) -> tuple[USDAFood, ...]:
+        try:
+            response = await self.client.get(
+                USDA_SEARCH_PATH,
+                params={"query": query, "pageSize": limit, "api_key": self.api_key},
+            )
+            response.raise_for_status()
+            foods = response.json().get("foods") or []
+        except (httpx.HTTPError, ValueError) as e:
+            raise UpstreamError(f"USDA search failed: {e}") from e
+
+        food_ids = await self._write_through(foods)
+        results = tuple(
+            USDAFood(
+                fdc_id=food["fdcId"],
+                food_id=food_ids.get(food["fdcId"]),
+                description=food.get("description") or "",
+                brand_owner=food.get("brandOwner"),
+                food_category=food.get("foodCategory"),
+                nutrients=tuple(
+                    USDANutrient(nutrient["nutrientName"], nutrient["value"], nutrient.get("unitName") or "")
+                    for nutrient in food.get("foodNutrients") or []
+                    if nutrient.get("nutrientName") and isinstance(nutrient.get("value"), (int, float))
+                ),
+            )
+            for food in foods
+            if food.get("fdcId") is not None
+        )
+        self.cache.set((query, limit), results)
+        return results
+
+    async def _write_through(self, foods: list[dict]) -> dict[int, int]:
+        """Add new foods to the catalogue, keeping existing ones as they are, and return our food ID for each FDC ID written."""
+        records = {food["fdcId"]: record for food in foods if (record := parse_usda_api_food(food)) is not None}
+        if not records:
+            return {}
+        try:
+            async with self.session_factory() as db:
+                names = await db.run_sync(
+                    lambda session: write_batch(session, list(records.values()), load_micronutrients(session))
+                )
+        except SQLAlchemyError:
+            # The search results are still useful without being saved
+            logger.exception("Error writing through USDA foods")
+            return {}
+        return {fdc_id: names[record.name] for fdc_id, record in records.items()}
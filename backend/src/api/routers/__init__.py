@@ -1 +1,3 @@
 from .meta import router as meta_router
+from .foods import router as foods_router
+from .logs import router as logs_router
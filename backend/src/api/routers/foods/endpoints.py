@@ -0,0 +1,100 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+
+from database import async_queries
+from database.search import search_foods
+
+from .schemas import (
+    FoodSearchResult, GetFoodSearchResponse, FoodMicronutrientDetail, FoodSourceDetail, GetFoodResponse,
+    USDANutrientResult, USDAFoodResult, GetUSDASearchResponse,
+)
+from ...lib.caching import strong_etag, is_not_modified, set_cache_headers, not_modified_response
+from ...lib.consts import (
+    FOOD_SEARCH_DEFAULT_LIMIT, FOOD_SEARCH_MAX_LIMIT, FOOD_SEARCH_MAX_QUERY_LENGTH, FOOD_CACHE_CONTROL,
+    USDA_SEARCH_DEFAULT_LIMIT, USDA_SEARCH_MAX_LIMIT,
+)
+from ...lib.dependencies import DatabaseSession, AsyncDatabaseSession, USDAProxy
+from ...lib.usda import UpstreamError
+
+
+router = APIRouter(prefix="/foods")
+
+
+@router.get("/search", response_model=GetFoodSearchResponse)
+def get_food_search(
+    db: DatabaseSession,
+    q: str = Query(min_length=1, max_length=FOOD_SEARCH_MAX_QUERY_LENGTH),
+    limit: int = Query(FOOD_SEARCH_DEFAULT_LIMIT, ge=1, le=FOOD_SEARCH_MAX_LIMIT),
+):
+    return GetFoodSearchResponse(
+        results=[
+            FoodSearchResult(id=result.food_id, name=result.name, score=result.score)
+            for result in search_foods(db, q, limit)
+        ]
+    )
+
+
+@router.get("/usda/search", response_model=GetUSDASearchResponse)
+async def get_usda_search(
+    proxy: USDAProxy,
+    q: str = Query(min_length=1, max_length=FOOD_SEARCH_MAX_QUERY_LENGTH),
+    limit: int = Query(USDA_SEARCH_DEFAULT_LIMIT, ge=1, le=USDA_SEARCH_MAX_LIMIT),
+):
+    try:
+        foods = await proxy.search(q, limit)
+    except UpstreamError:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Food database unavailable.")
+    return GetUSDASearchResponse(
+        foods=[
+            USDAFoodResult(
+                fdc_id=food.fdc_id,
+                food_id=food.food_id,
+                description=food.description,
+                brand_owner=food.brand_owner,
+                food_category=food.food_category,
+                food_nutrients=[
+                    USDANutrientResult(nutrient_name=nutrient.name, value=nutrient.value, unit_name=nutrient.unit)
+                    for nutrient in food.nutrients
+                ],
+            )
+            for food in foods
+        ]
+    )
+
+
+@router.get(
+    "/{food_id}",
+    response_model=GetFoodResponse,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "The client's cached copy is current"}},
+)
+async def get_food(db: AsyncDatabaseSession, food_id: int, request: Request, response: Response):
+    # The version alone decides the ETag, so a revalidation never loads the food's details
+    version = await async_queries.get_food_version(db, food_id)
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Food not found.")
+    etag = strong_etag("food", food_id, version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, FOOD_CACHE_CONTROL)
+
+    food = await async_queries.get_food_with_details(db, food_id)
+    if food is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Food not found.")
+    # Read together with the details, in case the food changed since the version was checked
+    set_cache_headers(response, strong_etag("food", food_id, food.version), FOOD_CACHE_CONTROL)
+    return GetFoodResponse(
+        id=food.id,
+        name=food.name,
+        calories=food.calories,
+        protein=food.protein,
+        carbs=food.carbs,
+        fat=food.fat,
+        micronutrients=[
+            FoodMicronutrientDetail(
+                micronutrient_id=food_micronutrient.micronutrient_id,
+                name=food_micronutrient.micronutrient.name,
+                unit=food_micronutrient.micronutrient.unit,
+                amount=food_micronutrient.amount,
+            )
+            for food_micronutrient in food.micronutrients
+        ],
+        sources=[FoodSourceDetail.model_validate(source) for source in food.sources],
+    )
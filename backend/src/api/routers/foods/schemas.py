@@ -0,0 +1,53 @@
+from ...lib.schemas import APISchema
+
+
+class FoodSearchResult(APISchema):
+    id: int
+    name: str
+    score: float
+
+
+class GetFoodSearchResponse(APISchema):
+    results: list[FoodSearchResult]
+
+
+class USDANutrientResult(APISchema):
+    nutrient_name: str
+    value: float
+    unit_name: str
+
+
+class USDAFoodResult(APISchema):
+    fdc_id: int
+    food_id: int | None
+    description: str
+    brand_owner: str | None
+    food_category: str | None
+    food_nutrients: list[USDANutrientResult]
+
+
+class GetUSDASearchResponse(APISchema):
+    foods: list[USDAFoodResult]
+
+
+class FoodMicronutrientDetail(APISchema):
+    micronutrient_id: int
+    name: str
+    unit: str
+    amount: float
+
+
+class FoodSourceDetail(APISchema):
+    source_name: str
+    external_id: str
+
+
+class GetFoodResponse(APISchema):
+    id: int
+    name: str
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+    micronutrients: list[FoodMicronutrientDetail]
+    sources: list[FoodSourceDetail]
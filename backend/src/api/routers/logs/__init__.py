@@ -0,0 +1 @@
+from .endpoints import router
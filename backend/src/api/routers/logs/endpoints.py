@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
+
+from database import async_queries
+
+from .schemas import FoodLog, GetFoodLogsResponse, PostMealRequest, PostMealResponse
+from ...lib.consts import LOG_PAGE_DEFAULT_LIMIT, LOG_PAGE_MAX_LIMIT
+from ...lib.dependencies import AsyncDatabaseSession
+
+
+router = APIRouter(prefix="/logs", default_response_class=ORJSONResponse)
+
+
+@router.post("/{user_id}/foods", response_model=PostMealResponse, status_code=status.HTTP_201_CREATED)
+async def post_meal(db: AsyncDatabaseSession, user_id: int, meal: PostMealRequest):
+    # Checked up front, as SQLite doesn't enforce the foreign keys and PostgreSQL would only fail the insert
+    food_ids = {entry.food_id for entry in meal.entries}
+    exists = await async_queries.user_exists(db, user_id)
+    existing_food_ids = await async_queries.get_existing_food_ids(db, list(food_ids))
+    if exists is None or existing_food_ids is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not log meal.")
+    if not exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+    if unknown := sorted(food_ids - existing_food_ids):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unknown food IDs: {unknown}")
+
+    ids = await async_queries.log_user_foods_bulk(
+        db,
+        user_id,
+        [(entry.food_id, entry.quantity) for entry in meal.entries],
+        meal.timestamp,
+    )
+    if ids is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not log meal.")
+    return PostMealResponse(ids=ids)
+
+
+@router.get("/{user_id}/foods", response_model=GetFoodLogsResponse)
+async def get_food_logs(
+    db: AsyncDatabaseSession,
+    user_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(LOG_PAGE_DEFAULT_LIMIT, ge=1, le=LOG_PAGE_MAX_LIMIT),
+    cursor: str | None = None,
+):
+    try:
+        page = await async_queries.get_user_food_logs_page(db, user_id, since, until, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not fetch food logs.")
+    logs, next_cursor = page
+    return GetFoodLogsResponse(logs=[FoodLog.model_validate(log) for log in logs], next_cursor=next_cursor)
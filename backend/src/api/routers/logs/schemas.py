@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from pydantic import Field
+
+from ...lib.schemas import APISchema
+from ...lib.consts import MEAL_MAX_ENTRIES
+
+
+class MealEntry(APISchema):
+    food_id: int
+    quantity: float = Field(gt=0)
+
+
+class PostMealRequest(APISchema):
+    entries: list[MealEntry] = Field(min_length=1, max_length=MEAL_MAX_ENTRIES)
+    timestamp: datetime | None = None
+
+
+class PostMealResponse(APISchema):
+    ids: list[int]
+
+
+class FoodLog(APISchema):
+    id: int
+    food_id: int
+    quantity: float
+    timestamp: datetime
+
+
+class GetFoodLogsResponse(APISchema):
+    logs: list[FoodLog]
+    next_cursor: str | None
@@ -1,6 +1,9 @@
 from fastapi import APIRouter
+from fastapi.responses import Response
 
 from .schemas import GetIsHealthyResponse
+from ...lib.consts import PROMETHEUS_CONTENT_TYPE
+from ...lib.metrics import METRICS
 
 
 router = APIRouter()
@@ -9,3 +12,8 @@ router = APIRouter()
 @router.get("/health", response_model=GetIsHealthyResponse)
 def get_is_healthy():
     return GetIsHealthyResponse(is_healthy=True)
+
+
+@router.get("/metrics", response_class=Response)
+def get_metrics():
+    return Response(METRICS.render(), media_type=PROMETHEUS_CONTENT_TYPE)
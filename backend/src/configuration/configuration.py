@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from starlette.config import Config
 
@@ -9,6 +11,9 @@ class Configuration(BaseSettings):
     ENVIRONMENT: Environment
     BACKEND_BASE_URL: str
     FRONTEND_BASE_URL: str
+    USDA_API_BASE_URL: str = "https://api.nal.usda.gov/fdc/v1"
+    USDA_API_KEY: str = "DEMO_KEY"
+    LOG_FILE_PATH: Optional[str] = None
 
     def is_development(self) -> bool:
         return self.ENVIRONMENT == Environment.DEVELOPMENT
@@ -4,11 +4,13 @@ from pathlib import Path
 
 class Environment(StrEnum):
     DEVELOPMENT = "dev"
+    STAGING = "staging"
     PRODUCTION = "prod"
 
 
 ENVIRONMENT_SPECIFICATION_VARIABLE_NAME = "ENVIRONMENT"
 ENVIRONMENT_FILE_LOOKUP: dict[Environment, Path] = {
     Environment.DEVELOPMENT: Path("env/.env.dev").resolve(),
+    Environment.STAGING: Path("env/.env.staging").resolve(),
     Environment.PRODUCTION: Path("env/.env.prod").resolve(),
 }
@@ -0,0 +1,11 @@
+from .loadtest import (
+    Fixtures,
+    ScenarioStats,
+    LoadTestResult,
+    prepare_fixtures,
+    run_load_test,
+    check_slo,
+    find_regressions,
+    save_baseline,
+    load_baseline,
+)
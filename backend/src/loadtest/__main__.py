@@ -0,0 +1,120 @@
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from contextlib import contextmanager
+from typing import Iterator
+
+import httpx
+
+from .loadtest import LoadTestResult, prepare_fixtures, run_load_test, check_slo, find_regressions, save_baseline, load_baseline
+from .lib import SCENARIOS
+from .lib.consts import (
+    DEFAULT_BASE_URL,
+    DEFAULT_RPS,
+    DEFAULT_DURATION_SECONDS,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_TIMEOUT_SECONDS,
+    DEFAULT_SLO_P95_MS,
+    DEFAULT_SLO_P99_MS,
+    DEFAULT_SLO_ERROR_RATE,
+    DEFAULT_TOLERANCE,
+    DEFAULT_BASELINE,
+    BASELINE_DIRECTORY,
+    SERVER_STARTUP_TIMEOUT_SECONDS,
+)
+from ..api.lib.consts import API_APP_ENTRYPOINT, API_PREFIX
+
+
+@contextmanager
+def local_server(port: int, workers: int) -> Iterator[str]:
+    # Runs the app under uvicorn without reload, as in production, with this process' environment
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", API_APP_ENTRYPOINT,
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+    ])
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + SERVER_STARTUP_TIMEOUT_SECONDS
+        while True:
+            try:
+                if httpx.get(f"{base_url}{API_PREFIX}/health").is_success:
+                    break
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("The local server did not start.")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def print_result(result: LoadTestResult) -> None:
+    print(
+        f"{result.target_rps:g} rps target, {result.achieved_rps:.1f} rps sent over {result.seconds:.1f}s, "
+        f"{result.dropped} dropped"
+    )
+    print(f"{'scenario':<14}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in (*result.scenarios.items(), ("overall", result.overall)):
+        print(
+            f"{name:<14}{stats.requests:>10}{stats.errors:>8}{stats.p50_ms:>10.1f}{stats.p90_ms:>10.1f}"
+            f"{stats.p95_ms:>10.1f}{stats.p99_ms:>10.1f}{stats.max_ms:>10.1f}"
+        )
+
+
+async def run(args: argparse.Namespace, base_url: str) -> LoadTestResult:
+    fixtures = prepare_fixtures()
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=DEFAULT_TIMEOUT_SECONDS) as client:
+        return await run_load_test(client, fixtures, args.rps, args.duration, args.max_in_flight, SCENARIOS, args.seed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Load test the API with a mix of health, log meal, fetch day and food search requests.",
+        epilog="Run from backend/ with the same DATABASE_URL as the server, which the test user and foods are added to.",
+    )
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="server to test, unless --spawn-server is given")
+    parser.add_argument("--spawn-server", action="store_true", help="start the app under uvicorn for the test")
+    parser.add_argument("--port", type=int, default=8_001, help="port of the spawned server")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the spawned server")
+    parser.add_argument("--rps", type=float, default=DEFAULT_RPS, help="requests started per second")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_SECONDS, help="seconds to send requests for")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="most requests outstanding at once")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slo-p95-ms", type=float, default=DEFAULT_SLO_P95_MS)
+    parser.add_argument("--slo-p99-ms", type=float, default=DEFAULT_SLO_P99_MS)
+    parser.add_argument("--slo-error-rate", type=float, default=DEFAULT_SLO_ERROR_RATE)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="name of the baseline, e.g. workers-4")
+    baseline = parser.add_mutually_exclusive_group()
+    baseline.add_argument("--save-baseline", action="store_true", help="save the result as the named baseline")
+    baseline.add_argument("--compare", action="store_true", help="fail if the result is worse than the named baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed latency growth over the baseline")
+    args = parser.parse_args()
+
+    if args.spawn_server:
+        with local_server(args.port, args.workers) as base_url:
+            result = asyncio.run(run(args, base_url))
+    else:
+        result = asyncio.run(run(args, args.base_url))
+    print_result(result)
+
+    failures = [f"SLO: {violation}" for violation in check_slo(result, args.slo_p95_ms, args.slo_p99_ms, args.slo_error_rate)]
+    path = BASELINE_DIRECTORY / f"{args.baseline}.json"
+    if args.save_baseline:
+        save_baseline(path, result)
+        print(f"Saved baseline to {path}")
+    elif args.compare:
+        failures.extend(f"Regression: {regression}" for regression in find_regressions(result, load_baseline(path), args.tolerance))
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from .scenarios import Fixtures, Scenario, SCENARIOS
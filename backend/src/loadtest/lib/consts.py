@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from ...api.lib.consts import API_PORT
+
+
+DEFAULT_BASE_URL = f"http://localhost:{API_PORT}"
+DEFAULT_RPS = 50
+DEFAULT_DURATION_SECONDS = 30
+DEFAULT_MAX_IN_FLIGHT = 200
+DEFAULT_TIMEOUT_SECONDS = 10
+SERVER_STARTUP_TIMEOUT_SECONDS = 30
+
+DEFAULT_SLO_P95_MS = 250
+DEFAULT_SLO_P99_MS = 1_000
+DEFAULT_SLO_ERROR_RATE = 0.01
+
+# Fraction a scenario's latency may grow by over its baseline, and the growth that's always within noise
+DEFAULT_TOLERANCE = 0.5
+MIN_REGRESSION_MS = 1.0
+MAX_ERROR_RATE_INCREASE = 0.005
+
+BASELINE_DIRECTORY = Path("loadtest/baselines").resolve()
+DEFAULT_BASELINE = "default"
+
+LOAD_TEST_USERNAME = "load_test_user"
+LOAD_TEST_FOODS = (
+    # name, calories, protein, carbs, fat
+    ("Load Test Porridge Oats", 379, 13.2, 67.7, 6.5),
+    ("Load Test Chickpeas", 164, 8.9, 27.4, 2.6),
+    ("Load Test Brown Rice", 123, 2.7, 25.6, 1),
+    ("Load Test Banana", 89, 1.1, 22.8, 0.3),
+    ("Load Test Greek Yoghurt", 59, 10, 3.6, 0.4),
+    ("Load Test Red Lentils", 116, 9, 20.1, 0.4),
+    ("Load Test Chicken Breast", 165, 31, 0, 3.6),
+    ("Load Test Wholemeal Bread", 247, 13, 41, 3.4),
+)
+# Prefixes and misspellings as typed into the food search box
+SEARCH_TERMS = ("oat", "chickpea", "brwn rice", "banana", "greek yog", "lentils", "chicken", "wholemeal")
+MAX_MEAL_ENTRIES = 4
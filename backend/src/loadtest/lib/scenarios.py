@@ -0,0 +1,56 @@
+import random
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from typing import Awaitable, Callable
+
+import httpx
+
+from .consts import SEARCH_TERMS, MAX_MEAL_ENTRIES
+from ...api.lib.consts import API_PREFIX
+
+
+@dataclass(frozen=True)
+class Fixtures:
+    # Rows the scenarios refer to, from prepare_fixtures
+    user_id: int
+    food_ids: list[int]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    weight: int  # Relative share of the requests sent
+    send: Callable[[httpx.AsyncClient, Fixtures, random.Random], Awaitable[httpx.Response]]
+
+
+async def health(client: httpx.AsyncClient, fixtures: Fixtures, rng: random.Random) -> httpx.Response:
+    return await client.get(f"{API_PREFIX}/health")
+
+
+async def log_meal(client: httpx.AsyncClient, fixtures: Fixtures, rng: random.Random) -> httpx.Response:
+    entries = [
+        {"foodId": food_id, "quantity": round(rng.uniform(0.5, 2), 2)}
+        for food_id in rng.sample(fixtures.food_ids, rng.randint(1, min(MAX_MEAL_ENTRIES, len(fixtures.food_ids))))
+    ]
+    return await client.post(f"{API_PREFIX}/logs/{fixtures.user_id}/foods", json={"entries": entries})
+
+
+async def fetch_day(client: httpx.AsyncClient, fixtures: Fixtures, rng: random.Random) -> httpx.Response:
+    midnight = datetime.combine(datetime.now(timezone.utc).date(), time(), tzinfo=timezone.utc)
+    return await client.get(
+        f"{API_PREFIX}/logs/{fixtures.user_id}/foods",
+        params={"since": midnight.isoformat(), "until": (midnight + timedelta(days=1)).isoformat()},
+    )
+
+
+async def search_food(client: httpx.AsyncClient, fixtures: Fixtures, rng: random.Random) -> httpx.Response:
+    return await client.get(f"{API_PREFIX}/foods/search", params={"q": rng.choice(SEARCH_TERMS)})
+
+
+# Roughly the traffic of the app's main screens: the day's log is read far more often than meals are logged
+SCENARIOS = (
+    Scenario("health", 10, health),
+    Scenario("log_meal", 20, log_meal),
+    Scenario("fetch_day", 40, fetch_day),
+    Scenario("search_food", 30, search_food),
+)
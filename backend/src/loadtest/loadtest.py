@@ -0,0 +1,212 @@
+import json
+import random
+import asyncio
+import statistics
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Any, Optional, Sequence
+
+import httpx
+
+from database import queries
+from database.db import SessionLocal, init_db
+
+from .lib import Fixtures, Scenario, SCENARIOS
+from .lib.consts import (
+    LOAD_TEST_USERNAME,
+    LOAD_TEST_FOODS,
+    MIN_REGRESSION_MS,
+    MAX_ERROR_RATE_INCREASE,
+    DEFAULT_TOLERANCE,
+)
+
+
+@dataclass(frozen=True)
+class Sample:
+    scenario: str
+    seconds: Optional[float]  # None if the request was dropped without being sent
+    ok: bool
+
+
+@dataclass(frozen=True)
+class ScenarioStats:
+    requests: int
+    errors: int
+    p50_ms: float
+    p90_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    @classmethod
+    def from_samples(cls, samples: Sequence[Sample]) -> "ScenarioStats":
+        latencies = sorted(sample.seconds * 1000 for sample in samples if sample.seconds is not None)
+        errors = sum(not sample.ok for sample in samples)
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            p50, p90, p95, p99 = cuts[49], cuts[89], cuts[94], cuts[98]
+        else:
+            p50 = p90 = p95 = p99 = latencies[0] if latencies else 0.0
+        return cls(len(samples), errors, p50, p90, p95, p99, latencies[-1] if latencies else 0.0)
+
+
+@dataclass(frozen=True)
+class LoadTestResult:
+    target_rps: float
+    achieved_rps: float
+    seconds: float
+    dropped: int
+    overall: ScenarioStats
+    scenarios: dict[str, ScenarioStats]
+
+
+def prepare_fixtures() -> Fixtures:
+    """
+    Make sure the user and foods the scenarios use exist in the database at DATABASE_URL.
+
+    Safe to run repeatedly, and against a database the server already uses.
+
+    Returns:
+        Fixtures with the IDs of the rows
+    """
+    init_db()
+    db = SessionLocal()
+    try:
+        user = queries.get_user_by_username(db, LOAD_TEST_USERNAME) or queries.add_user(
+            db, LOAD_TEST_USERNAME, f"{LOAD_TEST_USERNAME}@example.com", "hash"
+        )
+        food_ids = queries.get_or_create_foods(db, {name: tuple(macros) for name, *macros in LOAD_TEST_FOODS})
+        return Fixtures(user.id, [food_ids[name] for name, *_ in LOAD_TEST_FOODS])
+    finally:
+        db.close()
+
+
+async def run_load_test(
+    client: httpx.AsyncClient,
+    fixtures: Fixtures,
+    rps: float,
+    duration: float,
+    max_in_flight: int,
+    scenarios: Sequence[Scenario] = SCENARIOS,
+    seed: int = 0,
+) -> LoadTestResult:
+    """
+    Send a weighted mix of scenario requests at a fixed rate, whether or not earlier ones have finished.
+
+    Latency is measured from when each request was due rather than when it was sent, so a slow server
+    can't hide its queueing delay by slowing down the load (coordinated omission). Requests due while
+    max_in_flight are still outstanding are dropped and counted as errors.
+
+    Args:
+        client (httpx.AsyncClient): Client with the server's base URL
+        fixtures (Fixtures): Rows the scenarios refer to
+        rps (float): Requests started per second
+        duration (float): Seconds to send requests for
+        max_in_flight (int): Most requests outstanding at once
+        scenarios (Sequence[Scenario]): Scenarios to pick from by weight
+        seed (int): Seed for picking scenarios and their parameters
+
+    Returns:
+        LoadTestResult with the latency distribution and error rate, overall and per scenario
+    """
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    weights = [scenario.weight for scenario in scenarios]
+    samples: list[Sample] = []
+    in_flight: set[asyncio.Task] = set()
+
+    async def send(scenario: Scenario, due: float) -> None:
+        try:
+            response = await scenario.send(client, fixtures, rng)
+            ok = response.is_success
+        except httpx.HTTPError:
+            ok = False
+        samples.append(Sample(scenario.name, loop.time() - due, ok))
+
+    started = loop.time()
+    for index in range(int(rps * duration)):
+        due = started + index / rps
+        if (delay := due - loop.time()) > 0:
+            await asyncio.sleep(delay)
+        scenario = rng.choices(scenarios, weights)[0]
+        if len(in_flight) >= max_in_flight:
+            samples.append(Sample(scenario.name, None, False))
+            continue
+        task = asyncio.create_task(send(scenario, due))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    await asyncio.gather(*in_flight)
+    seconds = loop.time() - started
+
+    sent = sum(sample.seconds is not None for sample in samples)
+    return LoadTestResult(
+        target_rps=rps,
+        achieved_rps=sent / seconds if seconds else 0.0,
+        seconds=seconds,
+        dropped=len(samples) - sent,
+        overall=ScenarioStats.from_samples(samples),
+        scenarios={
+            scenario.name: ScenarioStats.from_samples([sample for sample in samples if sample.scenario == scenario.name])
+            for scenario in scenarios
+        },
+    )
+
+
+def check_slo(result: LoadTestResult, p95_ms: float, p99_ms: float, error_rate: float) -> list[str]:
+    """
+    Returns:
+        A description of each service level objective the run missed, empty if it met them all
+    """
+    violations = []
+    if result.overall.p95_ms > p95_ms:
+        violations.append(f"p95 {result.overall.p95_ms:.1f} ms is over {p95_ms:.1f} ms")
+    if result.overall.p99_ms > p99_ms:
+        violations.append(f"p99 {result.overall.p99_ms:.1f} ms is over {p99_ms:.1f} ms")
+    if result.overall.error_rate > error_rate:
+        violations.append(f"error rate {result.overall.error_rate:.2%} is over {error_rate:.2%}")
+    return violations
+
+
+def save_baseline(path: Path, result: LoadTestResult) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(asdict(result), file, indent=4)
+        file.write("\n")
+
+
+def load_baseline(path: Path) -> dict[str, Any]:
+    with open(path) as file:
+        return json.load(file)
+
+
+def find_regressions(result: LoadTestResult, baseline: dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """
+    Compare each scenario with a saved baseline.
+
+    Args:
+        result (LoadTestResult): Result of this run
+        baseline (dict[str, Any]): Baseline from load_baseline
+        tolerance (float): Fraction the p50 or p95 latency may grow by, growth under MIN_REGRESSION_MS is always allowed
+
+    Returns:
+        A description of each scenario that got slower or less reliable, empty if none did
+    """
+    regressions = []
+    if result.target_rps != baseline["target_rps"]:
+        regressions.append(f"baseline was run at {baseline['target_rps']} rps, not {result.target_rps}")
+    for name, stats in result.scenarios.items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        for percentile in ("p50_ms", "p95_ms"):
+            before, after = previous[percentile], getattr(stats, percentile)
+            if after > before * (1 + tolerance) and after - before >= MIN_REGRESSION_MS:
+                regressions.append(f"{name}: {percentile[:3]} {before:.1f} ms -> {after:.1f} ms")
+        before_rate = previous["errors"] / previous["requests"] if previous["requests"] else 0.0
+        if stats.error_rate > before_rate + MAX_ERROR_RATE_INCREASE:
+            regressions.append(f"{name}: error rate {before_rate:.2%} -> {stats.error_rate:.2%}")
+    return regressions
@@ -0,0 +1 @@
+from .logger import setup_logging, load_logging_configuration
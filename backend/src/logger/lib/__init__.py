@@ -0,0 +1,3 @@
+from .formatters import JSONLineFormatter
+from .filters import SamplingFilter
+from .handlers import StructuredQueueHandler
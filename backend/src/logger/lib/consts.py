@@ -0,0 +1,20 @@
+import logging
+from pathlib import Path
+
+from ...configuration.lib.consts import Environment
+
+
+LOGGING_CONFIGURATION_LOOKUP: dict[Environment, Path] = {
+    Environment.DEVELOPMENT: Path("logging/configuration/dev.json").resolve(),
+    Environment.STAGING: Path("logging/configuration/staging.json").resolve(),
+    Environment.PRODUCTION: Path("logging/configuration/prod.json").resolve(),
+}
+
+QUEUE_HANDLER = "queue"
+FILE_HANDLER = "file"
+
+TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M:%S.%f"
+
+# Attributes every LogRecord has, so anything else on a record came from the extra argument.
+# color_message is added by uvicorn for its own console formatter.
+LOG_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "color_message"}
@@ -0,0 +1,21 @@
+import random
+import logging
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes a random fraction of a high volume logger's routine records, such as access logs.
+
+    Warnings and above, and records of server error responses, are always passed.
+    """
+
+    def __init__(self, rate: float = 1.0) -> None:
+        super().__init__()
+        if not 0 <= rate <= 1:
+            raise ValueError("Sampling rate must be between 0 and 1.")
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or getattr(record, "status_code", 0) >= 500:
+            return True
+        return random.random() < self.rate
@@ -0,0 +1,32 @@
+import logging
+from datetime import datetime
+
+import orjson
+
+from .consts import TIMESTAMP_FORMAT, LOG_RECORD_ATTRIBUTES
+
+
+class JSONLineFormatter(logging.Formatter):
+    """
+    Formats each record as a single line of JSON, including any fields passed with extra.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).strftime(TIMESTAMP_FORMAT),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "file_path": record.pathname,
+            "line_number": record.lineno,
+            "process": {"name": record.processName, "id": record.process},
+            "thread": {"name": record.threadName, "id": record.thread},
+            "logger": record.name,
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in LOG_RECORD_ATTRIBUTES)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
@@ -0,0 +1,20 @@
+import copy
+import logging
+from logging.handlers import QueueHandler
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    Puts records on a queue for a QueueListener to write, so logging never blocks on I/O.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # QueueHandler.prepare formats the traceback into the message, which would hide it from the JSON formatter.
+        # Only the parts that can't safely outlive the logging call are resolved here.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
@@ -0,0 +1,47 @@
+import logging.config
+from queue import Queue
+from typing import Any, Optional
+from logging.handlers import QueueListener
+
+import orjson
+
+from .lib.consts import LOGGING_CONFIGURATION_LOOKUP, QUEUE_HANDLER, FILE_HANDLER
+from ..configuration.lib.consts import Environment
+
+
+def load_logging_configuration(environment: Environment) -> dict[str, Any]:
+    with open(LOGGING_CONFIGURATION_LOOKUP[environment], "rb") as file:
+        return orjson.loads(file.read())
+
+
+def setup_logging(environment: Environment, log_file_path: Optional[str] = None) -> QueueListener:
+    """
+    Configure logging from the environment's configuration file, writing records on a background thread.
+
+    Loggers log to the "queue" handler, which only puts records on an in-memory queue. The handlers it lists
+    (rotating JSON line files) are run by a QueueListener, so request handling never waits on disk writes.
+    Python 3.12 can build the listener itself, but it's built here so the same files work on older versions.
+
+    Args:
+        environment (Environment): Environment to load the configuration of
+        log_file_path (Optional[str]): Path to write to instead of the file handler's configured one
+
+    Returns:
+        The started listener, to stop on shutdown so queued records are written
+    """
+    configuration = load_logging_configuration(environment)
+    queue_configuration = configuration["handlers"][QUEUE_HANDLER]
+    target_names = queue_configuration.pop("handlers")
+    respect_handler_level = queue_configuration.pop("respect_handler_level", False)
+    queue: Queue = Queue()
+    queue_configuration["queue"] = queue
+    if log_file_path is not None:
+        configuration["handlers"][FILE_HANDLER]["filename"] = log_file_path
+
+    configurator = logging.config.DictConfigurator(configuration)
+    configurator.configure()
+    targets = [configurator.config["handlers"][name] for name in target_names]
+
+    listener = QueueListener(queue, *targets, respect_handler_level=respect_handler_level)
+    listener.start()
+    return listener
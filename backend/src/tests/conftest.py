@@ -0,0 +1,40 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+TEST_DATABASE_PATH = "test_api.db"
+TEST_LOG_FILE_PATH = "test_api.log.jsonl"
+
+os.environ.setdefault("BACKEND_BASE_URL", "http://localhost:8000")
+os.environ.setdefault("FRONTEND_BASE_URL", "http://localhost:3000")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DATABASE_PATH}"
+os.environ["LOG_FILE_PATH"] = TEST_LOG_FILE_PATH
+
+
+@pytest.fixture(scope="session")
+def client():
+    from src.api import app
+
+    # Entering the client runs the app's lifespan, which creates the tables
+    with TestClient(app) as client:
+        yield client
+
+    from database.db import get_engine
+
+    get_engine().dispose()
+    # SQLite's write-ahead log and shared memory files sit alongside the database
+    for path in (TEST_DATABASE_PATH, f"{TEST_DATABASE_PATH}-wal", f"{TEST_DATABASE_PATH}-shm", TEST_LOG_FILE_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.fixture
+def db():
+    from database.db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,64 @@
+from database import queries
+
+
+def test_get_food_search(client, db) -> None:
+    queries.add_food(db, name="Greek Yoghurt", calories=59, protein=10, carbs=3.6, fat=0.4)
+    queries.add_food(db, name="Greek Salad", calories=107, protein=2.8, carbs=4.8, fat=9)
+
+    response = client.get("/api/v1/foods/search", params={"q": "greek yog"})
+
+    assert response.status_code == 200
+    assert [result["name"] for result in response.json()["results"]] == ["Greek Yoghurt"]
+
+
+def test_get_food_search_typo(client, db) -> None:
+    queries.add_food(db, name="Cultured Buttermilk", calories=40, protein=3.3, carbs=4.8, fat=0.9)
+
+    response = client.get("/api/v1/foods/search", params={"q": "butermilk", "limit": 1})
+
+    assert response.status_code == 200
+    assert [result["name"] for result in response.json()["results"]] == ["Cultured Buttermilk"]
+
+
+def test_get_food_search_validation(client) -> None:
+    assert client.get("/api/v1/foods/search", params={"q": ""}).status_code == 422
+    assert client.get("/api/v1/foods/search", params={"q": "egg", "limit": 0}).status_code == 422
+
+
+def test_get_food(client, db) -> None:
+    food = queries.add_food(db, name="Spinach", calories=23, protein=2.9, carbs=3.6, fat=0.4)
+    iron = queries.add_micronutrient(db, name="Iron", unit="mg")
+    queries.add_food_micronutrient(db, food_id=food.id, micronutrient_id=iron.id, amount=2.7)
+    queries.add_food_source(db, food_id=food.id, source_name="USDA", external_id="168462")
+
+    response = client.get(f"/api/v1/foods/{food.id}")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["name"] == "Spinach"
+    assert body["micronutrients"] == [{"micronutrientId": iron.id, "name": "Iron", "unit": "mg", "amount": 2.7}]
+    assert body["sources"] == [{"sourceName": "USDA", "externalId": "168462"}]
+    assert response.headers["etag"]
+    assert "max-age" in response.headers["cache-control"]
+
+
+def test_get_food_conditional(client, db) -> None:
+    food = queries.add_food(db, name="Chickpeas", calories=164, protein=8.9, carbs=27, fat=2.6)
+    etag = client.get(f"/api/v1/foods/{food.id}").headers["etag"]
+
+    response = client.get(f"/api/v1/foods/{food.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    # Changing the food's details changes its ETag
+    queries.add_food_source(db, food_id=food.id, source_name="Open Food Facts", external_id="3017620422003")
+    response = client.get(f"/api/v1/foods/{food.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_get_food_not_found(client) -> None:
+    assert client.get("/api/v1/foods/999999").status_code == 404
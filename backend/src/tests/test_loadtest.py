@@ -0,0 +1,82 @@
+import asyncio
+
+import httpx
+
+from src.loadtest import Fixtures, ScenarioStats, LoadTestResult, prepare_fixtures, run_load_test, check_slo, find_regressions
+from src.loadtest.lib import SCENARIOS
+
+
+def _run(handler, rps: float = 200, duration: float = 0.5, max_in_flight: int = 50):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://api.test") as client:
+            return await run_load_test(client, Fixtures(user_id=1, food_ids=[1, 2, 3]), rps, duration, max_in_flight)
+    return asyncio.run(main())
+
+
+def test_run_load_test_sends_scenario_mix() -> None:
+    paths = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        return httpx.Response(201 if request.method == "POST" else 200, json={})
+
+    result = _run(handler)
+
+    assert result.overall.requests == len(paths) == 100
+    assert result.overall.errors == result.dropped == 0
+    assert set(result.scenarios) == {scenario.name for scenario in SCENARIOS}
+    assert sum(stats.requests for stats in result.scenarios.values()) == 100
+    assert {"/api/v1/health", "/api/v1/logs/1/foods", "/api/v1/foods/search"} == set(paths)
+    assert result.overall.p50_ms <= result.overall.p95_ms <= result.overall.max_ms
+
+
+def test_run_load_test_counts_errors() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/health"):
+            raise httpx.ConnectError("refused")
+        return httpx.Response(500 if request.method == "POST" else 200, json={})
+
+    result = _run(handler)
+
+    assert result.scenarios["health"].error_rate == 1
+    assert result.scenarios["log_meal"].error_rate == 1
+    assert result.scenarios["fetch_day"].errors == 0
+    assert check_slo(result, p95_ms=1_000, p99_ms=1_000, error_rate=0.01) == [
+        f"error rate {result.overall.error_rate:.2%} is over 1.00%"
+    ]
+
+
+def test_run_load_test_drops_over_max_in_flight() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={})
+
+    result = _run(handler, rps=100, duration=0.5, max_in_flight=5)
+
+    assert result.dropped > 0
+    assert result.overall.errors == result.dropped
+
+
+def test_find_regressions() -> None:
+    health = ScenarioStats(requests=100, errors=0, p50_ms=5, p90_ms=6, p95_ms=7, p99_ms=9, max_ms=12)
+    fetch_day = ScenarioStats(requests=100, errors=3, p50_ms=20, p90_ms=24, p95_ms=25, p99_ms=30, max_ms=41)
+    result = LoadTestResult(50, 50, 30, 0, health, {"health": health, "fetch_day": fetch_day})
+    baseline = {
+        "target_rps": 50,
+        "scenarios": {
+            "health": {"requests": 100, "errors": 0, "p50_ms": 4.5, "p95_ms": 6.5},
+            "fetch_day": {"requests": 100, "errors": 0, "p50_ms": 10, "p95_ms": 24},
+        },
+    }
+
+    assert find_regressions(result, baseline) == [
+        "fetch_day: p50 10.0 ms -> 20.0 ms",
+        "fetch_day: error rate 0.00% -> 3.00%",
+    ]
+
+
+def test_prepare_fixtures_is_idempotent(client) -> None:
+    fixtures = prepare_fixtures()
+
+    assert prepare_fixtures() == fixtures
+    assert len(set(fixtures.food_ids)) == len(fixtures.food_ids)
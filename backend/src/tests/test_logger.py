@@ -0,0 +1,67 @@
+import sys
+import logging
+
+import orjson
+import pytest
+
+from src.configuration.lib.consts import Environment
+from src.logger import setup_logging
+from src.logger.lib import JSONLineFormatter, SamplingFilter
+
+
+def _record(level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("api.requests", level, "/app/src/api.py", 12, "Handled %s", ("GET",), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_line_formatter() -> None:
+    entry = orjson.loads(JSONLineFormatter().format(_record(route="/api/v1/health", duration_ms=1.5)))
+
+    assert entry["message"] == "Handled GET"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "api.requests"
+    assert entry["file_path"] == "/app/src/api.py"
+    assert entry["line_number"] == 12
+    assert set(entry["process"]) == set(entry["thread"]) == {"name", "id"}
+    assert entry["route"] == "/api/v1/health"
+    assert entry["duration_ms"] == 1.5
+    assert "args" not in entry and "msg" not in entry
+
+
+def test_json_line_formatter_exception() -> None:
+    try:
+        raise ValueError("bad value")
+    except ValueError:
+        record = _record(logging.ERROR)
+        record.exc_info = sys.exc_info()
+
+    entry = orjson.loads(JSONLineFormatter().format(record))
+
+    assert "ValueError: bad value" in entry["exception"]
+
+
+def test_sampling_filter() -> None:
+    drop_all = SamplingFilter(rate=0)
+
+    assert not drop_all.filter(_record())
+    assert drop_all.filter(_record(logging.WARNING))
+    assert drop_all.filter(_record(status_code=503))
+    assert SamplingFilter(rate=1).filter(_record())
+    with pytest.raises(ValueError):
+        SamplingFilter(rate=2)
+
+
+def test_setup_logging_writes_json_lines(tmp_path) -> None:
+    log_file_path = tmp_path / "log.jsonl"
+    listener = setup_logging(Environment.DEVELOPMENT, str(log_file_path))
+    try:
+        logging.getLogger("database.queries").error("Error adding user", extra={"user_id": 7})
+    finally:
+        # Stopping the listener writes out anything still queued
+        listener.stop()
+
+    entries = [orjson.loads(line) for line in log_file_path.read_text().splitlines()]
+    assert [(entry["logger"], entry["message"], entry["user_id"]) for entry in entries] == [
+        ("database.queries", "Error adding user", 7)
+    ]
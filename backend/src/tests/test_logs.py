@@ -0,0 +1,66 @@
+from database import queries
+
+
+def test_post_meal_and_get_food_logs(client, db) -> None:
+    user = queries.add_user(db, username="meal_logger", email="meal_logger@example.com", password_hash="hash")
+    toast = queries.add_food(db, name="Wholemeal Toast", calories=247, protein=13, carbs=41, fat=3.4)
+    egg = queries.add_food(db, name="Poached Egg", calories=143, protein=12.6, carbs=0.7, fat=9.5)
+
+    response = client.post(
+        f"/api/v1/logs/{user.id}/foods",
+        json={
+            "timestamp": "2024-03-02T08:30:00Z",
+            "entries": [{"foodId": toast.id, "quantity": 0.8}, {"foodId": egg.id, "quantity": 1.2}],
+        },
+    )
+
+    assert response.status_code == 201
+    ids = response.json()["ids"]
+    assert len(ids) == 2
+
+    response = client.get(f"/api/v1/logs/{user.id}/foods", params={"limit": 1})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [log["id"] for log in body["logs"]] == [ids[1]]
+    assert body["logs"][0]["foodId"] == egg.id
+
+    response = client.get(f"/api/v1/logs/{user.id}/foods", params={"limit": 1, "cursor": body["nextCursor"]})
+
+    assert [log["id"] for log in response.json()["logs"]] == [ids[0]]
+    assert response.json()["nextCursor"] is None
+
+
+def test_post_meal_unknown_user_or_food(client, db) -> None:
+    user = queries.add_user(db, username="unknown_logger", email="unknown_logger@example.com", password_hash="hash")
+    soup = queries.add_food(db, name="Lentil Soup", calories=116, protein=9, carbs=20, fat=0.4)
+    meal = {"timestamp": "2024-03-04T12:00:00Z", "entries": [{"foodId": soup.id, "quantity": 1}]}
+
+    response = client.post(f"/api/v1/logs/{user.id + 10_000}/foods", json=meal)
+
+    assert response.status_code == 404
+
+    meal["entries"].append({"foodId": soup.id + 10_000, "quantity": 1})
+    response = client.post(f"/api/v1/logs/{user.id}/foods", json=meal)
+
+    assert response.status_code == 422
+    assert str(soup.id + 10_000) in response.json()["detail"]
+    assert queries.get_user_food_logs(db, user.id) == []
+
+
+def test_get_food_logs_date_range(client, db) -> None:
+    user = queries.add_user(db, username="range_logger", email="range_logger@example.com", password_hash="hash")
+    food = queries.add_food(db, name="Banana", calories=89, protein=1.1, carbs=23, fat=0.3)
+    for day in ("2024-03-01", "2024-03-02", "2024-03-03"):
+        client.post(f"/api/v1/logs/{user.id}/foods", json={"timestamp": f"{day}T12:00:00Z", "entries": [{"foodId": food.id, "quantity": 1}]})
+
+    response = client.get(f"/api/v1/logs/{user.id}/foods", params={"since": "2024-03-02T00:00:00Z", "until": "2024-03-03T00:00:00Z"})
+
+    assert response.status_code == 200
+    assert [log["timestamp"] for log in response.json()["logs"]] == ["2024-03-02T12:00:00"]
+
+
+def test_food_logs_validation(client) -> None:
+    assert client.post("/api/v1/logs/1/foods", json={"entries": []}).status_code == 422
+    assert client.post("/api/v1/logs/1/foods", json={"entries": [{"foodId": 1, "quantity": 0}]}).status_code == 422
+    assert client.get("/api/v1/logs/1/foods", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,55 @@
+import logging
+
+from database import queries
+
+
+def _metric_value(body: str, prefix: str) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in body.splitlines() if line.startswith(prefix))
+
+
+def test_get_metrics_records_route_latency(client) -> None:
+    client.get("/api/v1/health")
+
+    response = client.get("/api/v1/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/v1/health",status="200",le="+Inf"}' in response.text
+
+
+def test_get_metrics_labels_by_route_template(client, db) -> None:
+    food = queries.add_food(db, name="Metric Lentils", calories=116, protein=9, carbs=20, fat=0.4)
+    client.get(f"/api/v1/foods/{food.id}")
+    client.get("/api/v1/foods/999999")
+
+    body = client.get("/api/v1/metrics").text
+
+    assert 'route="/api/v1/foods/{food_id}",status="200"' in body
+    assert 'route="/api/v1/foods/{food_id}",status="404"' in body
+    assert f'route="/api/v1/foods/{food.id}"' not in body
+
+
+def test_get_metrics_counts_database_queries(client, db) -> None:
+    food = queries.add_food(db, name="Metric Barley", calories=123, protein=2.3, carbs=28, fat=0.4)
+    prefix = 'http_request_db_queries_total{method="GET",route="/api/v1/foods/{food_id}"}'
+    before = _metric_value(client.get("/api/v1/metrics").text, prefix)
+
+    client.get(f"/api/v1/foods/{food.id}")
+
+    assert _metric_value(client.get("/api/v1/metrics").text, prefix) > before
+
+
+def test_request_log_has_timing_fields(client, caplog) -> None:
+    # The request logger doesn't propagate to the root logger that caplog listens on
+    logger = logging.getLogger("api.requests")
+    logger.addHandler(caplog.handler)
+    try:
+        client.get("/api/v1/health")
+    finally:
+        logger.removeHandler(caplog.handler)
+
+    record = next(record for record in caplog.records if record.name == "api.requests")
+    assert record.route == "/api/v1/health"
+    assert record.status_code == 200
+    assert record.db_query_count == 0
+    assert record.duration_ms >= 0
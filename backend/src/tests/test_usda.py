@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from database import queries
+from src.api import app
+from src.api.lib.dependencies import get_usda_proxy
+from src.api.lib.usda import SingleFlight, USDASearchProxy
+
+
+USDA_FOODS = [
+    {
+        "fdcId": 534358,
+        "description": "Proxy Peanut Butter",
+        "brandOwner": "Nutco",
+        "foodCategory": "Nut & Seed Butters",
+        "foodNutrients": [
+            {"nutrientId": 1008, "nutrientName": "Energy", "unitName": "KCAL", "value": 588},
+            {"nutrientId": 1003, "nutrientName": "Protein", "unitName": "G", "value": 25},
+            {"nutrientId": 1004, "nutrientName": "Total lipid (fat)", "unitName": "G", "value": 50},
+            {"nutrientId": 1005, "nutrientName": "Carbohydrate, by difference", "unitName": "G", "value": 20},
+            {"nutrientId": 1089, "nutrientName": "Iron, Fe", "unitName": "MG", "value": 1.9},
+        ],
+    },
+]
+
+
+@pytest.fixture
+def usda_requests():
+    # Stands in for the USDA API, recording the requests it receives
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"foods": USDA_FOODS})
+
+    proxy = USDASearchProxy(httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://usda.test"), "TEST_KEY")
+    app.dependency_overrides[get_usda_proxy] = lambda: proxy
+    yield requests
+    app.dependency_overrides.pop(get_usda_proxy)
+
+
+def test_get_usda_search(client, db, usda_requests) -> None:
+    response = client.get("/api/v1/foods/usda/search", params={"q": "Peanut  Butter"})
+
+    assert response.status_code == 200
+    food = response.json()["foods"][0]
+    assert food["fdcId"] == 534358
+    assert {"nutrientName": "Iron, Fe", "value": 1.9, "unitName": "MG"} in food["foodNutrients"]
+    assert usda_requests[0].url.params["query"] == "peanut butter"
+    assert usda_requests[0].url.params["api_key"] == "TEST_KEY"
+
+    # Written through to the catalogue
+    saved = queries.get_food_by_name(db, "Proxy Peanut Butter (Nutco)")
+    assert saved is not None and saved.id == food["foodId"]
+
+    # Served from the cache, whatever the query's case and spacing
+    assert client.get("/api/v1/foods/usda/search", params={"q": "peanut butter"}).json() == response.json()
+    assert len(usda_requests) == 1
+
+
+def test_get_usda_search_keeps_existing_foods(client, db) -> None:
+    existing = queries.add_food(db, name="Proxy Tahini (Nutco)", calories=595, protein=17, carbs=21, fat=54)
+    foods = [{**USDA_FOODS[0], "fdcId": 534359, "description": "Proxy Tahini"}]
+    proxy = USDASearchProxy(httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"foods": foods})), base_url="http://usda.test"), "TEST_KEY")
+    app.dependency_overrides[get_usda_proxy] = lambda: proxy
+    try:
+        response = client.get("/api/v1/foods/usda/search", params={"q": "tahini"})
+    finally:
+        app.dependency_overrides.pop(get_usda_proxy)
+
+    # Linked to the food we already had, whose macros logs were summed with are left alone
+    assert response.json()["foods"][0]["foodId"] == existing.id
+    db.expire_all()
+    assert queries.get_food_by_name(db, "Proxy Tahini (Nutco)").calories == 595
+    assert queries.get_food_micronutrients(db, existing.id) == []
+
+
+def test_get_usda_search_upstream_error(client) -> None:
+    proxy = USDASearchProxy(httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(429)), base_url="http://usda.test"), "TEST_KEY")
+    app.dependency_overrides[get_usda_proxy] = lambda: proxy
+    try:
+        assert client.get("/api/v1/foods/usda/search", params={"q": "anything"}).status_code == 502
+    finally:
+        app.dependency_overrides.pop(get_usda_proxy)
+
+
+def test_single_flight() -> None:
+    calls = []
+
+    async def slow_call() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def main():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("key", slow_call) for _ in range(10)))
+        return results, flights.in_flight()
+
+    results, in_flight = asyncio.run(main())
+    assert results == [42] * 10
+    assert len(calls) == 1
+    assert in_flight == 0
@@ -0,0 +1,109 @@
+import logging
+from datetime import date, datetime, timezone
+from typing import Optional, List, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import select, func, cast, Date
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.schema import Food, UserMacroLog
+from database.utils import to_utc_naive
+
+logger = logging.getLogger(__name__)
+
+PERIOD_DAY = "day"
+PERIOD_WEEK = "week"
+
+# (start of period, calories, protein, carbs, fat)
+NutritionTotals = Tuple[date, float, float, float, float]
+
+def _sqlite_local_date(timestamp: Optional[str], tz_name: str) -> Optional[str]:
+    """Convert a stored UTC timestamp to an ISO date in the given timezone (SQLite function)."""
+    if timestamp is None:
+        return None
+    value = datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc)
+    return value.astimezone(ZoneInfo(tz_name)).date().isoformat()
+
+def _period_start(db: Session, period: str, tz_name: str):
+    """Build the SQL expression for the local start date of the period each log falls in."""
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite has no timezone database, so local dates are computed by a registered function
+        db.connection().connection.driver_connection.create_function(
+            "local_date", 2, _sqlite_local_date, deterministic=True
+        )
+        local_date = func.local_date(UserMacroLog.timestamp, tz_name)
+        if period == PERIOD_DAY:
+            return local_date
+        # 'weekday 0' moves to the following Sunday, six days before which is the ISO week's Monday
+        return func.date(local_date, "weekday 0", "-6 days")
+
+    # Timestamps are stored as naive UTC, so interpret them as UTC before converting
+    local_time = func.timezone(tz_name, func.timezone("UTC", UserMacroLog.timestamp))
+    if period == PERIOD_DAY:
+        return cast(local_time, Date)
+    return cast(func.date_trunc("week", local_time), Date)
+
+def get_nutrition_totals(db: Session, user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None, period: str = PERIOD_DAY, tz_name: str = "UTC") -> Optional[List[NutritionTotals]]:
+    """
+    Compute a user's calorie and macronutrient totals per day or ISO week in one SQL statement.
+
+    Args:
+        db (Session): Database session
+        user_id (int): ID of the user
+        since (datetime, optional): Only include logs at or after this time
+        until (datetime, optional): Only include logs before this time
+        period (str): PERIOD_DAY or PERIOD_WEEK
+        tz_name (str): IANA timezone of the user, used to decide which day a log falls on
+
+    Returns:
+        List of (period start date, calories, protein, carbs, fat) tuples ordered by date if successful, None otherwise
+
+    Raises:
+        ValueError: If the period or timezone is not recognised
+    """
+    if period not in (PERIOD_DAY, PERIOD_WEEK):
+        raise ValueError(f"Invalid aggregation period: {period}")
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"Invalid timezone: {tz_name}") from e
+
+    try:
+        # Group by a subquery column so PostgreSQL doesn't have to match up bound parameters in GROUP BY
+        rows = (
+            select(
+                _period_start(db, period, tz_name).label("period_start"),
+                (UserMacroLog.quantity * Food.calories).label("calories"),
+                (UserMacroLog.quantity * Food.protein).label("protein"),
+                (UserMacroLog.quantity * Food.carbs).label("carbs"),
+                (UserMacroLog.quantity * Food.fat).label("fat"),
+            )
+            .join(Food, Food.id == UserMacroLog.food_id)
+            .where(UserMacroLog.user_id == user_id)
+        )
+        if since is not None:
+            rows = rows.where(UserMacroLog.timestamp >= to_utc_naive(since))
+        if until is not None:
+            rows = rows.where(UserMacroLog.timestamp < to_utc_naive(until))
+        rows = rows.subquery()
+        statement = (
+            select(
+                rows.c.period_start,
+                func.sum(rows.c.calories),
+                func.sum(rows.c.protein),
+                func.sum(rows.c.carbs),
+                func.sum(rows.c.fat),
+            )
+            .group_by(rows.c.period_start)
+            .order_by(rows.c.period_start)
+        )
+
+        return [
+            # SQLite returns dates as ISO strings
+            (date.fromisoformat(start) if isinstance(start, str) else start, calories, protein, carbs, fat)
+            for start, calories, protein, carbs, fat in db.execute(statement)
+        ]
+    except SQLAlchemyError:
+        logger.exception("Error computing nutrition totals")
+        return None
@@ -0,0 +1,227 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.schema import Food, FoodMicronutrient, Micronutrient, UserMacroLog, UserMicroLog
+from database.utils import convert_amount, to_utc_naive
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DAYS = 365
+DEFAULT_WINDOW_DAYS = 90
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+MACRO_NAMES = ("calories", "protein", "carbs", "fat")
+
+# Adult daily reference intakes (US RDA or AI, the higher of the male and female values), keyed by the
+# USDA FoodData Central nutrient names the importer creates micronutrients with
+REFERENCE_INTAKES: Dict[str, Tuple[float, str]] = {
+    "Calcium, Ca": (1_000, "mg"),
+    "Iron, Fe": (18, "mg"),
+    "Magnesium, Mg": (420, "mg"),
+    "Phosphorus, P": (700, "mg"),
+    "Potassium, K": (3_400, "mg"),
+    "Zinc, Zn": (11, "mg"),
+    "Copper, Cu": (900, "μg"),
+    "Selenium, Se": (55, "μg"),
+    "Vitamin A, RAE": (900, "μg"),
+    "Vitamin C, total ascorbic acid": (90, "mg"),
+    "Vitamin D (D2 + D3)": (15, "μg"),
+    "Vitamin E (alpha-tocopherol)": (15, "mg"),
+    "Vitamin K (phylloquinone)": (120, "μg"),
+    "Thiamin": (1.2, "mg"),
+    "Riboflavin": (1.3, "mg"),
+    "Niacin": (16, "mg"),
+    "Vitamin B-6": (1.7, "mg"),
+    "Folate, total": (400, "μg"),
+    "Vitamin B-12": (2.4, "μg"),
+    "Choline, total": (550, "mg"),
+}
+
+@dataclass(frozen=True)
+class IntakeHistory:
+    """A user's daily intake as dense arrays, one row per UTC day including days with nothing logged."""
+    days: np.ndarray  # datetime64[D], shape (days,)
+    micronutrient_ids: np.ndarray  # shape (micronutrients,)
+    micronutrient_names: List[str]
+    micronutrient_units: List[str]
+    micronutrients: np.ndarray  # Amount of each micronutrient per day, shape (days, micronutrients)
+    macros: np.ndarray  # Calories, protein, carbs and fat per day, shape (days, 4)
+
+@dataclass(frozen=True)
+class MicronutrientAnalysis:
+    """Statistics of each micronutrient column of an IntakeHistory, over the last window_days days."""
+    window_days: int
+    mean_daily: np.ndarray  # shape (micronutrients,)
+    rolling_mean: np.ndarray  # Trailing mean of window_days days, NaN until a full window, shape (days, micronutrients)
+    percentiles: np.ndarray  # Percentiles of daily intake, shape (len(percentile_levels), micronutrients)
+    percentile_levels: Tuple[float, ...]
+    reference: np.ndarray  # Daily reference intake in the micronutrient's unit, NaN if unknown
+    percent_of_reference: np.ndarray
+    deficit: np.ndarray  # Average shortfall per day against the reference, 0 if met
+    days_below_reference: np.ndarray  # Fraction of days under the reference
+
+def _day_indexes(timestamps: Sequence[datetime], first_day: np.datetime64) -> np.ndarray:
+    return (np.array(timestamps, dtype="datetime64[us]").astype("datetime64[D]") - first_day).astype(np.int64)
+
+def _sum_by(rows: np.ndarray, columns: np.ndarray, weights: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    # Sums weights into a dense (rows, columns) array, like np.add.at but in one pass over flat indexes
+    flat = np.bincount(rows * shape[1] + columns, weights=weights, minlength=shape[0] * shape[1])
+    return flat.reshape(shape)
+
+def load_intake_history(db: Session, user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Optional[IntakeHistory]:
+    """
+    Load a user's daily micronutrient and macro intake as arrays, without building ORM objects.
+
+    Micronutrient intake is what the user logged directly plus what their logged foods contain. Micronutrient logs
+    derived from a food log by log_user_food_with_micronutrients are left out, as the food log already counts them.
+
+    Args:
+        db (Session): Database session
+        user_id (int): ID of the user
+        since (datetime, optional): Start of the history, defaults to DEFAULT_HISTORY_DAYS before until
+        until (datetime, optional): End of the history (exclusive), defaults to now
+
+    Returns:
+        IntakeHistory if successful, None otherwise
+    """
+    until = to_utc_naive(until) if until is not None else datetime.now(timezone.utc).replace(tzinfo=None)
+    since = to_utc_naive(since) if since is not None else until - timedelta(days=DEFAULT_HISTORY_DAYS)
+    first_day = np.datetime64(since.date(), "D")
+    days = np.arange(first_day, np.datetime64((until - timedelta(microseconds=1)).date(), "D") + 1)
+
+    try:
+        connection = db.connection()
+        food_logs = connection.execute(
+            select(UserMacroLog.timestamp, UserMacroLog.food_id, UserMacroLog.quantity, Food.calories, Food.protein, Food.carbs, Food.fat)
+            .join(Food, Food.id == UserMacroLog.food_id)
+            .where(UserMacroLog.user_id == user_id, UserMacroLog.timestamp >= since, UserMacroLog.timestamp < until)
+        ).all()
+        micro_logs = connection.execute(
+            select(UserMicroLog.timestamp, UserMicroLog.micronutrient_id, UserMicroLog.amount)
+            .where(
+                UserMicroLog.user_id == user_id, UserMicroLog.timestamp >= since, UserMicroLog.timestamp < until,
+                UserMicroLog.food_log_id.is_(None),
+            )
+        ).all()
+        food_ids = np.unique(np.array([row[1] for row in food_logs], dtype=np.int64))
+        food_micronutrients = connection.execute(
+            select(FoodMicronutrient.food_id, FoodMicronutrient.micronutrient_id, FoodMicronutrient.amount)
+            .where(FoodMicronutrient.food_id.in_(food_ids.tolist()))
+        ).all() if len(food_ids) else []
+        micronutrient_ids = np.union1d(
+            np.array([row[1] for row in food_micronutrients], dtype=np.int64),
+            np.array([row[1] for row in micro_logs], dtype=np.int64),
+        )
+        micronutrients = {
+            id_: (name, unit) for id_, name, unit in connection.execute(
+                select(Micronutrient.id, Micronutrient.name, Micronutrient.unit).where(Micronutrient.id.in_(micronutrient_ids.tolist()))
+            )
+        }
+    except SQLAlchemyError:
+        logger.exception("Error loading intake history")
+        return None
+
+    shape = (len(days), len(micronutrient_ids))
+    intake = np.zeros(shape)
+    macros = np.zeros((len(days), len(MACRO_NAMES)))
+    if food_logs:
+        timestamps, log_food_ids, quantities, *macro_columns = zip(*food_logs)
+        day_indexes = _day_indexes(timestamps, first_day)
+        quantities = np.array(quantities, dtype=np.float64)
+        food_indexes = np.searchsorted(food_ids, np.array(log_food_ids, dtype=np.int64))
+        for column, values in enumerate(macro_columns):
+            macros[:, column] = np.bincount(day_indexes, weights=quantities * np.array(values, dtype=np.float64), minlength=len(days))
+        if food_micronutrients:
+            # Servings of each food per day, times each food's micronutrients per serving
+            servings = _sum_by(day_indexes, food_indexes, quantities, (len(days), len(food_ids)))
+            contents_food_ids, contents_micronutrient_ids, amounts = (np.array(column) for column in zip(*food_micronutrients))
+            contents = _sum_by(
+                np.searchsorted(food_ids, contents_food_ids),
+                np.searchsorted(micronutrient_ids, contents_micronutrient_ids),
+                amounts.astype(np.float64),
+                (len(food_ids), len(micronutrient_ids)),
+            )
+            intake += servings @ contents
+    if micro_logs:
+        timestamps, log_micronutrient_ids, amounts = zip(*micro_logs)
+        intake += _sum_by(
+            _day_indexes(timestamps, first_day),
+            np.searchsorted(micronutrient_ids, np.array(log_micronutrient_ids, dtype=np.int64)),
+            np.array(amounts, dtype=np.float64),
+            shape,
+        )
+
+    return IntakeHistory(
+        days=days,
+        micronutrient_ids=micronutrient_ids,
+        micronutrient_names=[micronutrients[id_][0] for id_ in micronutrient_ids.tolist()],
+        micronutrient_units=[micronutrients[id_][1] for id_ in micronutrient_ids.tolist()],
+        micronutrients=intake,
+        macros=macros,
+    )
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing mean of each column over window rows, using cumulative sums rather than a loop over windows.
+
+    Returns:
+        Array shaped like values, NaN in the rows before the first full window
+    """
+    if window < 1:
+        raise ValueError("Window must be at least one day")
+    result = np.full(values.shape, np.nan)
+    if len(values) < window:
+        return result
+    totals = np.cumsum(values, axis=0)
+    result[window - 1:] = totals[window - 1:]
+    result[window:] -= totals[:-window]
+    result[window - 1:] /= window
+    return result
+
+def reference_intakes(history: IntakeHistory, references: Dict[str, Tuple[float, str]] = REFERENCE_INTAKES) -> np.ndarray:
+    """Daily reference intake of each micronutrient column in its own unit, NaN where there's none."""
+    result = np.full(len(history.micronutrient_ids), np.nan)
+    for column, (name, unit) in enumerate(zip(history.micronutrient_names, history.micronutrient_units)):
+        if name in references:
+            amount = convert_amount(*references[name], unit)
+            if amount is not None:
+                result[column] = amount
+    return result
+
+def analyse_micronutrients(history: IntakeHistory, window_days: int = DEFAULT_WINDOW_DAYS, percentile_levels: Sequence[float] = DEFAULT_PERCENTILES, references: Dict[str, Tuple[float, str]] = REFERENCE_INTAKES) -> MicronutrientAnalysis:
+    """
+    Compare every micronutrient's intake over the last window_days days with its reference intake at once.
+
+    Args:
+        history (IntakeHistory): History from load_intake_history
+        window_days (int): Days at the end of the history to summarise, and the rolling mean's window
+        percentile_levels (Sequence[float]): Percentiles of daily intake to compute
+        references (Dict[str, Tuple[float, str]]): (amount, unit) reference intakes by micronutrient name
+
+    Returns:
+        MicronutrientAnalysis with one value per micronutrient column of the history
+    """
+    if window_days < 1:
+        raise ValueError("Window must be at least one day")
+    recent = history.micronutrients[-window_days:]
+    reference = reference_intakes(history, references)
+    mean_daily = recent.mean(axis=0) if len(recent) else np.zeros(recent.shape[1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percent_of_reference = mean_daily / reference * 100
+    return MicronutrientAnalysis(
+        window_days=window_days,
+        mean_daily=mean_daily,
+        rolling_mean=rolling_mean(history.micronutrients, window_days),
+        percentiles=np.percentile(recent, percentile_levels, axis=0) if len(recent) else np.zeros((len(percentile_levels), recent.shape[1])),
+        percentile_levels=tuple(percentile_levels),
+        reference=reference,
+        percent_of_reference=percent_of_reference,
+        deficit=np.where(np.isnan(reference), np.nan, np.clip(reference - mean_daily, 0, None)),
+        days_below_reference=np.where(np.isnan(reference), np.nan, (recent < reference).mean(axis=0) if len(recent) else 0.0),
+    )
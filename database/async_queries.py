@@ -0,0 +1,891 @@
+import logging
+from datetime import timezone, datetime, date
+from typing import Optional, Dict, List, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import statements
+from database.schema import User, Food, UserMacroLog, UserMicroLog, FoodMicronutrient, Micronutrient, FoodSource, UserDailySummary, UserDailyMicronutrientSummary
+from database.summaries import select_food_macros, food_summary_upsert, micronutrient_summary_upsert, food_micronutrient_summary_upsert
+from database.cache import (
+    FOOD_BY_NAME_CACHE, MICRONUTRIENT_BY_NAME_CACHE, FOOD_MICRONUTRIENTS_CACHE, MISSING,
+    FoodSnapshot, MicronutrientSnapshot, FoodMicronutrientSnapshot,
+)
+from database.search import FOOD_SEARCH_INDEX
+from database.utils import to_utc_naive
+from database.queries import DEFAULT_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Async twins of the functions in database.queries, for use with an AsyncSession from database.db.get_async_db.
+# Both modules build their SQL with database.statements, so they behave identically.
+
+async def _apply_food_logs(db: AsyncSession, user_id: int, day: date, entries: List[Tuple[int, float]], sign: int = 1) -> None:
+    """Async version of database.summaries.apply_food_logs."""
+    foods = {food_id: tuple(macros) for food_id, *macros in await db.execute(select_food_macros(entries))}
+    await db.execute(food_summary_upsert(db, user_id, day, foods, entries, sign))
+
+async def _apply_micronutrient_logs(db: AsyncSession, user_id: int, day: date, entries: List[Tuple[int, float]], sign: int = 1) -> None:
+    """Async version of database.summaries.apply_micronutrient_logs."""
+    statement, rows = micronutrient_summary_upsert(db, user_id, day, entries, sign)
+    await db.execute(statement, rows)
+
+async def _get_log_page(db: AsyncSession, model, user_id: int, since: Optional[datetime], until: Optional[datetime], limit: int, cursor: Optional[str]):
+    rows = (await db.scalars(statements.select_log_page(model, user_id, since, until, limit, cursor))).all()
+    return statements.split_log_page(rows, limit)
+
+async def _get_or_create_ids(db: AsyncSession, model, rows: List[dict]) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Resolve the names of rows to IDs, inserting the rows whose name doesn't exist yet. Runs in the caller's transaction.
+
+    One INSERT ... ON CONFLICT DO NOTHING RETURNING adds the missing rows, and only if some names already existed is
+    there a second statement to select their IDs. A name another transaction adds concurrently is skipped by the
+    insert instead of raising, so concurrent writers need no locking or retries.
+
+    Returns:
+        (IDs by name, names of the rows that were created)
+    """
+    created = dict((await db.execute(statements.insert_missing_by_name(db, model, rows))).all())
+    missing = [row["name"] for row in rows if row["name"] not in created]
+    ids = dict((await db.execute(statements.select_ids_by_name(model, missing))).all()) if missing else {}
+    ids.update(created)
+    return ids, list(created)
+
+async def add_user(db: AsyncSession, username: str, email: str, password_hash: str) -> Optional[User]:
+    """
+    Add a new user to the database.
+
+    Args:
+        db (AsyncSession): Database session
+        username (str): User's username
+        email (str): User's email address
+        password_hash (str): Hashed password
+
+    Returns:
+        User object if successful, None otherwise
+    """
+    try:
+        db_user = User(username=username, email=email, password_hash=password_hash)
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error adding user")
+        return None
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    """
+    Retrieve a user by their username.
+
+    Args:
+        db (AsyncSession): Database session
+        username (str): Username to search for
+
+    Returns:
+        User object if found, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_user_by_username(username))).first()
+    except SQLAlchemyError:
+        logger.exception("Error fetching user by username")
+        return None
+
+async def get_all_users(db: AsyncSession) -> Optional[List[User]]:
+    """
+    Retrieve all users from the database.
+
+    Args:
+        db (AsyncSession): Database session
+
+    Returns:
+        List of User objects if successful, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_all_users())).all()
+    except SQLAlchemyError:
+        logger.exception("Error fetching all users")
+        return None
+
+async def user_exists(db: AsyncSession, user_id: int) -> Optional[bool]:
+    """
+    Check whether a user exists.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+
+    Returns:
+        True if the user exists, False if not, None on error
+    """
+    try:
+        return (await db.scalars(statements.select_user_id(user_id))).first() is not None
+    except SQLAlchemyError:
+        logger.exception("Error checking user exists")
+        return None
+
+async def add_food(db: AsyncSession, name: str, calories: float, protein: float, carbs: float, fat: float) -> Optional[Food]:
+    """
+    Add a new food item to the database.
+
+    Args:
+        db (AsyncSession): Database session
+        name (str): Name of the food
+        calories (float): Calorie content
+        protein (float): Protein content
+        carbs (float): Carbohydrate content
+        fat (float): Fat content
+
+    Returns:
+        Food object if successful, None otherwise
+    """
+    try:
+        db_food = Food(name=name, calories=calories, protein=protein, carbs=carbs, fat=fat)
+        db.add(db_food)
+        await db.commit()
+        FOOD_BY_NAME_CACHE.invalidate(name)
+        await db.refresh(db_food)
+        FOOD_SEARCH_INDEX.add(db_food.id, name)
+        return db_food
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error adding food")
+        return None
+
+async def get_or_create_foods(db: AsyncSession, foods: Dict[str, Tuple[float, float, float, float]]) -> Optional[Dict[str, int]]:
+    """
+    Resolve food names to IDs in one statement, adding the foods that don't exist yet.
+
+    Safe to call concurrently with the same names, an existing food keeps its macros.
+
+    Args:
+        db (AsyncSession): Database session
+        foods (Dict[str, Tuple[float, float, float, float]]): (calories, protein, carbs, fat) of each food, keyed by name
+
+    Returns:
+        Food IDs keyed by name if successful, None otherwise
+    """
+    if not foods:
+        return {}
+    try:
+        ids, created = await _get_or_create_ids(db, Food, [
+            {"name": name, "calories": calories, "protein": protein, "carbs": carbs, "fat": fat}
+            for name, (calories, protein, carbs, fat) in foods.items()
+        ])
+        await db.commit()
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error getting or creating foods")
+        return None
+    for name in created:
+        FOOD_BY_NAME_CACHE.invalidate(name)
+        FOOD_SEARCH_INDEX.add(ids[name], name)
+    return ids
+
+async def get_or_create_food(db: AsyncSession, name: str, calories: float, protein: float, carbs: float, fat: float) -> Optional[int]:
+    """
+    Get the ID of a food by name, adding the food if it doesn't exist, without a race between the check and the insert.
+
+    Args:
+        db (AsyncSession): Database session
+        name (str): Name of the food
+        calories (float): Calorie content, only used when adding
+        protein (float): Protein content, only used when adding
+        carbs (float): Carbohydrate content, only used when adding
+        fat (float): Fat content, only used when adding
+
+    Returns:
+        Food ID if successful, None otherwise
+    """
+    ids = await get_or_create_foods(db, {name: (calories, protein, carbs, fat)})
+    return None if ids is None else ids.get(name)
+
+async def get_food_by_name(db: AsyncSession, name: str) -> Optional[Food]:
+    """
+    Retrieve a food item by its name.
+
+    Args:
+        db (AsyncSession): Database session
+        name (str): Name of the food to search for
+
+    Returns:
+        Food object if found, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_food_by_name(name))).first()
+    except SQLAlchemyError:
+        logger.exception("Error fetching food by name")
+        return None
+
+async def get_food_by_name_cached(db: AsyncSession, name: str) -> Optional[FoodSnapshot]:
+    """
+    Retrieve a food item by its name through the shared catalogue cache.
+
+    Args:
+        db (AsyncSession): Database session, only used on a cache miss
+        name (str): Name of the food to search for
+
+    Returns:
+        Immutable FoodSnapshot if found, None otherwise
+    """
+    cached = FOOD_BY_NAME_CACHE.get(name)
+    if cached is not MISSING:
+        return cached
+    db_food = await get_food_by_name(db, name)
+    if db_food is None:
+        return None
+    snapshot = FoodSnapshot.from_orm(db_food)
+    FOOD_BY_NAME_CACHE.set(name, snapshot)
+    return snapshot
+
+async def get_food_version(db: AsyncSession, food_id: int) -> Optional[int]:
+    """
+    Retrieve the version of a food item, which changes whenever its details do.
+
+    Args:
+        db (AsyncSession): Database session
+        food_id (int): ID of the food
+
+    Returns:
+        Version number if the food exists, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_food_version(food_id))).first()
+    except SQLAlchemyError:
+        logger.exception("Error fetching food version")
+        return None
+
+async def get_food_with_details(db: AsyncSession, food_id: int) -> Optional[Food]:
+    """
+    Retrieve a food item with its micronutrients and sources eagerly loaded.
+
+    Args:
+        db (AsyncSession): Database session
+        food_id (int): ID of the food
+
+    Returns:
+        Food object if found, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_food_with_details(food_id))).first()
+    except SQLAlchemyError:
+        logger.exception("Error fetching food with details")
+        return None
+
+async def get_existing_food_ids(db: AsyncSession, food_ids: List[int]) -> Optional[Set[int]]:
+    """
+    Find which of some food IDs belong to existing foods, e.g. to validate a meal before logging it.
+
+    Args:
+        db (AsyncSession): Database session
+        food_ids (List[int]): IDs to check
+
+    Returns:
+        Set of the IDs that exist if successful, None otherwise
+    """
+    try:
+        return set((await db.scalars(statements.select_existing_food_ids(food_ids))).all())
+    except SQLAlchemyError:
+        logger.exception("Error fetching existing food IDs")
+        return None
+
+async def log_user_food(db: AsyncSession, user_id: int, food_id: int, quantity: float) -> Optional[UserMacroLog]:
+    """
+    Log a food item consumed by a user.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        food_id (int): ID of the food item
+        quantity (float): Quantity of the food consumed
+
+    Returns:
+        UserMacroLog object if successful, None otherwise
+    """
+    try:
+        db_log = UserMacroLog(user_id=user_id, food_id=food_id, quantity=quantity, timestamp=datetime.now(timezone.utc))
+        db.add(db_log)
+        await _apply_food_logs(db, user_id, db_log.timestamp.date(), [(food_id, quantity)])
+        await db.commit()
+        await db.refresh(db_log)
+        return db_log
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error logging user food")
+        return None
+
+async def log_user_foods_bulk(db: AsyncSession, user_id: int, entries: List[Tuple[int, float]], timestamp: Optional[datetime] = None) -> Optional[List[int]]:
+    """
+    Log several food items consumed by a user (e.g. a whole meal) in a single transaction.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        entries (List[Tuple[int, float]]): (food_id, quantity) pairs to log
+        timestamp (datetime, optional): Time the meal was eaten, defaults to now
+
+    Returns:
+        List of the new UserMacroLog IDs in the order of entries if successful, None otherwise
+    """
+    if not entries:
+        return []
+    timestamp = timestamp or datetime.now(timezone.utc)
+    try:
+        statement, rows = statements.insert_user_food_logs(user_id, entries, timestamp)
+        ids = (await db.scalars(statement, rows)).all()
+        await _apply_food_logs(db, user_id, to_utc_naive(timestamp).date(), entries)
+        await db.commit()
+        return list(ids)
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error bulk logging user foods")
+        return None
+
+async def log_user_food_with_micronutrients(db: AsyncSession, user_id: int, food_id: int, quantity: float, timestamp: Optional[datetime] = None) -> Optional[Tuple[int, int]]:
+    """
+    Log a food item consumed by a user, along with the micronutrients it contains, in a single transaction.
+
+    Each of the food's micronutrients is logged as quantity times its amount per serving, by one INSERT ... SELECT
+    rather than a round trip per micronutrient, so the cost doesn't grow with the number of micronutrients.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        food_id (int): ID of the food item
+        quantity (float): Quantity of the food consumed
+        timestamp (datetime, optional): Time of consumption, defaults to now
+
+    Returns:
+        (UserMacroLog ID, number of UserMicroLogs added) if successful, None otherwise
+    """
+    timestamp = timestamp or datetime.now(timezone.utc)
+    day = to_utc_naive(timestamp).date()
+    try:
+        statement, rows = statements.insert_user_food_logs(user_id, [(food_id, quantity)], timestamp)
+        log_id = (await db.scalars(statement, rows)).one()
+        micronutrient_logs = await db.execute(statements.insert_food_micronutrient_logs(user_id, food_id, quantity, timestamp, log_id))
+        await _apply_food_logs(db, user_id, day, [(food_id, quantity)])
+        await db.execute(food_micronutrient_summary_upsert(db, user_id, day, food_id, quantity))
+        await db.commit()
+        return log_id, micronutrient_logs.rowcount
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error logging user food with micronutrients")
+        return None
+
+async def get_user_food_logs(db: AsyncSession, user_id: int) -> Optional[List[UserMacroLog]]:
+    """
+    Retrieve all food logs for a specific user.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+
+    Returns:
+        List of UserMacroLog objects if successful, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_user_food_logs(user_id))).all()
+    except SQLAlchemyError:
+        logger.exception("Error fetching user food logs")
+        return None
+
+async def get_user_food_logs_with_details(db: AsyncSession, user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Optional[List[UserMacroLog]]:
+    """
+    Retrieve a user's food logs with each food's micronutrients eagerly loaded.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        since (datetime, optional): Only include logs at or after this time
+        until (datetime, optional): Only include logs before this time
+
+    Returns:
+        List of UserMacroLog objects ordered by time if successful, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_user_food_logs_with_details(user_id, since, until))).all()
+    except SQLAlchemyError:
+        logger.exception("Error fetching user food logs with details")
+        return None
+
+async def get_user_food_logs_page(db: AsyncSession, user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Optional[Tuple[List[UserMacroLog], Optional[str]]]:
+    """
+    Retrieve one page of a user's food logs, newest first.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        since (datetime, optional): Only include logs at or after this time
+        until (datetime, optional): Only include logs before this time
+        limit (int): Maximum number of logs in the page
+        cursor (str, optional): Cursor returned with the previous page
+
+    Returns:
+        (UserMacroLog objects, cursor for the next page or None on the last page) if successful, None otherwise
+
+    Raises:
+        ValueError: If the limit is below 1 or the cursor is malformed
+    """
+    try:
+        return await _get_log_page(db, UserMacroLog, user_id, since, until, limit, cursor)
+    except SQLAlchemyError:
+        logger.exception("Error fetching user food log page")
+        return None
+
+async def delete_user_food_log(db: AsyncSession, log_id: int) -> bool:
+    """
+    Delete a food log, and any micronutrient logs derived from it, and remove them from the user's daily summaries.
+
+    Args:
+        db (AsyncSession): Database session
+        log_id (int): ID of the UserMacroLog to delete
+
+    Returns:
+        True if the log was deleted, False otherwise
+    """
+    try:
+        db_log = await db.get(UserMacroLog, log_id)
+        if db_log is None:
+            return False
+        day = to_utc_naive(db_log.timestamp).date()
+        await _apply_food_logs(db, db_log.user_id, day, [(db_log.food_id, db_log.quantity)], sign=-1)
+        derived = [tuple(row) for row in await db.execute(statements.delete_food_log_micronutrients(log_id))]
+        if derived:
+            await _apply_micronutrient_logs(db, db_log.user_id, day, derived, sign=-1)
+        await db.delete(db_log)
+        await db.commit()
+        return True
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error deleting user food log")
+        return False
+
+async def add_micronutrient(db: AsyncSession, name: str, unit: str) -> Optional[Micronutrient]:
+    """
+    Get an existing micronutrient by name or create it if it doesn't exist.
+
+    Args:
+        db (AsyncSession): Database session
+        name (str): Name of the micronutrient
+        unit (str): Unit of measurement
+
+    Returns:
+        Micronutrient object if successful, None otherwise
+    """
+    try:
+        existing = (await db.scalars(statements.select_micronutrient_by_name(name))).first()
+        if existing:
+            return existing
+
+        db_micronutrient = Micronutrient(name=name, unit=unit)
+        db.add(db_micronutrient)
+        await db.commit()
+        MICRONUTRIENT_BY_NAME_CACHE.invalidate(name)
+        await db.refresh(db_micronutrient)
+        return db_micronutrient
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error getting or creating micronutrient")
+        return None
+
+async def get_or_create_micronutrients(db: AsyncSession, micronutrients: Dict[str, str]) -> Optional[Dict[str, int]]:
+    """
+    Resolve micronutrient names to IDs in one statement, adding the micronutrients that don't exist yet.
+
+    Safe to call concurrently with the same names, e.g. from parallel import workers.
+
+    Args:
+        db (AsyncSession): Database session
+        micronutrients (Dict[str, str]): Unit of each micronutrient, keyed by name
+
+    Returns:
+        Micronutrient IDs keyed by name if successful, None otherwise
+    """
+    if not micronutrients:
+        return {}
+    try:
+        ids, created = await _get_or_create_ids(db, Micronutrient, [{"name": name, "unit": unit} for name, unit in micronutrients.items()])
+        await db.commit()
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error getting or creating micronutrients")
+        return None
+    for name in created:
+        MICRONUTRIENT_BY_NAME_CACHE.invalidate(name)
+    return ids
+
+async def get_or_create_micronutrient(db: AsyncSession, name: str, unit: str) -> Optional[int]:
+    """
+    Get the ID of a micronutrient by name, adding it if it doesn't exist, without a race between the check and the insert.
+
+    Args:
+        db (AsyncSession): Database session
+        name (str): Name of the micronutrient
+        unit (str): Unit of measurement, only used when adding
+
+    Returns:
+        Micronutrient ID if successful, None otherwise
+    """
+    ids = await get_or_create_micronutrients(db, {name: unit})
+    return None if ids is None else ids.get(name)
+
+async def get_micronutrient_by_name(db: AsyncSession, name: str) -> Optional[Micronutrient]:
+    """
+    Retrieve a micronutrient by its name.
+
+    Args:
+        db (AsyncSession): Database session
+        name (str): Name of the micronutrient to search for
+
+    Returns:
+        Micronutrient object if found, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_micronutrient_by_name(name))).first()
+    except SQLAlchemyError:
+        logger.exception("Error fetching micronutrient by name")
+        return None
+
+async def get_micronutrient_by_name_cached(db: AsyncSession, name: str) -> Optional[MicronutrientSnapshot]:
+    """
+    Retrieve a micronutrient by its name through the shared catalogue cache.
+
+    Args:
+        db (AsyncSession): Database session, only used on a cache miss
+        name (str): Name of the micronutrient to search for
+
+    Returns:
+        Immutable MicronutrientSnapshot if found, None otherwise
+    """
+    cached = MICRONUTRIENT_BY_NAME_CACHE.get(name)
+    if cached is not MISSING:
+        return cached
+    db_micronutrient = await get_micronutrient_by_name(db, name)
+    if db_micronutrient is None:
+        return None
+    snapshot = MicronutrientSnapshot.from_orm(db_micronutrient)
+    MICRONUTRIENT_BY_NAME_CACHE.set(name, snapshot)
+    return snapshot
+
+async def add_food_micronutrient(db: AsyncSession, food_id: int, micronutrient_id: int, amount: float) -> Optional[FoodMicronutrient]:
+    """
+    Add a micronutrient amount to a food, or return the existing one.
+
+    Args:
+        db (AsyncSession): Database session
+        food_id (int): ID of the food
+        micronutrient_id (int): ID of the micronutrient
+        amount (float): Amount of the micronutrient in the food
+
+    Returns:
+        FoodMicronutrient object if successful, None otherwise
+    """
+    try:
+        existing = (await db.scalars(statements.select_existing_food_micronutrient(food_id, micronutrient_id))).first()
+        if existing:
+            return existing
+
+        db_food_micronutrient = FoodMicronutrient(food_id=food_id, micronutrient_id=micronutrient_id, amount=amount)
+        db.add(db_food_micronutrient)
+        await db.execute(statements.bump_food_version(food_id))
+        await db.commit()
+        FOOD_MICRONUTRIENTS_CACHE.invalidate(food_id)
+        await db.refresh(db_food_micronutrient)
+        return db_food_micronutrient
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error getting or creating micronutrient")
+        return None
+
+async def set_food_micronutrients(db: AsyncSession, food_id: int, entries: List[Tuple[int, float]]) -> Optional[List[FoodMicronutrient]]:
+    """
+    Add or update the amounts of many of a food's micronutrients with one upsert statement.
+
+    Micronutrients of the food that aren't in entries are left as they are.
+
+    Args:
+        db (AsyncSession): Database session
+        food_id (int): ID of the food
+        entries (List[Tuple[int, float]]): (micronutrient_id, amount) pairs
+
+    Returns:
+        List of the written FoodMicronutrient objects if successful, None otherwise
+    """
+    if not entries:
+        return []
+    try:
+        statement = statements.upsert_food_micronutrients(db, food_id, entries)
+        food_micronutrients = (await db.scalars(statement, execution_options={"populate_existing": True})).all()
+        await db.execute(statements.bump_food_version(food_id))
+        await db.commit()
+        FOOD_MICRONUTRIENTS_CACHE.invalidate(food_id)
+        return list(food_micronutrients)
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error setting food micronutrients")
+        return None
+
+async def get_food_micronutrients(db: AsyncSession, food_id: int) -> Optional[List[FoodMicronutrient]]:
+    """
+    Retrieve all micronutrients of a specific food.
+
+    Args:
+        db (AsyncSession): Database session
+        food_id (int): ID of the food
+
+    Returns:
+        List of FoodMicronutrient objects if successful, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_food_micronutrients(food_id))).all()
+    except SQLAlchemyError:
+        logger.exception("Error fetching food micronutrients")
+        return None
+
+async def get_food_micronutrients_cached(db: AsyncSession, food_id: int) -> Optional[Tuple[FoodMicronutrientSnapshot, ...]]:
+    """
+    Retrieve all micronutrients of a specific food through the shared catalogue cache.
+
+    Args:
+        db (AsyncSession): Database session, only used on a cache miss
+        food_id (int): ID of the food
+
+    Returns:
+        Tuple of immutable FoodMicronutrientSnapshot objects if successful, None otherwise
+    """
+    cached = FOOD_MICRONUTRIENTS_CACHE.get(food_id)
+    if cached is not MISSING:
+        return cached
+    db_food_micronutrients = await get_food_micronutrients(db, food_id)
+    if db_food_micronutrients is None:
+        return None
+    snapshot = tuple(FoodMicronutrientSnapshot.from_orm(fm) for fm in db_food_micronutrients)
+    FOOD_MICRONUTRIENTS_CACHE.set(food_id, snapshot)
+    return snapshot
+
+async def log_user_micronutrient_consumption(db: AsyncSession, user_id: int, micronutrient_id: int, amount: float) -> Optional[UserMicroLog]:
+    """
+    Log a user's micronutrient consumption.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        micronutrient_id (int): ID of the micronutrient
+        amount (float): Amount of micronutrient consumed
+
+    Returns:
+        UserMicroLog object if successful, None otherwise
+    """
+    try:
+        micronutrient_log = UserMicroLog(
+            user_id=user_id,
+            micronutrient_id=micronutrient_id,
+            amount=amount,
+            timestamp=datetime.now(timezone.utc)
+        )
+        db.add(micronutrient_log)
+        await _apply_micronutrient_logs(db, user_id, micronutrient_log.timestamp.date(), [(micronutrient_id, amount)])
+        await db.commit()
+        await db.refresh(micronutrient_log)
+        return micronutrient_log
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error logging micronutrient consumption")
+        return None
+
+async def log_user_micronutrients_bulk(db: AsyncSession, user_id: int, entries: List[Tuple[int, float]], timestamp: Optional[datetime] = None) -> Optional[List[int]]:
+    """
+    Log several micronutrient amounts consumed by a user in a single transaction.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        entries (List[Tuple[int, float]]): (micronutrient_id, amount) pairs to log
+        timestamp (datetime, optional): Time of consumption, defaults to now
+
+    Returns:
+        List of the new UserMicroLog IDs in the order of entries if successful, None otherwise
+    """
+    if not entries:
+        return []
+    timestamp = timestamp or datetime.now(timezone.utc)
+    try:
+        statement, rows = statements.insert_user_micronutrient_logs(user_id, entries, timestamp)
+        ids = (await db.scalars(statement, rows)).all()
+        await _apply_micronutrient_logs(db, user_id, to_utc_naive(timestamp).date(), entries)
+        await db.commit()
+        return list(ids)
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error bulk logging micronutrient consumption")
+        return None
+
+async def get_user_micronutrient_logs(db: AsyncSession, user_id: int) -> Optional[List[UserMicroLog]]:
+    """
+    Fetch the micronutrient logs for a user.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+
+    Returns:
+        List of UserMicroLog objects if successful, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_user_micronutrient_logs(user_id))).all()
+    except SQLAlchemyError:
+        logger.exception("Error fetching user micronutrient logs")
+        return None
+
+async def get_user_micronutrient_logs_with_details(db: AsyncSession, user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Optional[List[UserMicroLog]]:
+    """
+    Retrieve a user's micronutrient logs with the micronutrients joined in the same query.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        since (datetime, optional): Only include logs at or after this time
+        until (datetime, optional): Only include logs before this time
+
+    Returns:
+        List of UserMicroLog objects ordered by time if successful, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_user_micronutrient_logs_with_details(user_id, since, until))).all()
+    except SQLAlchemyError:
+        logger.exception("Error fetching user micronutrient logs with details")
+        return None
+
+async def get_user_micronutrient_logs_page(db: AsyncSession, user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Optional[Tuple[List[UserMicroLog], Optional[str]]]:
+    """
+    Retrieve one page of a user's micronutrient logs, newest first.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        since (datetime, optional): Only include logs at or after this time
+        until (datetime, optional): Only include logs before this time
+        limit (int): Maximum number of logs in the page
+        cursor (str, optional): Cursor returned with the previous page
+
+    Returns:
+        (UserMicroLog objects, cursor for the next page or None on the last page) if successful, None otherwise
+
+    Raises:
+        ValueError: If the limit is below 1 or the cursor is malformed
+    """
+    try:
+        return await _get_log_page(db, UserMicroLog, user_id, since, until, limit, cursor)
+    except SQLAlchemyError:
+        logger.exception("Error fetching user micronutrient log page")
+        return None
+
+async def delete_user_micronutrient_log(db: AsyncSession, log_id: int) -> bool:
+    """
+    Delete a micronutrient log and remove it from the user's daily summary.
+
+    Args:
+        db (AsyncSession): Database session
+        log_id (int): ID of the UserMicroLog to delete
+
+    Returns:
+        True if the log was deleted, False otherwise
+    """
+    try:
+        db_log = await db.get(UserMicroLog, log_id)
+        if db_log is None:
+            return False
+        await _apply_micronutrient_logs(db, db_log.user_id, to_utc_naive(db_log.timestamp).date(), [(db_log.micronutrient_id, db_log.amount)], sign=-1)
+        await db.delete(db_log)
+        await db.commit()
+        return True
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error deleting user micronutrient log")
+        return False
+
+async def get_user_daily_summary(db: AsyncSession, user_id: int, day: date) -> Optional[UserDailySummary]:
+    """
+    Retrieve a user's macro totals for one UTC day.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        day (date): Day to fetch
+
+    Returns:
+        UserDailySummary object if anything was logged that day, None otherwise
+    """
+    try:
+        return await db.get(UserDailySummary, (user_id, day))
+    except SQLAlchemyError:
+        logger.exception("Error fetching user daily summary")
+        return None
+
+async def get_user_daily_micronutrient_summary(db: AsyncSession, user_id: int, day: date) -> Optional[List[UserDailyMicronutrientSummary]]:
+    """
+    Retrieve a user's per-micronutrient totals for one UTC day.
+
+    Args:
+        db (AsyncSession): Database session
+        user_id (int): ID of the user
+        day (date): Day to fetch
+
+    Returns:
+        List of UserDailyMicronutrientSummary objects if successful, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_user_daily_micronutrient_summary(user_id, day))).all()
+    except SQLAlchemyError:
+        logger.exception("Error fetching user daily micronutrient summary")
+        return None
+
+async def add_food_source(db: AsyncSession, food_id: int, source_name: str, external_id: str) -> Optional[FoodSource]:
+    """
+    Add source information to a food item.
+
+    Args:
+        db (AsyncSession): Database session
+        food_id (int): ID of the food
+        source_name (str): Name of the source database
+        external_id (str): ID in the external database
+
+    Returns:
+        FoodSource object if successful, None otherwise
+    """
+    try:
+        food_source = FoodSource(
+            food_id=food_id,
+            source_name=source_name,
+            external_id=external_id
+        )
+        db.add(food_source)
+        await db.execute(statements.bump_food_version(food_id))
+        await db.commit()
+        await db.refresh(food_source)
+        FOOD_SEARCH_INDEX.add_alias(food_id, external_id)
+        return food_source
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception("Error adding food source")
+        return None
+
+async def get_food_sources(db: AsyncSession, food_id: int) -> Optional[List[FoodSource]]:
+    """
+    Retrieve all source information for a food item.
+
+    Args:
+        db (AsyncSession): Database session
+        food_id (int): ID of the food
+
+    Returns:
+        List of FoodSource objects if successful, None otherwise
+    """
+    try:
+        return (await db.scalars(statements.select_food_sources(food_id))).all()
+    except SQLAlchemyError:
+        logger.exception("Error fetching food sources")
+        return None
@@ -0,0 +1,95 @@
+"""
+Measure concurrent food log write throughput on SQLite, with and without the engine tuning in database.db.
+
+Run with: python -m database.benchmarks.concurrent_writes [--threads 8] [--writes 200]
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, Engine
+from sqlalchemy.orm import sessionmaker
+
+from database import queries
+from database.db import EngineSettings, create_database_engine
+from database.schema import Base
+
+@dataclass(frozen=True)
+class WriteResult:
+    name: str
+    writes: int
+    failures: int
+    seconds: float
+
+    @property
+    def writes_per_second(self) -> float:
+        return self.writes / self.seconds
+
+def run_writers(name: str, engine: Engine, threads: int, writes_per_thread: int) -> WriteResult:
+    """
+    Log foods from several threads at once, each with its own session, as concurrent API requests would.
+
+    Args:
+        name (str): Label for the result
+        engine (Engine): Engine for an empty database
+        threads (int): Number of concurrent writers
+        writes_per_thread (int): Foods each writer logs
+
+    Returns:
+        WriteResult with the successful writes, failed writes and elapsed time
+    """
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        user_ids = [queries.add_user(db, f"writer{i}", f"writer{i}@example.com", "hash").id for i in range(threads)]
+        food_id = queries.add_food(db, "Benchmark Bread", 265, 9, 49, 3.2).id
+
+    failures = [0] * threads
+    start = threading.Barrier(threads + 1)
+
+    def writer(index: int) -> None:
+        with Session() as db:
+            start.wait()
+            for _ in range(writes_per_thread):
+                if queries.log_user_food(db, user_ids[index], food_id, 1.0) is None:
+                    failures[index] += 1
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+    engine.dispose()
+    return WriteResult(name, threads * writes_per_thread - sum(failures), sum(failures), elapsed)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare concurrent SQLite write throughput before and after engine tuning.")
+    parser.add_argument("--threads", type=int, default=8, help="number of concurrent writers")
+    parser.add_argument("--writes", type=int, default=200, help="foods logged by each writer")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        # The engine database.db built before it was configurable: default journal and no pragmas
+        default_url = f"sqlite:///{os.path.join(directory, 'default.db')}"
+        default_engine = create_engine(default_url, connect_args={"check_same_thread": False})
+        results.append(run_writers("default", default_engine, args.threads, args.writes))
+
+        tuned_url = f"sqlite:///{os.path.join(directory, 'tuned.db')}"
+        tuned_engine = create_database_engine(tuned_url, EngineSettings.from_environ())
+        results.append(run_writers("tuned", tuned_engine, args.threads, args.writes))
+
+    print(f"{args.threads} writers x {args.writes} food logs")
+    print(f"{'engine':<10}{'writes':>10}{'failed':>10}{'seconds':>10}{'writes/s':>12}")
+    for result in results:
+        print(f"{result.name:<10}{result.writes:>10}{result.failures:>10}{result.seconds:>10.2f}{result.writes_per_second:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Generate a synthetic but realistically shaped dataset for benchmarking the query functions.
+
+Food choices follow a long-tailed popularity curve, as a few staples make up most real logs.
+"""
+import random
+import itertools
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select, insert, Engine
+from sqlalchemy.orm import Session
+
+from database.schema import User, Food, Micronutrient, FoodMicronutrient, FoodSource, UserMacroLog, UserMicroLog
+from database.summaries import rebuild_daily_summaries
+
+CHUNK_SIZE = 10_000
+MICRONUTRIENT_UNITS = ("mg", "μg", "g")
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    users: int
+    foods: int
+    micronutrients: int
+    days: int
+    food_logs_per_day: int
+    micronutrient_logs_per_day: int
+    micronutrients_per_food: int
+    seed: int = 0
+
+    @property
+    def food_logs(self) -> int:
+        return self.users * self.days * self.food_logs_per_day
+
+    @property
+    def micronutrient_logs(self) -> int:
+        return self.users * self.days * self.micronutrient_logs_per_day
+
+PRESETS = {
+    "tiny": DatasetSpec(users=5, foods=50, micronutrients=10, days=7, food_logs_per_day=3, micronutrient_logs_per_day=1, micronutrients_per_food=3),
+    "small": DatasetSpec(users=100, foods=2_000, micronutrients=40, days=30, food_logs_per_day=4, micronutrient_logs_per_day=2, micronutrients_per_food=8),
+    "medium": DatasetSpec(users=1_000, foods=20_000, micronutrients=80, days=180, food_logs_per_day=5, micronutrient_logs_per_day=2, micronutrients_per_food=10),
+    # 10k users logging for two years
+    "large": DatasetSpec(users=10_000, foods=100_000, micronutrients=120, days=730, food_logs_per_day=5, micronutrient_logs_per_day=3, micronutrients_per_food=12),
+}
+
+@dataclass(frozen=True)
+class Dataset:
+    spec: DatasetSpec
+    user_ids: List[int]
+    food_ids: List[int]
+    micronutrient_ids: List[int]
+    start: datetime  # Midnight UTC of the first logged day, naive like the stored timestamps
+
+    @property
+    def end(self) -> datetime:
+        return self.start + timedelta(days=self.spec.days)
+
+def username(index: int) -> str:
+    return f"bench_user{index}"
+
+def food_name(index: int) -> str:
+    return f"Bench Food {index}"
+
+def micronutrient_name(index: int) -> str:
+    return f"Bench Micronutrient {index}"
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
+
+def _insert(db: Session, model, rows: Iterable[dict], chunk_size: int) -> None:
+    # Plain executemany inserts, committed per chunk, so the largest presets don't build one huge transaction
+    for chunk in _chunks(rows, chunk_size):
+        db.execute(insert(model), chunk)
+        db.commit()
+
+def populate(engine: Engine, spec: DatasetSpec, chunk_size: int = CHUNK_SIZE, progress: Optional[Callable[[str], None]] = print) -> Dataset:
+    """
+    Fill an empty database with users, a food catalogue, micronutrients and dense logs, then build the daily summaries.
+
+    The same spec always generates the same rows, dated back from today.
+
+    Args:
+        engine (Engine): Engine for a database with empty tables
+        spec (DatasetSpec): Size of the dataset, e.g. from PRESETS
+        chunk_size (int): Rows inserted per transaction
+        progress (Callable, optional): Receives a line as each table is written
+
+    Returns:
+        Dataset with the generated IDs, for picking benchmark arguments
+    """
+    rng = random.Random(spec.seed)
+    today = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    start = today - timedelta(days=spec.days)
+
+    def report(message: str) -> None:
+        if progress is not None:
+            progress(message)
+
+    with Session(engine) as db:
+        _insert(db, User, (
+            {"username": username(i), "email": f"{username(i)}@example.com", "password_hash": "hash", "created_at": start}
+            for i in range(spec.users)
+        ), chunk_size)
+        user_ids = list(db.scalars(select(User.id).order_by(User.id)))
+        report(f"Wrote {len(user_ids):,} users")
+
+        _insert(db, Food, (
+            {
+                "name": food_name(i),
+                "calories": round(rng.uniform(10, 900), 1),
+                "protein": round(rng.uniform(0, 40), 1),
+                "carbs": round(rng.uniform(0, 90), 1),
+                "fat": round(rng.uniform(0, 60), 1),
+            }
+            for i in range(spec.foods)
+        ), chunk_size)
+        food_ids = list(db.scalars(select(Food.id).order_by(Food.id)))
+        _insert(db, FoodSource, (
+            {"food_id": food_id, "source_name": "Benchmark", "external_id": str(food_id)} for food_id in food_ids
+        ), chunk_size)
+        report(f"Wrote {len(food_ids):,} foods")
+
+        _insert(db, Micronutrient, (
+            {"name": micronutrient_name(i), "unit": rng.choice(MICRONUTRIENT_UNITS)} for i in range(spec.micronutrients)
+        ), chunk_size)
+        micronutrient_ids = list(db.scalars(select(Micronutrient.id).order_by(Micronutrient.id)))
+        per_food = min(spec.micronutrients_per_food, len(micronutrient_ids))
+        _insert(db, FoodMicronutrient, (
+            {"food_id": food_id, "micronutrient_id": micronutrient_id, "amount": round(rng.uniform(0.01, 500), 2)}
+            for food_id in food_ids
+            for micronutrient_id in rng.sample(micronutrient_ids, per_food)
+        ), chunk_size)
+        report(f"Wrote {len(micronutrient_ids):,} micronutrients")
+
+        # Zipf-like popularity: the food at rank r is chosen in proportion to 1 / r
+        food_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(food_ids) + 1)))
+
+        def food_logs() -> Iterator[dict]:
+            for user_id in user_ids:
+                for day in range(spec.days):
+                    midnight = start + timedelta(days=day)
+                    for food_id in rng.choices(food_ids, cum_weights=food_weights, k=spec.food_logs_per_day):
+                        yield {
+                            "user_id": user_id,
+                            "food_id": food_id,
+                            "quantity": round(rng.uniform(0.25, 3), 2),
+                            "timestamp": midnight + timedelta(seconds=rng.randrange(86_400)),
+                        }
+
+        def micronutrient_logs() -> Iterator[dict]:
+            for user_id in user_ids:
+                for day in range(spec.days):
+                    midnight = start + timedelta(days=day)
+                    for micronutrient_id in rng.choices(micronutrient_ids, k=spec.micronutrient_logs_per_day):
+                        yield {
+                            "user_id": user_id,
+                            "micronutrient_id": micronutrient_id,
+                            "amount": round(rng.uniform(0.1, 100), 2),
+                            "timestamp": midnight + timedelta(seconds=rng.randrange(86_400)),
+                        }
+
+        _insert(db, UserMacroLog, food_logs(), chunk_size)
+        report(f"Wrote {spec.food_logs:,} food logs")
+        _insert(db, UserMicroLog, micronutrient_logs(), chunk_size)
+        report(f"Wrote {spec.micronutrient_logs:,} micronutrient logs")
+
+        summaries = rebuild_daily_summaries(db)
+        report(f"Wrote {summaries:,} daily summaries")
+
+    return Dataset(spec, user_ids, food_ids, micronutrient_ids, start)
@@ -0,0 +1,128 @@
+"""
+Measure how parsing in database.ingest scales with worker processes, on a generated Open Food Facts sample dump
+or on a real dump.
+
+Run with: python -m database.benchmarks.ingest_scaling [--products 200000] [--workers 1,2,4,8] [--write]
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from database.db import EngineSettings, create_database_engine
+from database.importer import parse_open_food_facts, parse_usda_csv
+from database.ingest import DUMP_USDA, DUMP_OPEN_FOOD_FACTS, DEFAULT_WORKERS, parse_parallel, ingest
+from database.schema import Base
+
+DEFAULT_PRODUCTS = 200_000
+CHUNK_SIZE = 2_000
+# Nutriment keys seen on real products, most of which the importer keeps as micronutrients
+SAMPLE_NUTRIMENTS = (
+    "sodium", "salt", "sugars", "saturated-fat", "fiber", "calcium", "iron", "magnesium", "potassium", "zinc",
+    "vitamin-a", "vitamin-c", "vitamin-d", "vitamin-e", "vitamin-b1", "vitamin-b2", "vitamin-pp", "vitamin-b6",
+    "vitamin-b9", "vitamin-b12", "phosphorus", "iodine", "selenium", "copper", "manganese", "nova-group",
+)
+
+@dataclass(frozen=True)
+class ParseResult:
+    name: str
+    workers: int
+    records: int
+    seconds: float
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.seconds
+
+def write_sample_dump(path: str, products: int, seed: int = 0) -> None:
+    """Write an Open Food Facts style JSONL dump of products with random macros and 10 to 25 other nutriments."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as file:
+        for i in range(products):
+            nutriments = {
+                "energy-kcal_100g": round(rng.uniform(0, 900), 1),
+                "proteins_100g": round(rng.uniform(0, 40), 1),
+                "carbohydrates_100g": round(rng.uniform(0, 90), 1),
+                "fat_100g": round(rng.uniform(0, 60), 1),
+            }
+            for key in rng.sample(SAMPLE_NUTRIMENTS, rng.randint(10, 25)):
+                nutriments[f"{key}_100g"] = round(rng.uniform(0, 1), 5)
+                nutriments[f"{key}_unit"] = "g"
+            product = {
+                "code": str(1_000_000_000_000 + i),
+                "product_name": f"Sample Product {i}",
+                "brands": f"Brand {i % 500}",
+                "categories_tags": ["en:snacks", "en:sweet-snacks"],
+                "nutriments": nutriments,
+            }
+            file.write(json.dumps(product) + "\n")
+
+def measure_serial(dump: str, path: str) -> ParseResult:
+    # The importer's single process parser, for the overhead of shipping chunks to workers
+    start = time.perf_counter()
+    records = sum(1 for _ in (parse_usda_csv(path) if dump == DUMP_USDA else parse_open_food_facts(path)))
+    return ParseResult("serial", 1, records, time.perf_counter() - start)
+
+def measure_parallel(dump: str, path: str, workers: int, chunk_size: int = CHUNK_SIZE) -> ParseResult:
+    start = time.perf_counter()
+    records = sum(len(chunk) for chunk in parse_parallel(dump, path, workers, chunk_size))
+    return ParseResult("parallel", workers, records, time.perf_counter() - start)
+
+def measure_ingest(dump: str, path: str, workers: int, directory: str) -> ParseResult:
+    engine = create_database_engine(f"sqlite:///{os.path.join(directory, f'ingest-{workers}.db')}", EngineSettings.from_environ())
+    try:
+        Base.metadata.create_all(bind=engine)
+        stats = ingest(sessionmaker(bind=engine), dump, path, workers, progress=None)
+    finally:
+        engine.dispose()
+    return ParseResult("ingest", workers, stats.records, stats.seconds)
+
+def default_worker_counts(cores: int) -> List[int]:
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure parse throughput of the parallel ingestion pipeline by worker count.")
+    parser.add_argument("--products", type=int, default=DEFAULT_PRODUCTS, help="products in the generated sample dump")
+    parser.add_argument("--dump", choices=[DUMP_USDA, DUMP_OPEN_FOOD_FACTS], default=DUMP_OPEN_FOOD_FACTS, help="kind of dump given with --path")
+    parser.add_argument("--path", help="existing dump to parse instead of a generated one")
+    parser.add_argument("--workers", help="comma separated worker counts, defaults to powers of two up to the core count")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--write", action="store_true", help="also import into a temporary SQLite database with each worker count")
+    args = parser.parse_args()
+
+    worker_counts = [int(count) for count in args.workers.split(",")] if args.workers else default_worker_counts(DEFAULT_WORKERS)
+    with tempfile.TemporaryDirectory() as directory:
+        path: Optional[str] = args.path
+        if path is None:
+            path = os.path.join(directory, "sample.jsonl")
+            write_sample_dump(path, args.products)
+
+        results = [measure_serial(args.dump, path)]
+        results.extend(measure_parallel(args.dump, path, workers, args.chunk_size) for workers in worker_counts)
+        if args.write:
+            results.extend(measure_ingest(args.dump, path, workers, directory) for workers in worker_counts)
+
+    baseline = {result.name: result.records_per_second for result in results if result.workers == 1 and result.name != "serial"}
+    print(f"{os.cpu_count()} cores, {results[0].records:,} records")
+    print(f"{'stage':<10}{'workers':>8}{'seconds':>10}{'records/s':>12}{'speedup':>9}{'efficiency':>12}")
+    for result in results:
+        speedup = result.records_per_second / baseline.get(result.name, results[0].records_per_second)
+        print(
+            f"{result.name:<10}{result.workers:>8}{result.seconds:>10.2f}{result.records_per_second:>12,.0f}"
+            f"{speedup:>9.2f}{speedup / result.workers:>12.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
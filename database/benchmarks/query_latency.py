@@ -0,0 +1,506 @@
+"""
+Measure the latency of every function in database.queries against a generated dataset, on SQLite and PostgreSQL.
+
+Run with: python -m database.benchmarks.query_latency [--preset small] [--postgres-url URL] [--save-baseline | --compare]
+
+PostgreSQL runs need a sync driver (e.g. psycopg2) and a database the benchmark may drop and recreate tables in.
+Baselines are saved per backend and preset in database/benchmarks/baselines, and are only comparable with runs
+on similar hardware.
+Only SQLite baselines are committed, so --compare skips a --postgres-url run until a PostgreSQL baseline is
+saved with --save-baseline on the hardware it will be compared on.
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import statistics
+from dataclasses import dataclass, asdict
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import queries
+from database.benchmarks.data import PRESETS, Dataset, populate, username, food_name, micronutrient_name
+from database.cache import clear_catalogue_caches
+from database.db import EngineSettings, create_database_engine
+from database.schema import Base, UserMacroLog, UserMicroLog
+
+BASELINE_DIRECTORY = os.path.join(os.path.dirname(__file__), "baselines")
+DEFAULT_ITERATIONS = 200
+DEFAULT_WARMUP = 10
+DEFAULT_TOLERANCE = 0.5  # Fraction a latency may grow by before it counts as a regression
+MIN_REGRESSION_MS = 0.25  # Smaller changes are within the noise of sub-millisecond queries
+MEAL_SIZE = 5
+RECENT_DAYS = 30
+
+# Builds the arguments of each call up front, so choosing them isn't timed
+Arguments = Callable[[Dataset, random.Random, Session, int], List[tuple]]
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    arguments: Arguments
+    call: Callable[..., int]  # Calls the query function, returning the number of rows it read or wrote
+
+@dataclass(frozen=True)
+class CaseResult:
+    name: str
+    calls: int
+    rows: int
+    seconds: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @classmethod
+    def from_timings(cls, name: str, timings: List[float], rows: int) -> "CaseResult":
+        if len(timings) > 1:
+            cuts = statistics.quantiles(timings, n=100, method="inclusive")
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = timings[0]
+        return cls(name, len(timings), rows, sum(timings), p50 * 1000, p95 * 1000, p99 * 1000)
+
+CASES: List[Case] = []
+
+def case(arguments: Arguments):
+    # Registers a benchmark named after the query function it calls
+    def register(call: Callable[..., int]) -> Callable[..., int]:
+        CASES.append(Case(call.__name__, arguments, call))
+        return call
+    return register
+
+def _checked(result):
+    # Query functions log and return None on database errors, which would otherwise look like fast calls
+    if result is None:
+        raise RuntimeError("Query function failed, see the logged error")
+    return result
+
+def _no_arguments(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [()] * n
+
+def _users(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(rng.choice(data.user_ids),) for _ in range(n)]
+
+def _usernames(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(username(rng.randrange(data.spec.users)),) for _ in range(n)]
+
+def _recent_logs(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    since = data.end - timedelta(days=RECENT_DAYS)
+    return [(rng.choice(data.user_ids), since) for _ in range(n)]
+
+def _user_days(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [
+        (rng.choice(data.user_ids), (data.start + timedelta(days=rng.randrange(data.spec.days))).date())
+        for _ in range(n)
+    ]
+
+def _foods(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(rng.choice(data.food_ids),) for _ in range(n)]
+
+def _food_id_lists(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(rng.choices(data.food_ids, k=MEAL_SIZE),) for _ in range(n)]
+
+def _food_names(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(food_name(rng.randrange(data.spec.foods)),) for _ in range(n)]
+
+def _micronutrient_names(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(micronutrient_name(rng.randrange(data.spec.micronutrients)),) for _ in range(n)]
+
+def _new_users(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(f"bench_new_user{i}", f"bench_new_user{i}@example.com", "hash") for i in range(n)]
+
+def _new_foods(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(f"Bench New Food {i}", 250.0, 10.0, 30.0, 8.0) for i in range(n)]
+
+def _food_lookups(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    # Every other call adds a food, as when an import or API request meets a mix of known and new names
+    return [
+        (food_name(rng.randrange(data.spec.foods)) if i % 2 else f"Bench Created Food {i}", 250.0, 10.0, 30.0, 8.0)
+        for i in range(n)
+    ]
+
+def _food_batches(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    # One new food per batch, the rest existing
+    return [
+        ({name: (250.0, 10.0, 30.0, 8.0) for name in [f"Bench Created Foods {i}", *(food_name(rng.randrange(data.spec.foods)) for _ in range(MEAL_SIZE - 1))]},)
+        for i in range(n)
+    ]
+
+def _new_micronutrients(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(f"Bench New Micronutrient {i}", "mg") for i in range(n)]
+
+def _micronutrient_lookups(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [
+        (micronutrient_name(rng.randrange(data.spec.micronutrients)) if i % 2 else f"Bench Created Micronutrient {i}", "mg")
+        for i in range(n)
+    ]
+
+def _micronutrient_batches(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [
+        ({name: "mg" for name in [f"Bench Created Micronutrients {i}", *(micronutrient_name(rng.randrange(data.spec.micronutrients)) for _ in range(MEAL_SIZE - 1))]},)
+        for i in range(n)
+    ]
+
+def _new_food_micronutrients(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(rng.choice(data.food_ids), rng.choice(data.micronutrient_ids), 1.5) for _ in range(n)]
+
+def _food_profiles(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    per_food = min(data.spec.micronutrients_per_food, len(data.micronutrient_ids))
+    return [
+        (rng.choice(data.food_ids), [(micronutrient_id, 1.5) for micronutrient_id in rng.sample(data.micronutrient_ids, per_food)])
+        for _ in range(n)
+    ]
+
+def _new_food_sources(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(rng.choice(data.food_ids), "Benchmark New", str(i)) for i in range(n)]
+
+def _food_logs(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(rng.choice(data.user_ids), rng.choice(data.food_ids), 1.0) for _ in range(n)]
+
+def _meals(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [
+        (rng.choice(data.user_ids), [(food_id, 1.0) for food_id in rng.choices(data.food_ids, k=MEAL_SIZE)])
+        for _ in range(n)
+    ]
+
+def _micronutrient_logs(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(rng.choice(data.user_ids), rng.choice(data.micronutrient_ids), 2.5) for _ in range(n)]
+
+def _micronutrient_meals(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [
+        (rng.choice(data.user_ids), [(micronutrient_id, 2.5) for micronutrient_id in rng.choices(data.micronutrient_ids, k=MEAL_SIZE)])
+        for _ in range(n)
+    ]
+
+def _food_log_ids(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(log_id,) for log_id in db.scalars(select(UserMacroLog.id).order_by(UserMacroLog.id).limit(n))]
+
+def _micronutrient_log_ids(data: Dataset, rng: random.Random, db: Session, n: int) -> List[tuple]:
+    return [(log_id,) for log_id in db.scalars(select(UserMicroLog.id).order_by(UserMicroLog.id).limit(n))]
+
+# Reads run before the writes and deletes, so every backend reads the same generated data
+
+@case(_usernames)
+def get_user_by_username(db: Session, name: str) -> int:
+    return int(_checked(queries.get_user_by_username(db, name)) is not None)
+
+@case(_no_arguments)
+def get_all_users(db: Session) -> int:
+    return len(_checked(queries.get_all_users(db)))
+
+@case(_users)
+def user_exists(db: Session, user_id: int) -> int:
+    return int(_checked(queries.user_exists(db, user_id)))
+
+@case(_food_names)
+def get_food_by_name(db: Session, name: str) -> int:
+    return int(_checked(queries.get_food_by_name(db, name)) is not None)
+
+@case(_food_names)
+def get_food_by_name_cached(db: Session, name: str) -> int:
+    return int(_checked(queries.get_food_by_name_cached(db, name)) is not None)
+
+@case(_foods)
+def get_food_version(db: Session, food_id: int) -> int:
+    return int(_checked(queries.get_food_version(db, food_id)) is not None)
+
+@case(_foods)
+def get_food_with_details(db: Session, food_id: int) -> int:
+    food = _checked(queries.get_food_with_details(db, food_id))
+    return 1 + len(food.micronutrients) + len(food.sources)
+
+@case(_food_id_lists)
+def get_existing_food_ids(db: Session, food_ids: List[int]) -> int:
+    return len(_checked(queries.get_existing_food_ids(db, food_ids)))
+
+@case(_users)
+def get_user_food_logs(db: Session, user_id: int) -> int:
+    return len(_checked(queries.get_user_food_logs(db, user_id)))
+
+@case(_recent_logs)
+def get_user_food_logs_with_details(db: Session, user_id: int, since) -> int:
+    return len(_checked(queries.get_user_food_logs_with_details(db, user_id, since=since)))
+
+@case(_users)
+def get_user_food_logs_page(db: Session, user_id: int) -> int:
+    return len(_checked(queries.get_user_food_logs_page(db, user_id))[0])
+
+@case(_micronutrient_names)
+def get_micronutrient_by_name(db: Session, name: str) -> int:
+    return int(_checked(queries.get_micronutrient_by_name(db, name)) is not None)
+
+@case(_micronutrient_names)
+def get_micronutrient_by_name_cached(db: Session, name: str) -> int:
+    return int(_checked(queries.get_micronutrient_by_name_cached(db, name)) is not None)
+
+@case(_foods)
+def get_food_micronutrients(db: Session, food_id: int) -> int:
+    return len(_checked(queries.get_food_micronutrients(db, food_id)))
+
+@case(_foods)
+def get_food_micronutrients_cached(db: Session, food_id: int) -> int:
+    return len(_checked(queries.get_food_micronutrients_cached(db, food_id)))
+
+@case(_users)
+def get_user_micronutrient_logs(db: Session, user_id: int) -> int:
+    return len(_checked(queries.get_user_micronutrient_logs(db, user_id)))
+
+@case(_recent_logs)
+def get_user_micronutrient_logs_with_details(db: Session, user_id: int, since) -> int:
+    return len(_checked(queries.get_user_micronutrient_logs_with_details(db, user_id, since=since)))
+
+@case(_users)
+def get_user_micronutrient_logs_page(db: Session, user_id: int) -> int:
+    return len(_checked(queries.get_user_micronutrient_logs_page(db, user_id))[0])
+
+@case(_user_days)
+def get_user_daily_summary(db: Session, user_id: int, day) -> int:
+    return int(queries.get_user_daily_summary(db, user_id, day) is not None)
+
+@case(_user_days)
+def get_user_daily_micronutrient_summary(db: Session, user_id: int, day) -> int:
+    return len(_checked(queries.get_user_daily_micronutrient_summary(db, user_id, day)))
+
+@case(_foods)
+def get_food_sources(db: Session, food_id: int) -> int:
+    return len(_checked(queries.get_food_sources(db, food_id)))
+
+@case(_new_users)
+def add_user(db: Session, name: str, email: str, password_hash: str) -> int:
+    _checked(queries.add_user(db, name, email, password_hash))
+    return 1
+
+@case(_new_foods)
+def add_food(db: Session, name: str, calories: float, protein: float, carbs: float, fat: float) -> int:
+    _checked(queries.add_food(db, name, calories, protein, carbs, fat))
+    return 1
+
+@case(_food_lookups)
+def get_or_create_food(db: Session, name: str, calories: float, protein: float, carbs: float, fat: float) -> int:
+    _checked(queries.get_or_create_food(db, name, calories, protein, carbs, fat))
+    return 1
+
+@case(_food_batches)
+def get_or_create_foods(db: Session, foods: Dict[str, Tuple[float, float, float, float]]) -> int:
+    return len(_checked(queries.get_or_create_foods(db, foods)))
+
+@case(_new_micronutrients)
+def add_micronutrient(db: Session, name: str, unit: str) -> int:
+    _checked(queries.add_micronutrient(db, name, unit))
+    return 1
+
+@case(_micronutrient_lookups)
+def get_or_create_micronutrient(db: Session, name: str, unit: str) -> int:
+    _checked(queries.get_or_create_micronutrient(db, name, unit))
+    return 1
+
+@case(_micronutrient_batches)
+def get_or_create_micronutrients(db: Session, micronutrients: Dict[str, str]) -> int:
+    return len(_checked(queries.get_or_create_micronutrients(db, micronutrients)))
+
+@case(_new_food_micronutrients)
+def add_food_micronutrient(db: Session, food_id: int, micronutrient_id: int, amount: float) -> int:
+    _checked(queries.add_food_micronutrient(db, food_id, micronutrient_id, amount))
+    return 1
+
+@case(_food_profiles)
+def set_food_micronutrients(db: Session, food_id: int, entries: List[Tuple[int, float]]) -> int:
+    return len(_checked(queries.set_food_micronutrients(db, food_id, entries)))
+
+@case(_new_food_sources)
+def add_food_source(db: Session, food_id: int, source_name: str, external_id: str) -> int:
+    _checked(queries.add_food_source(db, food_id, source_name, external_id))
+    return 1
+
+@case(_food_logs)
+def log_user_food(db: Session, user_id: int, food_id: int, quantity: float) -> int:
+    _checked(queries.log_user_food(db, user_id, food_id, quantity))
+    return 1
+
+@case(_meals)
+def log_user_foods_bulk(db: Session, user_id: int, entries: list) -> int:
+    return len(_checked(queries.log_user_foods_bulk(db, user_id, entries)))
+
+@case(_food_logs)
+def log_user_food_with_micronutrients(db: Session, user_id: int, food_id: int, quantity: float) -> int:
+    # The food log plus the micronutrient logs derived from it
+    return 1 + _checked(queries.log_user_food_with_micronutrients(db, user_id, food_id, quantity))[1]
+
+@case(_micronutrient_logs)
+def log_user_micronutrient_consumption(db: Session, user_id: int, micronutrient_id: int, amount: float) -> int:
+    _checked(queries.log_user_micronutrient_consumption(db, user_id, micronutrient_id, amount))
+    return 1
+
+@case(_micronutrient_meals)
+def log_user_micronutrients_bulk(db: Session, user_id: int, entries: list) -> int:
+    return len(_checked(queries.log_user_micronutrients_bulk(db, user_id, entries)))
+
+@case(_food_log_ids)
+def delete_user_food_log(db: Session, log_id: int) -> int:
+    return int(queries.delete_user_food_log(db, log_id))
+
+@case(_micronutrient_log_ids)
+def delete_user_micronutrient_log(db: Session, log_id: int) -> int:
+    return int(queries.delete_user_micronutrient_log(db, log_id))
+
+def run_case(session_factory: sessionmaker, dataset: Dataset, benchmark: Case, iterations: int, warmup: int, seed: int = 0) -> CaseResult:
+    """
+    Time calls of one query function, after some untimed warmup calls.
+
+    Each call gets a fresh transaction and an empty identity map, as an API request would.
+
+    Args:
+        session_factory (sessionmaker): Sessions for the benchmark database
+        dataset (Dataset): Data the database was populated with
+        benchmark (Case): Query function to time
+        iterations (int): Timed calls
+        warmup (int): Untimed calls made first, e.g. to fill caches
+        seed (int): Seed for choosing the call arguments
+
+    Returns:
+        CaseResult with the latency percentiles and rows per second of the timed calls
+    """
+    clear_catalogue_caches()
+    with session_factory() as db:
+        arguments = benchmark.arguments(dataset, random.Random(seed), db, warmup + iterations)
+        db.close()
+        timings = []
+        rows = 0
+        for index, args in enumerate(arguments):
+            started = time.perf_counter()
+            count = benchmark.call(db, *args)
+            elapsed = time.perf_counter() - started
+            db.close()
+            if index >= warmup:
+                timings.append(elapsed)
+                rows += count
+    return CaseResult.from_timings(benchmark.name, timings, rows)
+
+def run_suite(engine: Engine, dataset: Dataset, iterations: int = DEFAULT_ITERATIONS, warmup: int = DEFAULT_WARMUP, cases: Optional[List[Case]] = None) -> List[CaseResult]:
+    """
+    Time every registered query function against a populated database.
+
+    Args:
+        engine (Engine): Engine for the database populate wrote to
+        dataset (Dataset): Data the database was populated with
+        iterations (int): Timed calls per function
+        warmup (int): Untimed calls per function
+        cases (List[Case], optional): Functions to time, defaults to all of them
+
+    Returns:
+        One CaseResult per function, in the order they ran
+    """
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    return [run_case(session_factory, dataset, benchmark, iterations, warmup) for benchmark in (cases or CASES)]
+
+def baseline_path(backend: str, preset: str) -> str:
+    return os.path.join(BASELINE_DIRECTORY, f"{backend}-{preset}.json")
+
+def save_baseline(path: str, results: List[CaseResult]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({result.name: asdict(result) for result in results}, file, indent=4)
+        file.write("\n")
+
+def load_baseline(path: str) -> Dict[str, dict]:
+    with open(path) as file:
+        return json.load(file)
+
+def find_regressions(results: List[CaseResult], baseline: Dict[str, dict], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Compare results with a saved baseline.
+
+    Args:
+        results (List[CaseResult]): Results of this run
+        baseline (Dict[str, dict]): Baseline from load_baseline
+        tolerance (float): Fraction the p50 or p95 latency may grow by, growth under MIN_REGRESSION_MS is always allowed
+
+    Returns:
+        A description of each function that got slower, empty if none did
+    """
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            continue
+        for percentile in ("p50_ms", "p95_ms"):
+            before, after = previous[percentile], getattr(result, percentile)
+            if after > before * (1 + tolerance) and after - before >= MIN_REGRESSION_MS:
+                regressions.append(f"{result.name}: {percentile[:3]} {before:.3f} ms -> {after:.3f} ms")
+    return regressions
+
+def print_results(backend: str, results: List[CaseResult]) -> None:
+    print(f"{backend}")
+    print(f"{'query':<42}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rows/s':>14}")
+    for result in results:
+        print(
+            f"{result.name:<42}{result.calls:>7}{result.p50_ms:>10.3f}{result.p95_ms:>10.3f}"
+            f"{result.p99_ms:>10.3f}{result.rows_per_second:>14,.0f}"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time every database query function against generated data on SQLite and PostgreSQL.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small", help="size of the generated dataset")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="timed calls per query function")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="untimed calls per query function")
+    parser.add_argument("--postgres-url", default=os.environ.get("BENCHMARK_POSTGRES_URL"),
+                        help="PostgreSQL database to also benchmark, whose tables are dropped (default: BENCHMARK_POSTGRES_URL)")
+    baseline = parser.add_mutually_exclusive_group()
+    baseline.add_argument("--save-baseline", action="store_true", help="save the results as the new baselines")
+    baseline.add_argument("--compare", action="store_true", help="fail if any query is slower than its baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed latency growth over the baseline")
+    args = parser.parse_args()
+
+    # Generating the larger presets runs plenty of statements over the slow query threshold
+    logging.getLogger("database.slow_query").setLevel(logging.ERROR)
+
+    regressions = []
+    with tempfile.TemporaryDirectory() as directory:
+        urls = [f"sqlite:///{os.path.join(directory, 'benchmark.db')}"]
+        if args.postgres_url:
+            urls.append(args.postgres_url)
+
+        for url in urls:
+            engine = create_database_engine(url, EngineSettings.from_environ())
+            backend = engine.dialect.name
+            try:
+                Base.metadata.drop_all(bind=engine)
+                Base.metadata.create_all(bind=engine)
+                print(f"Generating the {args.preset} dataset on {backend}")
+                dataset = populate(engine, PRESETS[args.preset])
+                results = run_suite(engine, dataset, args.iterations, args.warmup)
+            finally:
+                engine.dispose()
+            print_results(backend, results)
+
+            path = baseline_path(backend, args.preset)
+            if args.save_baseline:
+                save_baseline(path, results)
+                print(f"Saved baseline to {path}")
+            elif args.compare:
+                if not os.path.exists(path):
+                    print(f"No baseline at {path}, skipping comparison")
+                    continue
+                found = find_regressions(results, load_baseline(path), args.tolerance)
+                regressions.extend(f"{backend} {regression}" for regression in found)
+
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure how long the in-memory food search index takes to load and answer queries on a generated catalogue.
+
+Run with: python -m database.benchmarks.search_latency [--foods 500000] [--iterations 200]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from dataclasses import dataclass
+from typing import Iterator, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database.db import EngineSettings, create_database_engine
+from database.schema import Base, Food
+from database.search import FoodSearchIndex
+
+DEFAULT_FOODS = 500_000
+DEFAULT_ITERATIONS = 200
+CHUNK_SIZE = 10_000
+# A few words appear in a large share of real food names, which is what makes their postings long
+COMMON_WORDS = ("raw", "cooked", "chicken", "milk", "cheese", "apple", "pie", "bread", "beef", "sauce")
+RARE_WORDS = tuple(
+    f"{consonant}{vowel}{ending}" for consonant in "bcdfglmnprst" for vowel in "aeiou" for ending in ("ber", "lin", "mot", "sak", "vel")
+)
+QUERIES = {
+    "one common term": "chicken",
+    "prefix": "chee",
+    "typo": "chiken",
+    "two common terms": "apple pie",
+    "three terms": "raw chicken bamot",
+}
+
+@dataclass(frozen=True)
+class QueryResult:
+    name: str
+    query: str
+    p50_ms: float
+    p99_ms: float
+
+def food_names(count: int, seed: int = 0) -> Iterator[str]:
+    """Yield distinct names of two to five words, about half of them drawn from COMMON_WORDS."""
+    rng = random.Random(seed)
+    for i in range(count):
+        words = [rng.choice(COMMON_WORDS if rng.random() < 0.5 else RARE_WORDS) for _ in range(rng.randint(2, 5))]
+        yield f"{' '.join(words).title()} {i}"
+
+def populate(db: Session, foods: int) -> None:
+    names = food_names(foods)
+    for start in range(0, foods, CHUNK_SIZE):
+        db.execute(insert(Food), [
+            {"name": name, "calories": 100, "protein": 1, "carbs": 1, "fat": 1}
+            for name in (next(names) for _ in range(min(CHUNK_SIZE, foods - start)))
+        ])
+        db.commit()
+
+def measure_queries(index: FoodSearchIndex, iterations: int) -> List[QueryResult]:
+    results = []
+    for name, query in QUERIES.items():
+        index.search(query)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            index.search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        percentiles = statistics.quantiles(timings, n=100)
+        results.append(QueryResult(name, query, statistics.median(timings), percentiles[98]))
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure food search index load time and query latency.")
+    parser.add_argument("--foods", type=int, default=DEFAULT_FOODS, help="foods in the generated catalogue")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="timed searches per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database_engine(f"sqlite:///{os.path.join(directory, 'search.db')}", EngineSettings.from_environ())
+        try:
+            Base.metadata.create_all(bind=engine)
+            with Session(engine) as db:
+                populate(db, args.foods)
+                index = FoodSearchIndex()
+                start = time.perf_counter()
+                index.load(db)
+                load_seconds = time.perf_counter() - start
+        finally:
+            engine.dispose()
+
+    print(f"Loaded {len(index):,} foods in {load_seconds:.1f}s")
+    print(f"{'query':<20}{'text':<22}{'p50 ms':>9}{'p99 ms':>9}")
+    for result in measure_queries(index, args.iterations):
+        print(f"{result.name:<20}{result.query:<22}{result.p50_ms:>9.2f}{result.p99_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable
+
+from database.schema import Food, Micronutrient, FoodMicronutrient
+
+CATALOGUE_CACHE_SIZE = int(os.environ.get("CATALOGUE_CACHE_SIZE", "10000"))
+CATALOGUE_CACHE_TTL_SECONDS = float(os.environ.get("CATALOGUE_CACHE_TTL_SECONDS", "300"))
+
+# Returned by LRUCache.get when a key is missing or expired, as None is a valid cached value
+MISSING = object()
+
+@dataclass(frozen=True)
+class FoodSnapshot:
+    id: int
+    name: str
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+
+    @classmethod
+    def from_orm(cls, food: Food) -> "FoodSnapshot":
+        return cls(food.id, food.name, food.calories, food.protein, food.carbs, food.fat)
+
+@dataclass(frozen=True)
+class MicronutrientSnapshot:
+    id: int
+    name: str
+    unit: str
+
+    @classmethod
+    def from_orm(cls, micronutrient: Micronutrient) -> "MicronutrientSnapshot":
+        return cls(micronutrient.id, micronutrient.name, micronutrient.unit)
+
+@dataclass(frozen=True)
+class FoodMicronutrientSnapshot:
+    id: int
+    food_id: int
+    micronutrient_id: int
+    amount: float
+
+    @classmethod
+    def from_orm(cls, food_micronutrient: FoodMicronutrient) -> "FoodMicronutrientSnapshot":
+        return cls(food_micronutrient.id, food_micronutrient.food_id, food_micronutrient.micronutrient_id, food_micronutrient.amount)
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded cache with least-recently-used eviction and a per-entry time to live.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for key, or MISSING if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self.max_size)
+
+# Shared catalogue caches, keyed by food name, micronutrient name and food ID respectively
+FOOD_BY_NAME_CACHE = LRUCache(CATALOGUE_CACHE_SIZE, CATALOGUE_CACHE_TTL_SECONDS)
+MICRONUTRIENT_BY_NAME_CACHE = LRUCache(CATALOGUE_CACHE_SIZE, CATALOGUE_CACHE_TTL_SECONDS)
+FOOD_MICRONUTRIENTS_CACHE = LRUCache(CATALOGUE_CACHE_SIZE, CATALOGUE_CACHE_TTL_SECONDS)
+
+def catalogue_cache_stats() -> Dict[str, CacheStats]:
+    """
+    Report hit/miss counters for the catalogue caches.
+
+    Returns:
+        CacheStats for each cache, keyed by cache name
+    """
+    return {
+        "food_by_name": FOOD_BY_NAME_CACHE.stats(),
+        "micronutrient_by_name": MICRONUTRIENT_BY_NAME_CACHE.stats(),
+        "food_micronutrients": FOOD_MICRONUTRIENTS_CACHE.stats(),
+    }
+
+def clear_catalogue_caches() -> None:
+    FOOD_BY_NAME_CACHE.clear()
+    MICRONUTRIENT_BY_NAME_CACHE.clear()
+    FOOD_MICRONUTRIENTS_CACHE.clear()
@@ -1,25 +1,295 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import argparse
+from dataclasses import dataclass
+from functools import cache
+from typing import Any, Dict, Optional
 
-from schema import Base
+from sqlalchemy import create_engine, event, inspect, text, Connection, Engine, Select
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+
+from database.schema import Base
+from database.instrumentation import instrument_engine
 
 # Default to SQLite but prepare for PostgreSQL later
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///nutrition_tracker.db")
 
-if DATABASE_URL.startswith("sqlite:"):
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False}
+# Optional read replica, which reads are sent to when set
+DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL") or None
+DATABASE_READ_YOUR_WRITES = os.environ.get("DATABASE_READ_YOUR_WRITES", "true").lower() in ("1", "true", "yes")
+
+@dataclass(frozen=True)
+class EngineSettings:
+    """
+    Connection pool and SQLite tuning options, read from DATABASE_* and SQLITE_* environment variables.
+    
+    The pool options apply to PostgreSQL, the pragmas to every new SQLite connection.
+    """
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kib: int = 65536
+    sqlite_mmap_size: int = 268435456
+
+    @classmethod
+    def from_environ(cls, environ=os.environ) -> "EngineSettings":
+        defaults = cls()
+        return cls(
+            pool_size=int(environ.get("DATABASE_POOL_SIZE", defaults.pool_size)),
+            max_overflow=int(environ.get("DATABASE_MAX_OVERFLOW", defaults.max_overflow)),
+            pool_timeout=float(environ.get("DATABASE_POOL_TIMEOUT", defaults.pool_timeout)),
+            pool_recycle=int(environ.get("DATABASE_POOL_RECYCLE", defaults.pool_recycle)),
+            pool_pre_ping=str(environ.get("DATABASE_POOL_PRE_PING", defaults.pool_pre_ping)).lower() in ("1", "true", "yes"),
+            sqlite_journal_mode=environ.get("SQLITE_JOURNAL_MODE", defaults.sqlite_journal_mode),
+            sqlite_synchronous=environ.get("SQLITE_SYNCHRONOUS", defaults.sqlite_synchronous),
+            sqlite_busy_timeout_ms=int(environ.get("SQLITE_BUSY_TIMEOUT_MS", defaults.sqlite_busy_timeout_ms)),
+            sqlite_cache_size_kib=int(environ.get("SQLITE_CACHE_SIZE_KIB", defaults.sqlite_cache_size_kib)),
+            sqlite_mmap_size=int(environ.get("SQLITE_MMAP_SIZE", defaults.sqlite_mmap_size)),
+        )
+
+def engine_options(url: str, settings: EngineSettings) -> Dict[str, Any]:
+    """
+    Build the create_engine keyword arguments for a database URL.
+    
+    Args:
+        url (str): Database URL
+        settings (EngineSettings): Pool and SQLite options
+    
+    Returns:
+        Keyword arguments for create_engine or create_async_engine
+    """
+    if url.startswith("sqlite+aiosqlite:"):
+        return {}
+    if url.startswith("sqlite:"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.pool_size,
+        "max_overflow": settings.max_overflow,
+        "pool_timeout": settings.pool_timeout,
+        "pool_recycle": settings.pool_recycle,
+        "pool_pre_ping": settings.pool_pre_ping,
+    }
+
+def enable_sqlite_pragmas(engine: Engine, settings: EngineSettings) -> None:
+    """
+    Apply the SQLite pragmas to every connection the engine opens.
+    
+    WAL lets readers carry on while a log is written, and the busy timeout makes
+    concurrent writers wait for the lock rather than fail with "database is locked".
+    
+    Args:
+        engine (Engine): SQLite engine, or the sync_engine of an async one
+        settings (EngineSettings): Pragma values
+    """
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+            cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms:d}")
+            # Negative sizes are in KiB rather than pages
+            cursor.execute(f"PRAGMA cache_size={-settings.sqlite_cache_size_kib:d}")
+            cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size:d}")
+        finally:
+            cursor.close()
+
+def create_database_engine(url: str, settings: EngineSettings) -> Engine:
+    """
+    Create a configured engine for a database URL.
+    
+    Args:
+        url (str): Database URL
+        settings (EngineSettings): Pool and SQLite options
+    
+    Returns:
+        SQLAlchemy Engine
+    """
+    engine = create_engine(url, **engine_options(url, settings))
+    if engine.dialect.name == "sqlite":
+        enable_sqlite_pragmas(engine, settings)
+    instrument_engine(engine)
+    return engine
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the read replica and everything else to the primary.
+    
+    With read_your_writes set, once the session has written anything its later reads go to the
+    primary too, so a request sees its own changes however far the replica lags behind.
+    """
+
+    def __init__(self, *args, writer: Engine, reader: Engine, read_your_writes: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writer = writer
+        self.reader = reader
+        self.read_your_writes = read_your_writes
+        self.has_written = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        # Plain SELECTs (and db.connection(), which has no clause) can use the replica
+        is_read = clause is None or (isinstance(clause, Select) and clause._for_update_arg is None)
+        if self._flushing or not is_read:
+            self.has_written = True
+            return self.writer
+        if self.read_your_writes and self.has_written:
+            return self.writer
+        return self.reader
+
+    def close(self) -> None:
+        super().close()
+        self.has_written = False
+
+ENGINE_SETTINGS = EngineSettings.from_environ()
+
+# Engines and session factories are built on first use rather than at import, so importing
+# this module (each worker, test module and CLI) doesn't connect to the database
+
+@cache
+def get_engine() -> Engine:
+    return create_database_engine(DATABASE_URL, ENGINE_SETTINGS)
+
+@cache
+def get_read_engine() -> Engine:
+    if DATABASE_READ_URL is None:
+        return get_engine()
+    return create_database_engine(DATABASE_READ_URL, ENGINE_SETTINGS)
+
+@cache
+def get_session_factory() -> sessionmaker:
+    return sessionmaker(
+        class_=RoutingSession,
+        writer=get_engine(),
+        reader=get_read_engine(),
+        read_your_writes=DATABASE_READ_YOUR_WRITES,
+        autocommit=False,
+        autoflush=False,
     )
-else:  # This branch will be used when we switch to PostgreSQL
-    engine = create_engine(DATABASE_URL)
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def SessionLocal(**kwargs) -> RoutingSession:
+    """
+    Create a database session, building the engines on first use.
+    
+    Args:
+        **kwargs: Session options, e.g. read_your_writes=False to always read from the replica
+    
+    Returns:
+        SQLAlchemy Session: Database session
+    """
+    return get_session_factory()(**kwargs)
+
+def async_database_url(url: str) -> str:
+    """
+    Convert a database URL to the equivalent URL for an async driver.
+    
+    Args:
+        url (str): Synchronous database URL, e.g. sqlite:///nutrition_tracker.db
+    
+    Returns:
+        The URL using aiosqlite for SQLite or asyncpg for PostgreSQL
+    """
+    scheme, rest = url.split(":", 1)
+    driver = {
+        "sqlite": "sqlite+aiosqlite",
+        "postgresql": "postgresql+asyncpg",
+        "postgres": "postgresql+asyncpg",
+    }.get(scheme, scheme)
+    return f"{driver}:{rest}"
+
+def _create_async_engine(url: str) -> AsyncEngine:
+    async_engine = create_async_engine(url, **engine_options(url, ENGINE_SETTINGS))
+    if async_engine.dialect.name == "sqlite":
+        enable_sqlite_pragmas(async_engine.sync_engine, ENGINE_SETTINGS)
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+# Async engines for the FastAPI app, so database I/O doesn't tie up a threadpool worker
+@cache
+def get_async_engine() -> AsyncEngine:
+    return _create_async_engine(async_database_url(DATABASE_URL))
+
+@cache
+def get_async_read_engine() -> AsyncEngine:
+    if DATABASE_READ_URL is None:
+        return get_async_engine()
+    return _create_async_engine(async_database_url(DATABASE_READ_URL))
+
+# Objects aren't expired on commit, as reloading them would need I/O outside an await
+@cache
+def get_async_session_factory() -> async_sessionmaker:
+    return async_sessionmaker(
+        sync_session_class=RoutingSession,
+        writer=get_async_engine().sync_engine,
+        reader=get_async_read_engine().sync_engine,
+        read_your_writes=DATABASE_READ_YOUR_WRITES,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+def AsyncSessionLocal(**kwargs) -> AsyncSession:
+    """
+    Create an async database session, building the async engines on first use.
+    
+    Args:
+        **kwargs: Session options, e.g. read_your_writes=False to always read from the replica
+    
+    Returns:
+        SQLAlchemy AsyncSession: Database session
+    """
+    return get_async_session_factory()(**kwargs)
+
+# Indexes earlier versions of the schema created that it no longer has
+DROPPED_INDEXES = (
+    "ix_food_micronutrients_food_id",  # Covered by ix_food_micronutrients_food_id_micronutrient_id
+)
+
+def upgrade_tables(connection: Connection) -> None:
+    """
+    Add the columns and indexes of the schema that tables created by an older version of it lack,
+    and drop the indexes in DROPPED_INDEXES.
+    
+    create_all never alters a table that already exists. Columns are added without foreign key constraints,
+    and must be nullable or have a server default, like Food.version. A unique index fails to build while existing
+    rows have duplicates, which have to be removed first.
+    
+    Args:
+        connection (Connection): Connection to upgrade the tables through, in its transaction
+    """
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=connection.dialect)}"))
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(connection)
+    for name in DROPPED_INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
 
-# Create all tables defined in the schema
-Base.metadata.create_all(bind=engine)
+def init_db(engine: Optional[Engine] = None) -> None:
+    """
+    Create any tables defined in the schema that don't exist yet, and upgrade the ones that do.
+    
+    Run once when deploying or starting the app, not on import.
+    
+    Args:
+        engine (Engine, optional): Engine to create the tables with, defaults to the DATABASE_URL engine
+    """
+    engine = engine or get_engine()
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        upgrade_tables(connection)
 
 # Dependency for FastAPI to manage database sessions
 def get_db():
@@ -37,3 +307,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """
+    Creates and yields an async database session.
+    
+    The async counterpart of get_db, for FastAPI endpoints that use database.async_queries.
+    
+    Yields:
+        SQLAlchemy AsyncSession: Database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create the database tables for DATABASE_URL.")
+    parser.parse_args()
+    init_db()
+    print("Database tables created")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+import os
+import csv
+import gzip
+import json
+import time
+import argparse
+from dataclasses import dataclass, field
+from itertools import groupby, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.orm import Session
+
+from database import statements
+from database.schema import Food, Micronutrient, FoodMicronutrient, FoodSource
+from database.cache import FOOD_BY_NAME_CACHE, FOOD_MICRONUTRIENTS_CACHE
+from database.search import FOOD_SEARCH_INDEX
+from database.utils import convert_amount, dialect_insert
+
+SOURCE_OPEN_FOOD_FACTS = "OpenFoodFacts"
+SOURCE_USDA = "USDA"
+
+DEFAULT_BATCH_SIZE = 1_000
+
+# Open Food Facts nutriment keys that are macros or scores rather than micronutrients
+OFF_MACRO_KEYS = {"energy-kcal", "proteins", "carbohydrates", "fat"}
+OFF_IGNORED_KEYS = {"energy", "energy-kj", "sugars", "saturated-fat", "fiber", "salt", "alcohol"}
+OFF_IGNORED_PREFIXES = ("nutrition-score", "fruits-vegetables", "carbon-footprint", "nova")
+
+# USDA FoodData Central nutrient IDs of the macros stored on foods
+USDA_CALORIES_ID = "1008"
+USDA_PROTEIN_ID = "1003"
+USDA_FAT_ID = "1004"
+USDA_CARBS_ID = "1005"
+USDA_MICRONUTRIENT_UNITS = {"MG": "mg", "UG": "μg"}
+
+@dataclass
+class FoodRecord:
+    # One normalised product from an external database, with amounts per 100 g
+    source_name: str
+    external_id: str
+    name: str
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+    micronutrients: Dict[str, Tuple[float, str]] = field(default_factory=dict)  # name -> (amount, unit)
+
+@dataclass
+class ImportStats:
+    records: int
+    seconds: float
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def parse_open_food_facts_product(product: dict) -> Optional[FoodRecord]:
+    """
+    Normalise one product of an Open Food Facts dump.
+
+    Args:
+        product (dict): Decoded line of the JSONL dump
+
+    Returns:
+        FoodRecord, or None if the product has no name or is missing a macro
+    """
+    nutriments = product.get("nutriments") or {}
+    name = (product.get("product_name") or "").strip()
+    macros = [nutriments.get(f"{key}_100g") for key in ("energy-kcal", "proteins", "carbohydrates", "fat")]
+    if not name or not product.get("code") or any(not isinstance(value, (int, float)) for value in macros):
+        return None
+    brands = (product.get("brands") or "").strip()
+
+    micronutrients = {}
+    for key, value in nutriments.items():
+        if not key.endswith("_100g") or not isinstance(value, (int, float)):
+            continue
+        nutrient = key[:-len("_100g")]
+        if nutrient in OFF_MACRO_KEYS or nutrient in OFF_IGNORED_KEYS or nutrient.startswith(OFF_IGNORED_PREFIXES):
+            continue
+        # Open Food Facts normalises the per-100 g values to grams
+        micronutrients[nutrient.replace("-", " ").title()] = (float(value), "g")
+
+    return FoodRecord(
+        source_name=SOURCE_OPEN_FOOD_FACTS,
+        external_id=str(product["code"]),
+        name=f"{name} ({brands})" if brands else name,
+        calories=float(macros[0]),
+        protein=float(macros[1]),
+        carbs=float(macros[2]),
+        fat=float(macros[3]),
+        micronutrients=micronutrients,
+    )
+
+def read_open_food_facts(path: str) -> Iterator[str]:
+    """Stream the non-empty lines of an Open Food Facts JSONL dump (optionally gzipped), each one product."""
+    with _open_text(path) as lines:
+        for line in lines:
+            if line.strip():
+                yield line
+
+def parse_open_food_facts(path: str) -> Iterator[FoodRecord]:
+    """
+    Stream products from an Open Food Facts JSONL dump (optionally gzipped).
+
+    Products without a name or any of the four macros are skipped.
+
+    Args:
+        path (str): Path to the openfoodfacts-products.jsonl(.gz) dump
+
+    Yields:
+        FoodRecord for each usable product
+    """
+    for line in read_open_food_facts(path):
+        record = parse_open_food_facts_product(json.loads(line))
+        if record is not None:
+            yield record
+
+def load_usda_nutrients(directory: str) -> Dict[str, Tuple[str, str]]:
+    """Map the nutrient IDs of a USDA FoodData Central CSV download to their (name, upper case unit)."""
+    with open(os.path.join(directory, "nutrient.csv"), newline="", encoding="utf-8") as file:
+        return {row["id"]: (row["name"], row["unit_name"].upper()) for row in csv.DictReader(file)}
+
+def read_usda_foods(directory: str) -> Iterator[Tuple[int, str, List[Tuple[str, str]]]]:
+    """
+    Stream the foods of a USDA FoodData Central CSV download with their raw nutrient amounts.
+
+    food.csv and food_nutrient.csv are merge-joined on fdc_id, so both must be sorted
+    by fdc_id. Foods without any nutrient rows are skipped.
+
+    Args:
+        directory (str): Directory containing food.csv and food_nutrient.csv
+
+    Yields:
+        (fdc_id, description, [(nutrient_id, amount)]) for each food, amounts as in the file
+
+    Raises:
+        ValueError: If either file is not sorted by fdc_id
+    """
+    with open(os.path.join(directory, "food.csv"), newline="", encoding="utf-8") as food_file, \
+            open(os.path.join(directory, "food_nutrient.csv"), newline="", encoding="utf-8") as nutrient_file:
+        food_nutrients = groupby(csv.DictReader(nutrient_file), key=lambda row: int(row["fdc_id"]))
+        next_group = next(food_nutrients, None)
+        last_fdc_id = -1
+        for food in csv.DictReader(food_file):
+            fdc_id = int(food["fdc_id"])
+            if fdc_id <= last_fdc_id:
+                raise ValueError("food.csv must be sorted by fdc_id")
+            last_fdc_id = fdc_id
+
+            # Skip nutrient rows of foods missing from food.csv
+            while next_group is not None and next_group[0] < fdc_id:
+                previous = next_group[0]
+                next_group = next(food_nutrients, None)
+                if next_group is not None and next_group[0] <= previous:
+                    raise ValueError("food_nutrient.csv must be sorted by fdc_id")
+            if next_group is None or next_group[0] != fdc_id:
+                continue
+            rows = [(row["nutrient_id"], row["amount"]) for row in next_group[1]]
+            next_group = next(food_nutrients, None)
+            if next_group is not None and next_group[0] <= fdc_id:
+                raise ValueError("food_nutrient.csv must be sorted by fdc_id")
+            yield fdc_id, food["description"], rows
+
+def parse_usda_food(fdc_id: int, description: str, rows: List[Tuple[str, str]], nutrients: Dict[str, Tuple[str, str]]) -> Optional[FoodRecord]:
+    """
+    Normalise one food read by read_usda_foods.
+
+    Args:
+        fdc_id (int): FoodData Central ID of the food
+        description (str): Description of the food
+        rows (List[Tuple[str, str]]): (nutrient_id, amount) rows of the food
+        nutrients (Dict[str, Tuple[str, str]]): Nutrients from load_usda_nutrients
+
+    Returns:
+        FoodRecord, or None if the food has no description or is missing a macro
+    """
+    amounts = {nutrient_id: float(amount) for nutrient_id, amount in rows if amount}
+    macro_ids = (USDA_CALORIES_ID, USDA_PROTEIN_ID, USDA_CARBS_ID, USDA_FAT_ID)
+    if not description or any(nutrient_id not in amounts for nutrient_id in macro_ids):
+        return None
+    return FoodRecord(
+        source_name=SOURCE_USDA,
+        external_id=str(fdc_id),
+        name=description.strip(),
+        calories=amounts[USDA_CALORIES_ID],
+        protein=amounts[USDA_PROTEIN_ID],
+        carbs=amounts[USDA_CARBS_ID],
+        fat=amounts[USDA_FAT_ID],
+        micronutrients={
+            nutrients[nutrient_id][0]: (amount, USDA_MICRONUTRIENT_UNITS[nutrients[nutrient_id][1]])
+            for nutrient_id, amount in amounts.items()
+            if nutrient_id in nutrients and nutrients[nutrient_id][1] in USDA_MICRONUTRIENT_UNITS
+        },
+    )
+
+def parse_usda_csv(directory: str) -> Iterator[FoodRecord]:
+    """
+    Stream foods from a USDA FoodData Central CSV download.
+
+    food.csv and food_nutrient.csv are merge-joined on fdc_id, so both must be sorted
+    by fdc_id; only nutrient.csv is held in memory. Foods missing any macro are skipped.
+
+    Args:
+        directory (str): Directory containing food.csv, nutrient.csv and food_nutrient.csv
+
+    Yields:
+        FoodRecord for each usable food
+
+    Raises:
+        ValueError: If either file is not sorted by fdc_id
+    """
+    nutrients = load_usda_nutrients(directory)
+    for fdc_id, description, rows in read_usda_foods(directory):
+        record = parse_usda_food(fdc_id, description, rows, nutrients)
+        if record is not None:
+            yield record
+
+def parse_usda_api_food(food: dict) -> Optional[FoodRecord]:
+    """
+    Convert one food from a FoodData Central API search response.
+
+    Args:
+        food (dict): Element of the response's "foods" list
+
+    Returns:
+        FoodRecord, or None if the food has no description or is missing a macro
+    """
+    amounts = {}
+    micronutrients = {}
+    for nutrient in food.get("foodNutrients") or []:
+        nutrient_id, value = str(nutrient.get("nutrientId")), nutrient.get("value")
+        if not isinstance(value, (int, float)):
+            continue
+        amounts[nutrient_id] = float(value)
+        unit = USDA_MICRONUTRIENT_UNITS.get((nutrient.get("unitName") or "").upper())
+        if unit is not None and nutrient.get("nutrientName"):
+            micronutrients[nutrient["nutrientName"]] = (float(value), unit)
+
+    description = (food.get("description") or "").strip()
+    macro_ids = (USDA_CALORIES_ID, USDA_PROTEIN_ID, USDA_CARBS_ID, USDA_FAT_ID)
+    if not description or food.get("fdcId") is None or any(nutrient_id not in amounts for nutrient_id in macro_ids):
+        return None
+    brand = (food.get("brandOwner") or "").strip()
+    return FoodRecord(
+        source_name=SOURCE_USDA,
+        external_id=str(food["fdcId"]),
+        # Branded foods often share a description, so they're told apart by brand as Open Food Facts products are
+        name=f"{description} ({brand})" if brand else description,
+        calories=amounts[USDA_CALORIES_ID],
+        protein=amounts[USDA_PROTEIN_ID],
+        carbs=amounts[USDA_CARBS_ID],
+        fat=amounts[USDA_FAT_ID],
+        micronutrients=micronutrients,
+    )
+
+def load_micronutrients(db: Session) -> Dict[str, Tuple[int, str]]:
+    """Map every micronutrient name to its ID and unit."""
+    return {name: (micronutrient_id, unit) for name, micronutrient_id, unit in db.execute(select(Micronutrient.name, Micronutrient.id, Micronutrient.unit))}
+
+def _resolve_micronutrients(db: Session, records: List[FoodRecord], micronutrients: Dict[str, Tuple[int, str]]) -> None:
+    """Create any micronutrients the batch introduces and add their IDs and units to the map."""
+    new = {}
+    for record in records:
+        for name, (_, unit) in record.micronutrients.items():
+            if name not in micronutrients:
+                new.setdefault(name, unit)
+    if not new:
+        return
+    created = dict(db.execute(
+        statements.insert_missing_by_name(db, Micronutrient, [{"name": name, "unit": unit} for name, unit in new.items()])
+    ).all())
+    # Names that already existed, e.g. added by another importer since the map was built
+    existing = [name for name in new if name not in created]
+    if existing:
+        rows = db.execute(select(Micronutrient.name, Micronutrient.id, Micronutrient.unit).where(Micronutrient.name.in_(existing)))
+        micronutrients.update({name: (micronutrient_id, unit) for name, micronutrient_id, unit in rows})
+    micronutrients.update({name: (micronutrient_id, new[name]) for name, micronutrient_id in created.items()})
+
+def _food_micronutrients(food_id: int, record: FoodRecord, micronutrients: Dict[str, Tuple[int, str]]) -> Iterator[dict]:
+    """Yield the food_micronutrients rows of a record, with amounts in each micronutrient's own unit."""
+    for nutrient, (amount, unit) in record.micronutrients.items():
+        micronutrient_id, micronutrient_unit = micronutrients[nutrient]
+        # A nutrient that can't be converted, e.g. IU against an existing mg micronutrient, is left out
+        # rather than stored as a number in the wrong unit
+        amount = convert_amount(amount, unit, micronutrient_unit)
+        if amount is not None:
+            yield {"food_id": food_id, "micronutrient_id": micronutrient_id, "amount": amount}
+
+def write_batch(db: Session, records: List[FoodRecord], micronutrients: Dict[str, Tuple[int, str]]) -> Dict[str, int]:
+    """
+    Write a batch of records into foods, micronutrients, food_micronutrients and food_sources
+    in one transaction.
+
+    Foods are matched by name, and only new foods are added with their macros and micronutrients.
+    An existing food is left as it is apart from gaining the record's source, since daily summaries
+    subtract a deleted log's macros as the food has them now. Re-importing a batch is idempotent.
+    Micronutrient amounts are converted to the unit of the existing micronutrient of the same name.
+
+    Args:
+        db (Session): Database session
+        records (List[FoodRecord]): Records to write
+        micronutrients (Dict[str, Tuple[int, str]]): Micronutrient name to ID and unit map, updated in place
+
+    Returns:
+        Food name to ID map of the written foods
+    """
+    # A name may only be inserted once per statement, the last record wins
+    by_name = {record.name: record for record in records}
+    try:
+        _resolve_micronutrients(db, records, micronutrients)
+
+        created = dict(db.execute(
+            dialect_insert(db, Food).on_conflict_do_nothing(index_elements=[Food.name]).returning(Food.name, Food.id),
+            [
+                {"name": name, "calories": record.calories, "protein": record.protein, "carbs": record.carbs, "fat": record.fat}
+                for name, record in sorted(by_name.items())
+            ],
+        ).all())
+        existing = [name for name in by_name if name not in created]
+        food_ids = dict(db.execute(statements.select_ids_by_name(Food, existing)).all()) if existing else {}
+        food_ids.update(created)
+
+        food_micronutrients = [
+            row
+            for name, record in by_name.items() if name in created
+            for row in _food_micronutrients(created[name], record, micronutrients)
+        ]
+        if food_micronutrients:
+            db.execute(insert(FoodMicronutrient), food_micronutrients)
+
+        sourced = set(db.scalars(
+            dialect_insert(db, FoodSource).on_conflict_do_nothing(
+                index_elements=[FoodSource.source_name, FoodSource.external_id]
+            ).returning(FoodSource.food_id),
+            [
+                {"food_id": food_ids[record.name], "source_name": record.source_name, "external_id": record.external_id}
+                for record in records
+            ],
+        ).all())
+        # As with add_food_source, a new source is a change to an existing food's details
+        changed = sourced - set(created.values())
+        if changed:
+            db.execute(update(Food).where(Food.id.in_(changed)).values(version=Food.version + 1))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for name, food_id in food_ids.items():
+        FOOD_BY_NAME_CACHE.invalidate(name)
+        FOOD_MICRONUTRIENTS_CACHE.invalidate(food_id)
+    if FOOD_SEARCH_INDEX.loaded:
+        for record in records:
+            FOOD_SEARCH_INDEX.add(food_ids[record.name], record.name, [record.external_id])
+    return food_ids
+
+def _read_checkpoint(path: Optional[str]) -> int:
+    if path is None or not os.path.exists(path):
+        return 0
+    with open(path) as file:
+        return json.load(file)["records"]
+
+def _write_checkpoint(path: Optional[str], records: int) -> None:
+    if path is None:
+        return
+    # Write then rename, so an interruption never leaves a truncated checkpoint
+    with open(f"{path}.tmp", "w") as file:
+        json.dump({"records": records}, file)
+    os.replace(f"{path}.tmp", path)
+
+def import_records(db: Session, records: Iterable[FoodRecord], batch_size: int = DEFAULT_BATCH_SIZE, checkpoint: Optional[str] = None, progress: Optional[Callable[[str], None]] = print) -> ImportStats:
+    """
+    Write a stream of records in chunked transactions, resuming from a checkpoint if given.
+
+    After each committed chunk the number of records consumed so far is saved to the
+    checkpoint file, and a rerun skips that many records of the same input.
+
+    Args:
+        db (Session): Database session
+        records (Iterable[FoodRecord]): Parsed records, e.g. from parse_open_food_facts
+        batch_size (int): Records written per transaction
+        checkpoint (str, optional): Path of the checkpoint file
+        progress (Callable, optional): Receives a progress line after each chunk
+
+    Returns:
+        ImportStats for the records written by this run
+    """
+    done = _read_checkpoint(checkpoint)
+    records = iter(records)
+    for _ in islice(records, done):
+        pass
+
+    micronutrients = load_micronutrients(db)
+    written = 0
+    start = time.perf_counter()
+    while batch := list(islice(records, batch_size)):
+        write_batch(db, batch, micronutrients)
+        written += len(batch)
+        _write_checkpoint(checkpoint, done + written)
+        if progress is not None:
+            elapsed = time.perf_counter() - start
+            progress(f"Imported {done + written} records ({written / elapsed:,.0f} records/s)")
+    return ImportStats(written, time.perf_counter() - start)
+
+def main() -> None:
+    from database.db import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Import a USDA FoodData Central or Open Food Facts dump.")
+    parser.add_argument("source", choices=["usda", "open-food-facts"])
+    parser.add_argument("path", help="USDA CSV directory or Open Food Facts JSONL(.gz) file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--checkpoint", help="file recording progress, so an interrupted import can be resumed")
+    args = parser.parse_args()
+
+    records = parse_usda_csv(args.path) if args.source == "usda" else parse_open_food_facts(args.path)
+    # Imports are often the first thing run against a new database
+    init_db()
+    db = SessionLocal()
+    try:
+        stats = import_records(db, records, args.batch_size, args.checkpoint)
+    finally:
+        db.close()
+    print(f"Imported {stats.records} records in {stats.seconds:.1f}s ({stats.records_per_second:,.0f} records/s)")
+
+
+if __name__ == "__main__":
+    main()
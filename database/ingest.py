@@ -0,0 +1,188 @@
+"""
+Import an external food dump with parsing spread over worker processes.
+
+The pipeline has three stages joined by bounded queues, so a slow stage holds back the ones before it
+instead of letting parsed records pile up in memory:
+
+    reader (main thread) -> parsers (ProcessPoolExecutor) -> writer (one thread, batched inserts)
+
+The reader hands out chunks of raw input (Open Food Facts lines, or USDA foods with their nutrient rows),
+the parsers normalise them with the functions in database.importer, and the writer writes each chunk
+with importer.write_batch in input order, so the result is the same as importer.import_records.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from database.importer import (
+    DEFAULT_BATCH_SIZE,
+    FoodRecord,
+    ImportStats,
+    load_micronutrients,
+    load_usda_nutrients,
+    parse_open_food_facts_product,
+    parse_usda_food,
+    read_open_food_facts,
+    read_usda_foods,
+    write_batch,
+)
+
+# Kinds of dump, named as on the command line
+DUMP_USDA = "usda"
+DUMP_OPEN_FOOD_FACTS = "open-food-facts"
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Chunks parsed or waiting to be written per worker, enough to keep every stage busy
+DEFAULT_CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# Set in each worker process by _init_worker
+_dump: Optional[str] = None
+_usda_nutrients: Dict[str, Tuple[str, str]] = {}
+
+def _init_worker(dump: str, usda_nutrients: Dict[str, Tuple[str, str]]) -> None:
+    # Sent once per worker rather than with every chunk
+    global _dump, _usda_nutrients
+    _dump, _usda_nutrients = dump, usda_nutrients
+
+def _parse_chunk(chunk: list) -> List[tuple]:
+    if _dump == DUMP_OPEN_FOOD_FACTS:
+        records = (parse_open_food_facts_product(json.loads(line)) for line in chunk)
+    else:
+        records = (parse_usda_food(fdc_id, description, rows, _usda_nutrients) for fdc_id, description, rows in chunk)
+    # Unpickling in the main process is the part of parsing that doesn't scale with workers, so records are sent back
+    # as plain tuples, with interned nutrient names pickled once per chunk, which load about a third faster
+    return [
+        (
+            record.source_name, record.external_id, record.name, record.calories, record.protein, record.carbs, record.fat,
+            {sys.intern(name): (amount, sys.intern(unit)) for name, (amount, unit) in record.micronutrients.items()},
+        )
+        for record in records
+        if record is not None
+    ]
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+def parse_parallel(dump: str, path: str, workers: int = DEFAULT_WORKERS, chunk_size: int = DEFAULT_BATCH_SIZE, max_in_flight: Optional[int] = None) -> Iterator[List[FoodRecord]]:
+    """
+    Parse a dump in worker processes, yielding the records of each chunk of input in input order.
+
+    At most max_in_flight chunks are read ahead of the consumer, so reading stops while it falls behind.
+
+    Args:
+        dump (str): DUMP_USDA or DUMP_OPEN_FOOD_FACTS
+        path (str): USDA CSV directory or Open Food Facts JSONL(.gz) file
+        workers (int): Number of parser processes
+        chunk_size (int): Products or foods of input per chunk
+        max_in_flight (int, optional): Chunks submitted but not yet consumed, defaults to two per worker
+
+    Yields:
+        The usable records of each chunk, possibly an empty list
+    """
+    if dump not in (DUMP_USDA, DUMP_OPEN_FOOD_FACTS):
+        raise ValueError(f"Unknown dump {dump!r}")
+    max_in_flight = max_in_flight or workers * DEFAULT_CHUNKS_IN_FLIGHT_PER_WORKER
+    if dump == DUMP_USDA:
+        units, nutrients = read_usda_foods(path), load_usda_nutrients(path)
+    else:
+        units, nutrients = read_open_food_facts(path), {}
+
+    # Spawned rather than forked, as the writer thread may already be running and forking a threaded process is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(dump, nutrients)) as executor:
+        pending: Deque[Future] = deque()
+        for chunk in _chunks(units, chunk_size):
+            if len(pending) >= max_in_flight:
+                yield [FoodRecord(*fields) for fields in pending.popleft().result()]
+            pending.append(executor.submit(_parse_chunk, chunk))
+        while pending:
+            yield [FoodRecord(*fields) for fields in pending.popleft().result()]
+
+def ingest(session_factory: Callable[[], Session], dump: str, path: str, workers: int = DEFAULT_WORKERS, batch_size: int = DEFAULT_BATCH_SIZE, queue_size: Optional[int] = None, progress: Optional[Callable[[str], None]] = print) -> ImportStats:
+    """
+    Import a dump with parallel parsing and a single writer doing one transaction per batch.
+
+    Args:
+        session_factory (Callable[[], Session]): Creates the writer's session, e.g. database.db.SessionLocal
+        dump (str): DUMP_USDA or DUMP_OPEN_FOOD_FACTS
+        path (str): USDA CSV directory or Open Food Facts JSONL(.gz) file
+        workers (int): Number of parser processes
+        batch_size (int): Products or foods of input per parsed chunk and written transaction
+        queue_size (int, optional): Parsed batches waiting for the writer, defaults to two per worker
+        progress (Callable, optional): Receives a progress line after each written batch
+
+    Returns:
+        ImportStats for the records written
+
+    Raises:
+        Exception: Whatever the writer failed with, after the batches before it were committed
+    """
+    queue_size = queue_size or workers * DEFAULT_CHUNKS_IN_FLIGHT_PER_WORKER
+    batches: "queue.Queue[Optional[List[FoodRecord]]]" = queue.Queue(maxsize=queue_size)
+    failure: List[Exception] = []
+    written = 0
+    start = time.perf_counter()
+
+    def writer() -> None:
+        nonlocal written
+        try:
+            with session_factory() as db:
+                micronutrients = load_micronutrients(db)
+                while (batch := batches.get()) is not None:
+                    if not batch:
+                        continue
+                    write_batch(db, batch, micronutrients)
+                    written += len(batch)
+                    if progress is not None:
+                        progress(f"Imported {written} records ({written / (time.perf_counter() - start):,.0f} records/s)")
+        except Exception as e:
+            failure.append(e)
+            # Keep draining so the reader never blocks on a full queue
+            while batches.get() is not None:
+                pass
+
+    thread = threading.Thread(target=writer, name="ingest-writer")
+    thread.start()
+    try:
+        for batch in parse_parallel(dump, path, workers, batch_size, queue_size):
+            if failure:
+                break
+            batches.put(batch)
+    finally:
+        batches.put(None)
+        thread.join()
+    if failure:
+        raise failure[0]
+    return ImportStats(written, time.perf_counter() - start)
+
+def main() -> None:
+    from database.db import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Import a USDA FoodData Central or Open Food Facts dump, parsing in parallel.")
+    parser.add_argument("dump", choices=[DUMP_USDA, DUMP_OPEN_FOOD_FACTS])
+    parser.add_argument("path", help="USDA CSV directory or Open Food Facts JSONL(.gz) file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="parser processes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="records per parsed chunk and transaction")
+    parser.add_argument("--queue-size", type=int, help="parsed batches waiting for the writer, defaults to two per worker")
+    args = parser.parse_args()
+
+    init_db()
+    stats = ingest(SessionLocal, args.dump, args.path, args.workers, args.batch_size, args.queue_size)
+    print(f"Imported {stats.records} records in {stats.seconds:.1f}s ({stats.records_per_second:,.0f} records/s)")
+
+
+if __name__ == "__main__":
+    main()
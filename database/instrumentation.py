@@ -0,0 +1,67 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import event, Engine
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "200"))
+
+slow_query_logger = logging.getLogger("database.slow_query")
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    slow: int = 0
+
+# Stats of the unit of work (e.g. HTTP request) currently being tracked, if any
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Count and time the SQL statements run in the current context, e.g. while handling a request.
+
+    Statements run in threads or tasks started from the context, such as sync FastAPI
+    endpoints in the threadpool, are counted too.
+
+    Yields:
+        QueryStats, updated as statements complete
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        if stats is not None:
+            stats.slow += 1
+        slow_query_logger.warning(
+            "Slow query",
+            extra={"duration_ms": round(elapsed * 1000, 3), "statement": statement, "executemany": executemany},
+        )
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Time every statement the engine runs, for track_queries and the slow query log.
+
+    Args:
+        engine (Engine): Engine, or the sync_engine of an async one
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
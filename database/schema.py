@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Index
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime, timezone
 
@@ -10,10 +10,12 @@ class User(Base):
     username = Column(String, unique=True, nullable=False)
     email = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc)) # To track when account age > 3 months for free trial
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc)) # To track when account age > 3 months for free trial
 
     macro_logs = relationship("UserMacroLog", back_populates="user", cascade="all, delete-orphan")
     micro_logs = relationship("UserMicroLog", back_populates="user", cascade="all, delete-orphan")
+    daily_summaries = relationship("UserDailySummary", back_populates="user", cascade="all, delete-orphan")
+    daily_micronutrient_summaries = relationship("UserDailyMicronutrientSummary", back_populates="user", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', email='{self.email}')>"
@@ -26,6 +28,7 @@ class Food(Base):
     protein = Column(Float, nullable=False)
     carbs = Column(Float, nullable=False)
     fat = Column(Float, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # Bumped when the food's macros, micronutrients or sources change, for HTTP caching
 
     macro_logs = relationship("UserMacroLog", back_populates="food", cascade="all, delete-orphan")
     micronutrients = relationship("FoodMicronutrient", back_populates="food", cascade="all, delete-orphan")
@@ -49,13 +52,17 @@ class Micronutrient(Base):
 class FoodMicronutrient(Base):
     __tablename__ = 'food_micronutrients'
     id = Column(Integer, primary_key=True)
-    food_id = Column(Integer, ForeignKey('foods.id', ondelete='CASCADE'), nullable=False)
-    micronutrient_id = Column(Integer, ForeignKey('micronutrients.id', ondelete='CASCADE'), nullable=False)
+    food_id = Column(Integer, ForeignKey('foods.id', ondelete='CASCADE'), nullable=False) # Looked up through the (food_id, micronutrient_id) index
+    micronutrient_id = Column(Integer, ForeignKey('micronutrients.id', ondelete='CASCADE'), nullable=False, index=True)
     amount = Column(Float, nullable=False) # Nutrient amount per standard serving
     
     food = relationship("Food", back_populates="micronutrients")
     micronutrient = relationship("Micronutrient", back_populates="foods")
 
+    __table_args__ = (
+        Index('ix_food_micronutrients_food_id_micronutrient_id', 'food_id', 'micronutrient_id', unique=True), # One amount per nutrient per food
+    )
+
     def __repr__(self):
         return f"<FoodMicronutrient(id={self.id}, food_id={self.food_id}, micronutrient_id={self.micronutrient_id}, amount={self.amount})>"
 
@@ -65,11 +72,15 @@ class UserMacroLog(Base):
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     food_id = Column(Integer, ForeignKey('foods.id', ondelete='CASCADE'), nullable=False)
     quantity = Column(Float, nullable=False)  # Amount consumed
-    timestamp = Column(DateTime, default=datetime.now(timezone.utc))
+    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     user = relationship("User", back_populates="macro_logs")
     food = relationship("Food", back_populates="macro_logs")
 
+    __table_args__ = (
+        Index('ix_user_macro_log_user_id_timestamp', 'user_id', 'timestamp'), # Per-user time-range queries
+    )
+
     def __repr__(self):
         return f"<UserMacroLog(id={self.id}, user_id={self.user_id}, food_id={self.food_id}, quantity={self.quantity}, timestamp={self.timestamp})>"
 
@@ -79,22 +90,60 @@ class UserMicroLog(Base):
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     micronutrient_id = Column(Integer, ForeignKey('micronutrients.id', ondelete='CASCADE'), nullable=False)
     amount = Column(Float, nullable=False)
-    timestamp = Column(DateTime, default=datetime.now(timezone.utc))
+    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    food_log_id = Column(Integer, ForeignKey('user_macro_log.id', ondelete='CASCADE'), nullable=True) # Set when logged from a food's contents, which analytics already counts through the food log
 
     user = relationship("User", back_populates="micro_logs")
     micronutrient = relationship("Micronutrient", back_populates="micro_logs")
 
+    __table_args__ = (
+        Index('ix_user_micro_log_user_id_timestamp', 'user_id', 'timestamp'), # Per-user time-range queries
+    )
+
     def __repr__(self):
         return f"<UserMicroLog(id={self.id}, user_id={self.user_id}, micronutrient_id={self.micronutrient_id}, amount={self.amount}, timestamp={self.timestamp})>"
 
 class FoodSource(Base):
     __tablename__ = 'food_sources'
     id = Column(Integer, primary_key=True)
-    food_id = Column(Integer, ForeignKey('foods.id', ondelete='CASCADE'), nullable=False)
+    food_id = Column(Integer, ForeignKey('foods.id', ondelete='CASCADE'), nullable=False, index=True)
     source_name = Column(String, nullable=False) 
     external_id = Column(String, nullable=False) # Food ID in external database if obtainable
     
     food = relationship("Food", back_populates="sources")
 
+    __table_args__ = (
+        Index('ix_food_sources_source_name_external_id', 'source_name', 'external_id', unique=True), # External lookups
+    )
+
     def __repr__(self):
         return f"<FoodSource(id={self.id}, food_id={self.food_id}, source_name='{self.source_name}', external_id='{self.external_id}')>"
+
+class UserDailySummary(Base):
+    # Macro totals per user per UTC day, maintained by the log writers in queries.py
+    __tablename__ = 'user_daily_summary'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    date = Column(Date, primary_key=True)
+    calories = Column(Float, nullable=False, default=0)
+    protein = Column(Float, nullable=False, default=0)
+    carbs = Column(Float, nullable=False, default=0)
+    fat = Column(Float, nullable=False, default=0)
+
+    user = relationship("User", back_populates="daily_summaries")
+
+    def __repr__(self):
+        return f"<UserDailySummary(user_id={self.user_id}, date={self.date}, calories={self.calories})>"
+
+class UserDailyMicronutrientSummary(Base):
+    # Micronutrient totals per user per UTC day, maintained by the log writers in queries.py
+    __tablename__ = 'user_daily_micronutrient_summary'
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    date = Column(Date, primary_key=True)
+    micronutrient_id = Column(Integer, ForeignKey('micronutrients.id', ondelete='CASCADE'), primary_key=True)
+    amount = Column(Float, nullable=False, default=0)
+
+    user = relationship("User", back_populates="daily_micronutrient_summaries")
+    micronutrient = relationship("Micronutrient")
+
+    def __repr__(self):
+        return f"<UserDailyMicronutrientSummary(user_id={self.user_id}, date={self.date}, micronutrient_id={self.micronutrient_id}, amount={self.amount})>"
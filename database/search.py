@@ -0,0 +1,251 @@
+import re
+import time
+import heapq
+import bisect
+import threading
+from collections import defaultdict
+from itertools import islice
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database.schema import Food, FoodSource
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+MIN_FUZZY_LENGTH = 3
+MIN_FUZZY_SIMILARITY = 0.4
+
+# Bounds on the work one query can do, so common terms don't make latency grow with the catalogue
+MAX_PREFIX_EXPANSIONS = 64
+MAX_FUZZY_EXPANSIONS = 16
+# Foods taken per token for a one-term query; queries of several terms intersect whole postings instead
+MAX_CANDIDATES = 1_000
+# How often search_foods picks up foods added by other processes
+REFRESH_SECONDS = 60.0
+
+@dataclass(frozen=True)
+class SearchResult:
+    food_id: int
+    name: str
+    score: float
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FoodSearchIndex:
+    """
+    In-memory inverted index over food names and external source IDs.
+
+    Query terms match indexed tokens exactly, as a prefix, or approximately through
+    trigram similarity, and foods must match every term. Foods are added incrementally
+    as they are inserted, so the index never needs rebuilding within a process, and
+    reloading only fetches the rows added since the last load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: Dict[int, str] = {}
+        self._food_tokens: Dict[int, Set[str]] = defaultdict(set)
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        # The same postings ordered shortest name first, so a common token's candidates are its closest matches
+        self._ranked_postings: Dict[str, List[int]] = defaultdict(list)
+        # While load() runs, the tokens whose ranked postings it sorts once at the end rather than per food
+        self._unranked: Optional[Set[str]] = None
+        self._vocabulary: List[str] = []  # Sorted, for prefix lookups
+        self._trigram_tokens: Dict[str, Set[str]] = defaultdict(set)
+        self._max_food_id = 0
+        self._max_source_id = 0
+        self.loaded = False
+        self.loaded_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _rank(self, food_id: int) -> Tuple[int, str, int]:
+        name = self._names[food_id]
+        return len(name), name, food_id
+
+    def _add_token(self, food_id: int, token: str) -> None:
+        if token not in self._postings:
+            bisect.insort(self._vocabulary, token)
+            for trigram in _trigrams(token):
+                self._trigram_tokens[trigram].add(token)
+        elif food_id in self._postings[token]:
+            return
+        self._postings[token].add(food_id)
+        if self._unranked is not None:
+            self._unranked.add(token)
+        else:
+            bisect.insort(self._ranked_postings[token], food_id, key=self._rank)
+        self._food_tokens[food_id].add(token)
+
+    def add(self, food_id: int, name: str, aliases: Iterable[str] = ()) -> None:
+        """
+        Index a food, or add to an already indexed food's tokens.
+
+        Args:
+            food_id (int): ID of the food
+            name (str): Name of the food
+            aliases (Iterable[str]): Other text the food should be found by, e.g. external IDs
+        """
+        with self._lock:
+            self._names[food_id] = name
+            for text in (name, *aliases):
+                for token in tokenize(text):
+                    self._add_token(food_id, token)
+
+    def add_alias(self, food_id: int, alias: str) -> None:
+        with self._lock:
+            if food_id in self._names:
+                for token in tokenize(alias):
+                    self._add_token(food_id, token)
+
+    def load(self, db: Session, batch_size: int = 10_000) -> None:
+        """
+        Index every food and food source in the database, or on later calls the ones with
+        a higher ID than any loaded before.
+
+        Args:
+            db (Session): Database session
+            batch_size (int): Rows fetched per round-trip
+        """
+        with self._lock:
+            self._unranked = set()
+        try:
+            foods = select(Food.id, Food.name).where(Food.id > self._max_food_id).order_by(Food.id)
+            for food_id, name in db.execute(foods.execution_options(yield_per=batch_size)):
+                self.add(food_id, name)
+                self._max_food_id = food_id
+            sources = (
+                select(FoodSource.id, FoodSource.food_id, FoodSource.external_id)
+                .where(FoodSource.id > self._max_source_id)
+                .order_by(FoodSource.id)
+            )
+            for source_id, food_id, external_id in db.execute(sources.execution_options(yield_per=batch_size)):
+                self.add_alias(food_id, external_id)
+                self._max_source_id = source_id
+        finally:
+            # Inserting each food in order would cost O(n) per food, so a common token's list is sorted once instead
+            with self._lock:
+                for token in self._unranked:
+                    self._ranked_postings[token] = sorted(self._postings[token], key=self._rank)
+                self._unranked = None
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+
+    def _expand(self, term: str) -> Dict[str, float]:
+        """Find the indexed tokens a query term matches, with the score of each match."""
+        matches: Dict[str, float] = {}
+        start = bisect.bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            # Prefer completions that add fewer characters
+            matches[token] = EXACT_SCORE if token == term else PREFIX_SCORE - 0.01 * (len(token) - len(term))
+
+        if len(term) >= MIN_FUZZY_LENGTH:
+            term_trigrams = _trigrams(term)
+            shared: Dict[str, int] = defaultdict(int)
+            for trigram in term_trigrams:
+                for token in self._trigram_tokens.get(trigram, ()):
+                    shared[token] += 1
+            similar = []
+            for token, count in shared.items():
+                similarity = count / (len(term_trigrams) + len(token) + 1 - count)
+                if similarity >= MIN_FUZZY_SIMILARITY and token not in matches:
+                    similar.append((similarity, token))
+            for similarity, token in heapq.nlargest(MAX_FUZZY_EXPANSIONS, similar):
+                matches[token] = similarity
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[SearchResult]:
+        """
+        Find the foods best matching a free-text query.
+
+        Args:
+            query (str): Search text, may be partial or misspelt
+            limit (int): Maximum number of results
+
+        Returns:
+            List of SearchResult objects, best match first
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            expansions = sorted(
+                (self._expand(term) for term in terms),
+                key=lambda matches: sum(len(self._postings[token]) for token in matches),
+            )
+            if not expansions[0]:
+                return []
+
+            candidates: Dict[int, float] = {}
+            if len(expansions) == 1:
+                # The shortest names of the best matching tokens rank first, so a single term can stop early
+                for token, score in sorted(expansions[0].items(), key=lambda item: -item[1]):
+                    for food_id in islice(self._ranked_postings[token], max(limit, MAX_CANDIDATES)):
+                        candidates.setdefault(food_id, score)
+                    if len(candidates) >= max(limit, MAX_CANDIDATES):
+                        break
+            else:
+                # A food must match every term, so whole posting sets are intersected before any are cut short,
+                # starting from the most selective term
+                matched = set().union(*(self._postings[token] for token in expansions[0]))
+                for matches in expansions[1:]:
+                    matched = set().union(*(matched & self._postings[token] for token in matches))
+                    if not matched:
+                        return []
+                # Each term adds the score of its best matching token
+                for matches in expansions:
+                    unscored = set(matched)
+                    for token, score in sorted(matches.items(), key=lambda item: -item[1]):
+                        hits = unscored & self._postings[token]
+                        for food_id in hits:
+                            candidates[food_id] = candidates.get(food_id, 0.0) + score
+                        unscored -= hits
+                        if not unscored:
+                            break
+
+            ranked = heapq.nsmallest(
+                limit,
+                candidates.items(),
+                key=lambda item: (-item[1], len(self._names[item[0]]), self._names[item[0]]),
+            )
+            return [SearchResult(food_id, self._names[food_id], score) for food_id, score in ranked]
+
+# Shared index for the process, kept up to date by add_food and add_food_source. Every process, e.g. each API
+# worker, has its own copy, so search_foods also reloads it every REFRESH_SECONDS to pick up other processes' foods
+FOOD_SEARCH_INDEX = FoodSearchIndex()
+_load_lock = threading.Lock()
+
+def search_foods(db: Session, query: str, limit: int = 20) -> List[SearchResult]:
+    """
+    Search the food catalogue, loading the shared index on first use and refreshing it every REFRESH_SECONDS.
+
+    Args:
+        db (Session): Database session, only used to load the index
+        query (str): Search text, may be partial or misspelt
+        limit (int): Maximum number of results
+
+    Returns:
+        List of SearchResult objects, best match first
+    """
+    def stale() -> bool:
+        return not FOOD_SEARCH_INDEX.loaded or time.monotonic() - FOOD_SEARCH_INDEX.loaded_at >= REFRESH_SECONDS
+
+    if stale():
+        with _load_lock:
+            if stale():
+                FOOD_SEARCH_INDEX.load(db)
+    return FOOD_SEARCH_INDEX.search(query, limit)
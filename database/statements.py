@@ -0,0 +1,212 @@
+from datetime import datetime, date
+from typing import Optional, List, Tuple
+
+from sqlalchemy import select, insert, update, delete, and_, or_, literal, DateTime, Integer, Select, Insert, Update, Delete
+from sqlalchemy.orm import Session, selectinload, joinedload
+
+from database.schema import User, Food, UserMacroLog, UserMicroLog, FoodMicronutrient, Micronutrient, FoodSource, UserDailyMicronutrientSummary
+from database.utils import to_utc_naive, encode_cursor, decode_cursor, dialect_insert
+
+# Statement builders shared by the sync (database.queries) and async (database.async_queries) query functions,
+# so both run exactly the same SQL
+
+def _in_range(statement: Select, model, since: Optional[datetime], until: Optional[datetime]) -> Select:
+    if since is not None:
+        statement = statement.where(model.timestamp >= to_utc_naive(since))
+    if until is not None:
+        statement = statement.where(model.timestamp < to_utc_naive(until))
+    return statement
+
+def select_user_by_username(username: str) -> Select:
+    return select(User).where(User.username == username).limit(1)
+
+def select_user_id(user_id: int) -> Select:
+    return select(User.id).where(User.id == user_id)
+
+def select_all_users() -> Select:
+    return select(User)
+
+def select_food_by_name(name: str) -> Select:
+    return select(Food).where(Food.name == name).limit(1)
+
+def select_food_version(food_id: int) -> Select:
+    return select(Food.version).where(Food.id == food_id)
+
+def bump_food_version(food_id: int) -> Update:
+    return update(Food).where(Food.id == food_id).values(version=Food.version + 1)
+
+def select_existing_food_ids(food_ids: List[int]) -> Select:
+    return select(Food.id).where(Food.id.in_(set(food_ids)))
+
+def select_food_with_details(food_id: int) -> Select:
+    return select(Food).where(Food.id == food_id).options(
+        selectinload(Food.micronutrients).joinedload(FoodMicronutrient.micronutrient),
+        selectinload(Food.sources),
+    ).limit(1)
+
+def select_user_food_logs(user_id: int) -> Select:
+    return select(UserMacroLog).where(UserMacroLog.user_id == user_id)
+
+def select_user_food_logs_with_details(user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Select:
+    statement = select(UserMacroLog).where(UserMacroLog.user_id == user_id).options(
+        selectinload(UserMacroLog.food)
+        .selectinload(Food.micronutrients)
+        .joinedload(FoodMicronutrient.micronutrient)
+    )
+    return _in_range(statement, UserMacroLog, since, until).order_by(UserMacroLog.timestamp, UserMacroLog.id)
+
+def select_micronutrient_by_name(name: str) -> Select:
+    return select(Micronutrient).where(Micronutrient.name == name).limit(1)
+
+def insert_missing_by_name(db: Session, model, rows: List[dict]) -> Insert:
+    """
+    Build a multi-row INSERT ... ON CONFLICT (name) DO NOTHING for a table with unique names (foods or micronutrients),
+    returning the (name, id) of just the rows it added.
+
+    Rows whose name already exists, including ones another transaction adds concurrently, are skipped rather than
+    failing, so callers select the IDs of any names it didn't return. Rows are inserted in name order, so concurrent
+    inserts of overlapping names take their unique index locks in the same order and can't deadlock on PostgreSQL.
+
+    Args:
+        db (Session or AsyncSession): Database session, used to pick the SQL dialect
+        model: Food or Micronutrient
+        rows (List[dict]): Column values of each row, with distinct names
+    """
+    rows = sorted(rows, key=lambda row: row["name"])
+    return dialect_insert(db, model).values(rows).on_conflict_do_nothing(index_elements=[model.name]).returning(model.name, model.id)
+
+def select_ids_by_name(model, names: List[str]) -> Select:
+    return select(model.name, model.id).where(model.name.in_(names))
+
+def select_existing_food_micronutrient(food_id: int, micronutrient_id: int) -> Select:
+    return select(FoodMicronutrient).where(
+        FoodMicronutrient.food_id == food_id, FoodMicronutrient.micronutrient_id == micronutrient_id
+    ).limit(1)
+
+def select_food_micronutrients(food_id: int) -> Select:
+    return select(FoodMicronutrient).where(FoodMicronutrient.food_id == food_id)
+
+def select_user_micronutrient_logs(user_id: int) -> Select:
+    return select(UserMicroLog).where(UserMicroLog.user_id == user_id)
+
+def select_user_micronutrient_logs_with_details(user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Select:
+    statement = select(UserMicroLog).where(UserMicroLog.user_id == user_id).options(
+        joinedload(UserMicroLog.micronutrient)
+    )
+    return _in_range(statement, UserMicroLog, since, until).order_by(UserMicroLog.timestamp, UserMicroLog.id)
+
+def select_user_daily_micronutrient_summary(user_id: int, day: date) -> Select:
+    return select(UserDailyMicronutrientSummary).where(
+        UserDailyMicronutrientSummary.user_id == user_id,
+        UserDailyMicronutrientSummary.date == day
+    )
+
+def select_food_sources(food_id: int) -> Select:
+    return select(FoodSource).where(FoodSource.food_id == food_id)
+
+def select_log_page(model, user_id: int, since: Optional[datetime], until: Optional[datetime], limit: int, cursor: Optional[str]) -> Select:
+    """
+    Build the query for one newest-first page of a per-user log table, using keyset pagination on (timestamp, id).
+
+    One row more than the page size is selected, so split_log_page can tell whether there is another page.
+
+    Raises:
+        ValueError: If the limit is below 1 or the cursor is malformed
+    """
+    if limit < 1:
+        raise ValueError(f"Page limit must be at least 1, got {limit}")
+    statement = _in_range(select(model).where(model.user_id == user_id), model, since, until)
+    if cursor is not None:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+        statement = statement.where(or_(
+            model.timestamp < cursor_timestamp,
+            and_(model.timestamp == cursor_timestamp, model.id < cursor_id),
+        ))
+    return statement.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1)
+
+def split_log_page(rows: list, limit: int) -> Tuple[list, Optional[str]]:
+    """
+    Trim the rows selected by select_log_page to a page.
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+def insert_user_food_logs(user_id: int, entries: List[Tuple[int, float]], timestamp: datetime) -> Tuple[Insert, List[dict]]:
+    """
+    Build a multi-row insert of food logs returning their IDs in the order of entries.
+
+    Returns:
+        (statement, parameters) to execute together
+    """
+    timestamp = to_utc_naive(timestamp)
+    return (
+        insert(UserMacroLog).returning(UserMacroLog.id, sort_by_parameter_order=True),
+        [
+            {"user_id": user_id, "food_id": food_id, "quantity": quantity, "timestamp": timestamp}
+            for food_id, quantity in entries
+        ],
+    )
+
+def insert_user_micronutrient_logs(user_id: int, entries: List[Tuple[int, float]], timestamp: datetime) -> Tuple[Insert, List[dict]]:
+    """
+    Build a multi-row insert of micronutrient logs returning their IDs in the order of entries.
+
+    Returns:
+        (statement, parameters) to execute together
+    """
+    timestamp = to_utc_naive(timestamp)
+    return (
+        insert(UserMicroLog).returning(UserMicroLog.id, sort_by_parameter_order=True),
+        [
+            {"user_id": user_id, "micronutrient_id": micronutrient_id, "amount": amount, "timestamp": timestamp}
+            for micronutrient_id, amount in entries
+        ],
+    )
+
+def insert_food_micronutrient_logs(user_id: int, food_id: int, quantity: float, timestamp: datetime, food_log_id: int) -> Insert:
+    """
+    Build an INSERT ... SELECT logging quantity servings' worth of every micronutrient a food contains.
+
+    One statement however many micronutrients the food has, computed by the database from food_micronutrients.
+    The rows reference the food log they came from, so they can be told apart from micronutrients logged directly.
+    """
+    return insert(UserMicroLog).from_select(
+        ["user_id", "micronutrient_id", "amount", "timestamp", "food_log_id"],
+        select(
+            literal(user_id),
+            FoodMicronutrient.micronutrient_id,
+            FoodMicronutrient.amount * quantity,
+            literal(to_utc_naive(timestamp), DateTime),
+            literal(food_log_id, Integer),
+        ).where(FoodMicronutrient.food_id == food_id),
+    )
+
+def delete_food_log_micronutrients(food_log_id: int) -> Delete:
+    """Build the delete of the micronutrient logs derived from a food log, returning their (micronutrient_id, amount)."""
+    return delete(UserMicroLog).where(UserMicroLog.food_log_id == food_log_id).returning(UserMicroLog.micronutrient_id, UserMicroLog.amount)
+
+def upsert_food_micronutrients(db: Session, food_id: int, entries: List[Tuple[int, float]]) -> Insert:
+    """
+    Build a single multi-row INSERT ... ON CONFLICT DO UPDATE setting the amounts of a food's micronutrients,
+    returning the written FoodMicronutrient rows.
+
+    Args:
+        db (Session or AsyncSession): Database session, used to pick the SQL dialect
+        food_id (int): ID of the food
+        entries (List[Tuple[int, float]]): (micronutrient_id, amount) pairs, the last amount wins for repeated IDs
+    """
+    # A row may only be upserted once per statement
+    amounts = dict(entries)
+    statement = dialect_insert(db, FoodMicronutrient).values([
+        {"food_id": food_id, "micronutrient_id": micronutrient_id, "amount": amount}
+        for micronutrient_id, amount in amounts.items()
+    ])
+    return statement.on_conflict_do_update(
+        index_elements=[FoodMicronutrient.food_id, FoodMicronutrient.micronutrient_id],
+        set_={"amount": statement.excluded.amount},
+    ).returning(FoodMicronutrient)
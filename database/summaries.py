@@ -0,0 +1,208 @@
+import logging
+import argparse
+from collections import defaultdict
+from datetime import date
+from typing import Optional, Dict, List, Tuple
+
+from sqlalchemy import select, delete, insert, func, literal, Date, Select, Insert
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.schema import Food, FoodMicronutrient, UserMacroLog, UserMicroLog, UserDailySummary, UserDailyMicronutrientSummary
+from database.utils import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+def select_food_macros(entries: List[Tuple[int, float]]) -> Select:
+    """Build the query for the per-unit macros of the foods in (food_id, quantity) entries."""
+    return select(Food.id, Food.calories, Food.protein, Food.carbs, Food.fat).where(
+        Food.id.in_({food_id for food_id, _ in entries})
+    )
+
+def food_summary_upsert(db: Session, user_id: int, day: date, foods: Dict[int, Tuple[float, float, float, float]], entries: List[Tuple[int, float]], sign: int = 1) -> Insert:
+    """
+    Build the upsert adding food logs to a user's daily macro summary.
+
+    Args:
+        db (Session or AsyncSession): Database session, used to pick the SQL dialect
+        user_id (int): ID of the user
+        day (date): UTC day the logs belong to
+        foods (Dict[int, Tuple[float, float, float, float]]): Macros per unit of each food, keyed by food ID
+        entries (List[Tuple[int, float]]): (food_id, quantity) pairs
+        sign (int): 1 when logging, -1 when deleting
+    """
+    totals = [0.0, 0.0, 0.0, 0.0]
+    for food_id, quantity in entries:
+        for i, value in enumerate(foods.get(food_id, (0.0, 0.0, 0.0, 0.0))):
+            totals[i] += sign * quantity * value
+
+    statement = dialect_insert(db, UserDailySummary).values(
+        user_id=user_id, date=day, calories=totals[0], protein=totals[1], carbs=totals[2], fat=totals[3]
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[UserDailySummary.user_id, UserDailySummary.date],
+        set_={
+            "calories": UserDailySummary.calories + statement.excluded.calories,
+            "protein": UserDailySummary.protein + statement.excluded.protein,
+            "carbs": UserDailySummary.carbs + statement.excluded.carbs,
+            "fat": UserDailySummary.fat + statement.excluded.fat,
+        },
+    )
+
+def micronutrient_summary_upsert(db: Session, user_id: int, day: date, entries: List[Tuple[int, float]], sign: int = 1) -> Tuple[Insert, List[dict]]:
+    """
+    Build the upsert adding micronutrient logs to a user's daily micronutrient summary.
+
+    Args:
+        db (Session or AsyncSession): Database session, used to pick the SQL dialect
+        user_id (int): ID of the user
+        day (date): UTC day the logs belong to
+        entries (List[Tuple[int, float]]): (micronutrient_id, amount) pairs
+        sign (int): 1 when logging, -1 when deleting
+
+    Returns:
+        (statement, parameters) to execute together
+    """
+    totals = defaultdict(float)
+    for micronutrient_id, amount in entries:
+        totals[micronutrient_id] += sign * amount
+
+    statement = dialect_insert(db, UserDailyMicronutrientSummary)
+    return (
+        statement.on_conflict_do_update(
+            index_elements=[UserDailyMicronutrientSummary.user_id, UserDailyMicronutrientSummary.date, UserDailyMicronutrientSummary.micronutrient_id],
+            set_={"amount": UserDailyMicronutrientSummary.amount + statement.excluded.amount},
+        ),
+        [
+            {"user_id": user_id, "date": day, "micronutrient_id": micronutrient_id, "amount": amount}
+            for micronutrient_id, amount in totals.items()
+        ],
+    )
+
+def food_micronutrient_summary_upsert(db: Session, user_id: int, day: date, food_id: int, quantity: float) -> Insert:
+    """
+    Build an INSERT ... SELECT adding quantity servings of a food's micronutrients to a user's daily micronutrient summary.
+
+    Args:
+        db (Session or AsyncSession): Database session, used to pick the SQL dialect
+        user_id (int): ID of the user
+        day (date): UTC day the logs belong to
+        food_id (int): ID of the food
+        quantity (float): Servings of the food
+    """
+    statement = dialect_insert(db, UserDailyMicronutrientSummary).from_select(
+        ["user_id", "date", "micronutrient_id", "amount"],
+        # Grouped so a food listing a micronutrient twice still conflicts with each summary row only once
+        select(literal(user_id), literal(day, Date), FoodMicronutrient.micronutrient_id, func.sum(FoodMicronutrient.amount) * quantity)
+        .where(FoodMicronutrient.food_id == food_id)
+        .group_by(FoodMicronutrient.micronutrient_id),
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[UserDailyMicronutrientSummary.user_id, UserDailyMicronutrientSummary.date, UserDailyMicronutrientSummary.micronutrient_id],
+        set_={"amount": UserDailyMicronutrientSummary.amount + statement.excluded.amount},
+    )
+
+def apply_food_logs(db: Session, user_id: int, day: date, entries: List[Tuple[int, float]], sign: int = 1) -> None:
+    """
+    Add (or with sign=-1, remove) food logs to a user's daily macro summary.
+
+    Runs inside the caller's transaction and does not commit.
+
+    Args:
+        db (Session): Database session
+        user_id (int): ID of the user
+        day (date): UTC day the logs belong to
+        entries (List[Tuple[int, float]]): (food_id, quantity) pairs
+        sign (int): 1 when logging, -1 when deleting
+    """
+    foods = {food_id: tuple(macros) for food_id, *macros in db.execute(select_food_macros(entries))}
+    db.execute(food_summary_upsert(db, user_id, day, foods, entries, sign))
+
+def apply_micronutrient_logs(db: Session, user_id: int, day: date, entries: List[Tuple[int, float]], sign: int = 1) -> None:
+    """
+    Add (or with sign=-1, remove) micronutrient logs to a user's daily micronutrient summary.
+
+    Runs inside the caller's transaction and does not commit.
+
+    Args:
+        db (Session): Database session
+        user_id (int): ID of the user
+        day (date): UTC day the logs belong to
+        entries (List[Tuple[int, float]]): (micronutrient_id, amount) pairs
+        sign (int): 1 when logging, -1 when deleting
+    """
+    statement, rows = micronutrient_summary_upsert(db, user_id, day, entries, sign)
+    db.execute(statement, rows)
+
+def rebuild_daily_summaries(db: Session, user_id: Optional[int] = None) -> Optional[int]:
+    """
+    Regenerate the daily summary tables from the raw log tables.
+
+    Args:
+        db (Session): Database session
+        user_id (int, optional): Only rebuild this user's summaries, defaults to all users
+
+    Returns:
+        Number of daily macro summaries written if successful, None otherwise
+    """
+    try:
+        macro_day = func.date(UserMacroLog.timestamp)
+        macro_rows = (
+            select(
+                UserMacroLog.user_id,
+                macro_day,
+                func.sum(UserMacroLog.quantity * Food.calories),
+                func.sum(UserMacroLog.quantity * Food.protein),
+                func.sum(UserMacroLog.quantity * Food.carbs),
+                func.sum(UserMacroLog.quantity * Food.fat),
+            )
+            .join(Food, Food.id == UserMacroLog.food_id)
+            .group_by(UserMacroLog.user_id, macro_day)
+        )
+        micro_day = func.date(UserMicroLog.timestamp)
+        micro_rows = (
+            select(UserMicroLog.user_id, micro_day, UserMicroLog.micronutrient_id, func.sum(UserMicroLog.amount))
+            .group_by(UserMicroLog.user_id, micro_day, UserMicroLog.micronutrient_id)
+        )
+        clear_macros = delete(UserDailySummary)
+        clear_micros = delete(UserDailyMicronutrientSummary)
+        if user_id is not None:
+            macro_rows = macro_rows.where(UserMacroLog.user_id == user_id)
+            micro_rows = micro_rows.where(UserMicroLog.user_id == user_id)
+            clear_macros = clear_macros.where(UserDailySummary.user_id == user_id)
+            clear_micros = clear_micros.where(UserDailyMicronutrientSummary.user_id == user_id)
+
+        db.execute(clear_macros)
+        db.execute(clear_micros)
+        written = db.execute(insert(UserDailySummary).from_select(
+            ["user_id", "date", "calories", "protein", "carbs", "fat"], macro_rows
+        )).rowcount
+        db.execute(insert(UserDailyMicronutrientSummary).from_select(
+            ["user_id", "date", "micronutrient_id", "amount"], micro_rows
+        ))
+        db.commit()
+        return written
+    except SQLAlchemyError:
+        db.rollback()
+        logger.exception("Error rebuilding daily summaries")
+        return None
+
+def main() -> None:
+    from database.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the per-user daily summary tables from the raw logs.")
+    parser.add_argument("--user-id", type=int, help="only rebuild this user's summaries")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        written = rebuild_daily_summaries(db, args.user_id)
+    finally:
+        db.close()
+    if written is None:
+        raise SystemExit(1)
+    print(f"Rebuilt {written} daily summaries")
+
+
+if __name__ == "__main__":
+    main()
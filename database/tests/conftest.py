@@ -1,6 +1,6 @@
 import os
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from database.schema import Base
 
@@ -35,3 +35,17 @@ def db(test_engine):
     finally:
         db.rollback()
         db.close()
+
+@pytest.fixture
+def count_queries(test_engine):
+    # Collects every SQL statement sent to the test database while the test runs
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(test_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(test_engine, "before_cursor_execute", before_cursor_execute)
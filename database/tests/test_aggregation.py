@@ -0,0 +1,45 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from database import queries
+from database.aggregation import get_nutrition_totals, PERIOD_WEEK
+
+def test_get_nutrition_totals_per_day(db):
+    """Test daily totals are summed per local day of the user."""
+    user = queries.add_user(db, username="dailytotals", email="dailytotals@example.com", password_hash="pass")
+    egg = queries.add_food(db, name="Boiled Egg", calories=78, protein=6.3, carbs=0.6, fat=5.3)
+    bread = queries.add_food(db, name="Wholemeal Bread", calories=80, protein=4, carbs=14, fat=1)
+    
+    # 23:30 UTC on 1 March is already 2 March in Sydney
+    queries.log_user_foods_bulk(db, user.id, [(egg.id, 2.0), (bread.id, 1.0)], timestamp=datetime(2025, 3, 1, 8, 0, tzinfo=timezone.utc))
+    queries.log_user_foods_bulk(db, user.id, [(bread.id, 2.0)], timestamp=datetime(2025, 3, 1, 23, 30, tzinfo=timezone.utc))
+    
+    utc_totals = get_nutrition_totals(db, user.id)
+    assert utc_totals == [(date(2025, 3, 1), 396.0, pytest.approx(24.6), pytest.approx(43.2), pytest.approx(13.6))]
+    
+    sydney_totals = get_nutrition_totals(db, user.id, tz_name="Australia/Sydney")
+    assert [(day, calories) for day, calories, *_ in sydney_totals] == [(date(2025, 3, 1), 236.0), (date(2025, 3, 2), 160.0)]
+
+def test_get_nutrition_totals_per_week(db):
+    """Test weekly totals are grouped by the Monday starting each ISO week."""
+    user = queries.add_user(db, username="weeklytotals", email="weeklytotals@example.com", password_hash="pass")
+    food = queries.add_food(db, name="Protein Shake", calories=120, protein=24, carbs=3, fat=1.5)
+    
+    # Sunday 9 March and Monday 10 March 2025 fall in different ISO weeks
+    for day in (3, 9, 10):
+        queries.log_user_foods_bulk(db, user.id, [(food.id, 1.0)], timestamp=datetime(2025, 3, day, 12, 0, tzinfo=timezone.utc))
+    
+    totals = get_nutrition_totals(db, user.id, period=PERIOD_WEEK)
+    assert [(week, calories) for week, calories, *_ in totals] == [(date(2025, 3, 3), 240.0), (date(2025, 3, 10), 120.0)]
+    
+    # The range bounds exclude logs outside it
+    totals = get_nutrition_totals(db, user.id, since=datetime(2025, 3, 9, tzinfo=timezone.utc), period=PERIOD_WEEK)
+    assert [(week, calories) for week, calories, *_ in totals] == [(date(2025, 3, 3), 120.0), (date(2025, 3, 10), 120.0)]
+
+def test_get_nutrition_totals_invalid_arguments(db):
+    """Test unknown periods and timezones are rejected."""
+    with pytest.raises(ValueError):
+        get_nutrition_totals(db, 1, period="fortnight")
+    with pytest.raises(ValueError):
+        get_nutrition_totals(db, 1, tz_name="Not/AZone")
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from database import queries
+from database.analytics import load_intake_history, rolling_mean, reference_intakes, analyse_micronutrients
+
+SINCE = datetime(2025, 5, 1, tzinfo=timezone.utc)
+UNTIL = datetime(2025, 5, 4, tzinfo=timezone.utc)
+
+@pytest.fixture
+def history(db, request):
+    # The test database is shared, so each test gets its own user and foods
+    suffix = request.node.name
+    user = queries.add_user(db, username=f"analytics_{suffix}", email=f"{suffix}@example.com", password_hash="pass")
+    oats = queries.add_food(db, name=f"Oats {suffix}", calories=380, protein=13, carbs=67, fat=7)
+    spinach = queries.add_food(db, name=f"Spinach {suffix}", calories=23, protein=2.9, carbs=3.6, fat=0.4)
+    iron = queries.add_micronutrient(db, name="Iron, Fe", unit="mg")
+    vitamin_d = queries.add_micronutrient(db, name="Vitamin D (D2 + D3)", unit="mg")
+    queries.add_food_micronutrient(db, oats.id, iron.id, 4.0)
+    queries.add_food_micronutrient(db, spinach.id, vitamin_d.id, 0.002)
+
+    queries.log_user_foods_bulk(db, user.id, [(oats.id, 1.0), (spinach.id, 2.0)], timestamp=datetime(2025, 5, 1, 8, 0, tzinfo=timezone.utc))
+    queries.log_user_foods_bulk(db, user.id, [(oats.id, 0.5)], timestamp=datetime(2025, 5, 3, 23, 59, tzinfo=timezone.utc))
+    queries.log_user_micronutrients_bulk(db, user.id, [(iron.id, 10.0)], timestamp=datetime(2025, 5, 3, 9, 0, tzinfo=timezone.utc))
+    # Outside the requested range
+    queries.log_user_foods_bulk(db, user.id, [(oats.id, 5.0)], timestamp=UNTIL)
+
+    return load_intake_history(db, user.id, since=SINCE, until=UNTIL), iron.id, vitamin_d.id
+
+def test_load_intake_history(history):
+    """Test intake is summed per day from logged foods' contents and direct micronutrient logs."""
+    history, iron_id, vitamin_d_id = history
+    assert history is not None
+    assert history.days.tolist() == np.arange("2025-05-01", "2025-05-04", dtype="datetime64[D]").tolist()
+    assert history.micronutrient_ids.tolist() == sorted([iron_id, vitamin_d_id])
+
+    iron = history.micronutrients[:, history.micronutrient_ids.tolist().index(iron_id)]
+    vitamin_d = history.micronutrients[:, history.micronutrient_ids.tolist().index(vitamin_d_id)]
+    assert iron.tolist() == pytest.approx([4.0, 0.0, 12.0])
+    assert vitamin_d.tolist() == pytest.approx([0.004, 0.0, 0.0])
+    assert history.macros[:, 0].tolist() == pytest.approx([426.0, 0.0, 190.0])
+    assert history.macros[0, 1] == pytest.approx(18.8)
+
+def test_load_intake_history_counts_food_contents_once(db):
+    """Test a food logged with its micronutrients counts them once, alongside plain food logs and direct logs."""
+    user = queries.add_user(db, username="analytics_once", email="analytics_once@example.com", password_hash="pass")
+    lentils = queries.add_food(db, name="Analytics Lentils", calories=116, protein=9, carbs=20, fat=0.4)
+    iron = queries.add_micronutrient(db, name="Iron, Fe", unit="mg")
+    queries.add_food_micronutrient(db, lentils.id, iron.id, 4.0)
+    day = datetime(2025, 5, 2, 12, 0, tzinfo=timezone.utc)
+    
+    queries.log_user_food_with_micronutrients(db, user.id, lentils.id, 1.0, timestamp=day)
+    queries.log_user_foods_bulk(db, user.id, [(lentils.id, 0.5)], timestamp=day)
+    queries.log_user_micronutrients_bulk(db, user.id, [(iron.id, 1.0)], timestamp=day)
+    
+    history = load_intake_history(db, user.id, since=SINCE, until=UNTIL)
+    iron_column = history.micronutrient_ids.tolist().index(iron.id)
+    assert history.micronutrients[1, iron_column] == pytest.approx(4.0 + 2.0 + 1.0)
+    
+    # The daily summary only has the logged micronutrients, not the plain food log's contents
+    summary = {row.micronutrient_id: row.amount for row in queries.get_user_daily_micronutrient_summary(db, user.id, day.date())}
+    assert summary[iron.id] == pytest.approx(4.0 + 1.0)
+
+def test_load_intake_history_without_logs(db):
+    """Test a user with nothing logged gets zero intake on every day."""
+    user = queries.add_user(db, username="emptyanalytics", email="emptyanalytics@example.com", password_hash="pass")
+    history = load_intake_history(db, user.id, since=SINCE, until=UNTIL)
+    assert history is not None
+    assert history.micronutrients.shape == (3, 0)
+    assert history.macros.tolist() == [[0.0] * 4] * 3
+
+    analysis = analyse_micronutrients(history, window_days=2)
+    assert analysis.mean_daily.shape == (0,)
+    assert analysis.percentiles.shape == (5, 0)
+
+def test_rolling_mean():
+    """Test the trailing mean matches a mean over each window, with NaN before the first full window."""
+    values = np.random.default_rng(0).uniform(0, 10, size=(20, 3))
+    result = rolling_mean(values, 7)
+    assert np.isnan(result[:6]).all()
+    expected = np.array([values[i - 6:i + 1].mean(axis=0) for i in range(6, 20)])
+    np.testing.assert_allclose(result[6:], expected)
+    assert np.isnan(rolling_mean(values, 21)).all()
+    with pytest.raises(ValueError):
+        rolling_mean(values, 0)
+
+def test_analyse_micronutrients(history):
+    """Test references are converted to each micronutrient's unit and compared with recent intake."""
+    history, iron_id, vitamin_d_id = history
+    iron = history.micronutrient_ids.tolist().index(iron_id)
+    vitamin_d = history.micronutrient_ids.tolist().index(vitamin_d_id)
+
+    reference = reference_intakes(history)
+    assert reference[iron] == pytest.approx(18.0)
+    assert reference[vitamin_d] == pytest.approx(0.015)
+
+    analysis = analyse_micronutrients(history, window_days=2, percentile_levels=(0, 100))
+    assert analysis.mean_daily[iron] == pytest.approx(6.0)
+    assert analysis.deficit[iron] == pytest.approx(12.0)
+    assert analysis.percent_of_reference[iron] == pytest.approx(100 / 3)
+    assert analysis.days_below_reference[iron] == pytest.approx(1.0)
+    assert analysis.percentiles[:, iron].tolist() == pytest.approx([0.0, 12.0])
+    assert np.isnan(analysis.rolling_mean[0]).all()
+    assert analysis.rolling_mean[2, iron] == pytest.approx(6.0)
+
+    # A micronutrient without a reference intake has no deficit
+    analysis = analyse_micronutrients(history, window_days=2, references={})
+    assert np.isnan(analysis.deficit).all()
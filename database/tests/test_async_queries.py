@@ -0,0 +1,153 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database import async_queries, queries
+from database.db import async_database_url
+from database.schema import FoodMicronutrient
+from database.tests.conftest import TEST_DATABASE_URL
+
+@pytest.fixture
+def run_async(test_engine):
+    # Runs a coroutine function with a fresh AsyncSession on the test database
+    def run(test):
+        async def main():
+            # NullPool, as pooled connections can't be reused across the event loops of different tests
+            engine = create_async_engine(async_database_url(TEST_DATABASE_URL), poolclass=NullPool)
+            try:
+                async with async_sessionmaker(engine, autoflush=False, expire_on_commit=False)() as db:
+                    return await test(db)
+            finally:
+                await engine.dispose()
+        return asyncio.run(main())
+    return run
+
+def test_async_database_url():
+    """Test sync database URLs are mapped to async drivers."""
+    assert async_database_url("sqlite:///nutrition_tracker.db") == "sqlite+aiosqlite:///nutrition_tracker.db"
+    assert async_database_url("postgresql://user:pw@host/db") == "postgresql+asyncpg://user:pw@host/db"
+    assert async_database_url("postgres://user:pw@host/db") == "postgresql+asyncpg://user:pw@host/db"
+
+def test_async_add_and_get_user(run_async):
+    """Test the async user functions match the sync ones."""
+    async def test(db):
+        user = await async_queries.add_user(db, "async_user", "async@example.com", "hash")
+        assert user is not None and user.id is not None
+        assert (await async_queries.get_user_by_username(db, "async_user")).id == user.id
+        assert await async_queries.get_user_by_username(db, "no_such_async_user") is None
+        assert await async_queries.add_user(db, "async_user", "other@example.com", "hash") is None
+    run_async(test)
+
+def test_async_log_foods_bulk_and_page(run_async):
+    """Test bulk logging, summaries and keyset pages through an AsyncSession."""
+    async def test(db):
+        user = await async_queries.add_user(db, "async_logger", "async_logger@example.com", "hash")
+        food = await async_queries.add_food(db, "Async Oats", 380, 13, 67, 7)
+        when = datetime(2024, 5, 1, 8, tzinfo=timezone.utc)
+        ids = await async_queries.log_user_foods_bulk(db, user.id, [(food.id, 1.0), (food.id, 2.0), (food.id, 0.5)], when)
+        assert len(ids) == 3
+
+        summary = await async_queries.get_user_daily_summary(db, user.id, date(2024, 5, 1))
+        assert summary.calories == pytest.approx(380 * 3.5)
+
+        page, cursor = await async_queries.get_user_food_logs_page(db, user.id, limit=2)
+        assert [log.id for log in page] == sorted(ids, reverse=True)[:2]
+        rest, cursor = await async_queries.get_user_food_logs_page(db, user.id, limit=2, cursor=cursor)
+        assert [log.id for log in rest] == [min(ids)]
+        assert cursor is None
+
+        assert await async_queries.delete_user_food_log(db, ids[0])
+        summary = await async_queries.get_user_daily_summary(db, user.id, date(2024, 5, 1))
+        await db.refresh(summary)
+        assert summary.calories == pytest.approx(380 * 2.5)
+    run_async(test)
+
+def test_async_log_food_with_micronutrients(run_async):
+    """Test a food's micronutrients are logged with it through an AsyncSession."""
+    async def test(db):
+        user = await async_queries.add_user(db, "async_expander", "async_expander@example.com", "hash")
+        food = await async_queries.add_food(db, "Async Spinach", 49, 4.3, 8.8, 0.9)
+        folate = await async_queries.add_micronutrient(db, "Async Folate", "μg")
+        db.add(FoodMicronutrient(food_id=food.id, micronutrient_id=folate.id, amount=194.0))
+        await db.commit()
+        when = datetime(2024, 5, 2, 12, tzinfo=timezone.utc)
+
+        log_id, count = await async_queries.log_user_food_with_micronutrients(db, user.id, food.id, 2.0, when)
+        assert count == 1
+        assert [log.id for log in await async_queries.get_user_food_logs(db, user.id)] == [log_id]
+        totals = await async_queries.get_user_daily_micronutrient_summary(db, user.id, date(2024, 5, 2))
+        assert [(row.micronutrient_id, row.amount) for row in totals] == [(folate.id, 388.0)]
+
+        # Deleting the food log takes its micronutrients with it
+        assert await async_queries.delete_user_food_log(db, log_id)
+        assert await async_queries.get_user_micronutrient_logs(db, user.id) == []
+        totals = await async_queries.get_user_daily_micronutrient_summary(db, user.id, date(2024, 5, 2))
+        await db.refresh(totals[0])
+        assert totals[0].amount == 0.0
+    run_async(test)
+
+def test_async_set_food_micronutrients(run_async):
+    """Test a food's nutrient profile is upserted through an AsyncSession."""
+    async def test(db):
+        food = await async_queries.add_food(db, "Async Lentils", 116, 9, 20, 0.4)
+        iron = await async_queries.add_micronutrient(db, "Async Lentil Iron", "mg")
+        zinc = await async_queries.add_micronutrient(db, "Async Lentil Zinc", "mg")
+        await async_queries.set_food_micronutrients(db, food.id, [(iron.id, 3.3), (zinc.id, 1.3)])
+        written = await async_queries.set_food_micronutrients(db, food.id, [(iron.id, 3.5)])
+        assert [(fm.micronutrient_id, fm.amount) for fm in written] == [(iron.id, 3.5)]
+        profile = await async_queries.get_food_micronutrients(db, food.id)
+        assert sorted((fm.micronutrient_id, fm.amount) for fm in profile) == sorted([(iron.id, 3.5), (zinc.id, 1.3)])
+    run_async(test)
+
+def test_async_get_or_create(run_async):
+    """Test the async get-or-create functions resolve new and existing names."""
+    async def test(db):
+        food_id = await async_queries.get_or_create_food(db, "Async Resolved Muesli", 367, 10, 66, 6)
+        assert await async_queries.get_or_create_food(db, "Async Resolved Muesli", 1, 1, 1, 1) == food_id
+        ids = await async_queries.get_or_create_micronutrients(db, {"Async Resolved Iodine": "μg", "Async Resolved Boron": "mg"})
+        assert await async_queries.get_or_create_micronutrient(db, "Async Resolved Boron", "mg") == ids["Async Resolved Boron"]
+        assert (await async_queries.get_micronutrient_by_name(db, "Async Resolved Iodine")).id == ids["Async Resolved Iodine"]
+    run_async(test)
+
+def test_async_details_are_eager_loaded(run_async):
+    """Test detail getters load relationships up front, as lazy loading isn't possible with an AsyncSession."""
+    async def test(db):
+        user = await async_queries.add_user(db, "async_details", "async_details@example.com", "hash")
+        food = await async_queries.add_food(db, "Async Kale", 49, 4.3, 8.8, 0.9)
+        vitamin = await async_queries.add_micronutrient(db, "Async Vitamin K", "μg")
+        db.add(FoodMicronutrient(food_id=food.id, micronutrient_id=vitamin.id, amount=704.8))
+        await db.commit()
+        await async_queries.log_user_food(db, user.id, food.id, 1.0)
+        db.expunge_all()
+
+        logs = await async_queries.get_user_food_logs_with_details(db, user.id)
+        assert [fm.micronutrient.name for fm in logs[0].food.micronutrients] == ["Async Vitamin K"]
+        detail = await async_queries.get_food_with_details(db, food.id)
+        assert [fm.amount for fm in detail.micronutrients] == [704.8]
+    run_async(test)
+
+def test_async_matches_sync(db, run_async):
+    """Test the sync and async getters return the same rows."""
+    user = queries.add_user(db, "twin_user", "twin@example.com", "hash")
+    food = queries.add_food(db, "Twin Rice", 130, 2.7, 28, 0.3)
+    queries.log_user_foods_bulk(db, user.id, [(food.id, 1.0), (food.id, 1.5)])
+    user_id = user.id
+
+    async def test(async_db):
+        return [log.id for log in await async_queries.get_user_food_logs(async_db, user_id)]
+    assert run_async(test) == [log.id for log in queries.get_user_food_logs(db, user_id)]
+
+def test_async_concurrent_reads(run_async):
+    """Test many reads can be awaited at once on separate sessions."""
+    async def test(db):
+        food = await async_queries.add_food(db, "Async Apple", 52, 0.3, 14, 0.2)
+        factory = async_sessionmaker(db.bind, expire_on_commit=False)
+
+        async def read():
+            async with factory() as session:
+                return (await async_queries.get_food_by_name(session, "Async Apple")).id
+        assert await asyncio.gather(*(read() for _ in range(20))) == [food.id] * 20
+    run_async(test)
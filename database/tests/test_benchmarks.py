@@ -0,0 +1,47 @@
+import inspect
+
+from sqlalchemy import func, select
+
+from database import queries
+from database.benchmarks.data import PRESETS, populate
+from database.benchmarks.query_latency import CASES, CaseResult, run_suite, find_regressions
+from database.db import EngineSettings, create_database_engine
+from database.schema import Base, UserMacroLog, UserDailySummary
+
+def test_populate_and_run_suite(tmp_path):
+    """Test the generated dataset matches its spec and every query function can be benchmarked on it."""
+    spec = PRESETS["tiny"]
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'benchmark.db'}", EngineSettings())
+    try:
+        Base.metadata.create_all(bind=engine)
+        dataset = populate(engine, spec, progress=None)
+        with engine.connect() as connection:
+            assert connection.scalar(select(func.count()).select_from(UserMacroLog)) == spec.food_logs
+            assert connection.scalar(select(func.count()).select_from(UserDailySummary)) == spec.users * spec.days
+        assert len(dataset.user_ids) == spec.users
+
+        results = run_suite(engine, dataset, iterations=3, warmup=1)
+    finally:
+        engine.dispose()
+
+    assert [result.name for result in results] == [benchmark.name for benchmark in CASES]
+    assert all(result.calls == 3 and result.p50_ms <= result.p95_ms <= result.p99_ms for result in results)
+    assert next(result for result in results if result.name == "log_user_foods_bulk").rows == 15
+
+def test_every_query_function_has_a_case():
+    """Test no public function of database.queries is left out of the benchmark."""
+    functions = {
+        name for name, function in inspect.getmembers(queries, inspect.isfunction)
+        if not name.startswith("_") and function.__module__ == queries.__name__
+    }
+    assert functions <= {benchmark.name for benchmark in CASES}
+
+def test_find_regressions():
+    """Test only latencies well over the baseline count as regressions."""
+    baseline = {"get_food_version": {"p50_ms": 1.0, "p95_ms": 2.0}, "get_food_sources": {"p50_ms": 0.1, "p95_ms": 0.2}}
+    results = [
+        CaseResult.from_timings("get_food_version", [0.001, 0.001, 0.004], 3),
+        CaseResult.from_timings("get_food_sources", [0.0002, 0.0002, 0.0002], 3),
+        CaseResult.from_timings("add_food", [0.05], 1),
+    ]
+    assert find_regressions(results, baseline) == ["get_food_version: p95 2.000 ms -> 3.700 ms"]
@@ -0,0 +1,74 @@
+import dataclasses
+
+import pytest
+
+from database import queries
+from database.cache import LRUCache, MISSING, catalogue_cache_stats, clear_catalogue_caches
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    clear_catalogue_caches()
+    yield
+    clear_catalogue_caches()
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test the cache stays within its size bound by evicting the oldest entry."""
+    cache = LRUCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions, stats.size) == (3, 1, 1, 2)
+
+def test_lru_cache_expires_entries():
+    """Test entries are dropped once their time to live has passed."""
+    now = [0.0]
+    cache = LRUCache(max_size=10, ttl_seconds=5, clock=lambda: now[0])
+    cache.set("food", "snapshot")
+    
+    now[0] = 4.9
+    assert cache.get("food") == "snapshot"
+    now[0] = 5.0
+    assert cache.get("food") is MISSING
+    assert cache.stats().size == 0
+
+def test_get_food_by_name_cached(db, count_queries):
+    """Test repeat lookups are served from the cache as detached snapshots."""
+    queries.add_food(db, name="Cached Lentils", calories=116, protein=9, carbs=20, fat=0.4)
+    count_queries.clear()
+    
+    first = queries.get_food_by_name_cached(db, "Cached Lentils")
+    second = queries.get_food_by_name_cached(db, "Cached Lentils")
+    
+    assert first is second
+    assert first.calories == 116
+    assert len(count_queries) == 1
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        first.calories = 0
+    assert catalogue_cache_stats()["food_by_name"].hits == 1
+
+def test_get_micronutrient_by_name_cached_misses_not_cached(db):
+    """Test an unknown name is not cached, so adding it is seen immediately."""
+    assert queries.get_micronutrient_by_name_cached(db, "Cached Chromium") is None
+    queries.add_micronutrient(db, name="Cached Chromium", unit="μg")
+    
+    found = queries.get_micronutrient_by_name_cached(db, "Cached Chromium")
+    assert found is not None
+    assert found.unit == "μg"
+
+def test_get_food_micronutrients_cached_invalidated_on_write(db):
+    """Test adding a nutrient to a food invalidates its cached nutrient list."""
+    food = queries.add_food(db, name="Cached Almonds", calories=579, protein=21, carbs=22, fat=50)
+    vitamin_e = queries.add_micronutrient(db, name="Cached Vitamin E", unit="mg")
+    manganese = queries.add_micronutrient(db, name="Cached Manganese", unit="mg")
+    queries.add_food_micronutrient(db, food.id, vitamin_e.id, 25.6)
+    assert len(queries.get_food_micronutrients_cached(db, food.id)) == 1
+    
+    queries.add_food_micronutrient(db, food.id, manganese.id, 2.2)
+    
+    amounts = {fm.micronutrient_id: fm.amount for fm in queries.get_food_micronutrients_cached(db, food.id)}
+    assert amounts == {vitamin_e.id: 25.6, manganese.id: 2.2}
@@ -1,6 +1,12 @@
-from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 
-from database import queries
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+
+from database import queries, statements
 from database.schema import User, Food, UserMacroLog, UserMicroLog, FoodMicronutrient, Micronutrient, FoodSource
 
 # User Tests
@@ -90,6 +96,12 @@ def test_get_all_users(db):
     assert "user2" in usernames
     assert "user3" in usernames
 
+def test_user_exists(db):
+    """Test checking whether a user ID exists."""
+    user = queries.add_user(db, username="existinguser", email="existing@example.com", password_hash="pass")
+    assert queries.user_exists(db, user.id) is True
+    assert queries.user_exists(db, user.id + 10_000) is False
+
 # Food Tests
 def test_add_food(db):
     """Test adding a new food to the database."""
@@ -141,6 +153,12 @@ def test_get_food_by_name(db):
     missing_food = queries.get_food_by_name(db, "Nonexistent Food")
     assert missing_food is None
 
+def test_get_existing_food_ids(db):
+    """Test only the IDs of foods that exist are returned."""
+    food = queries.add_food(db, name="Existing Lentils", calories=116, protein=9, carbs=20, fat=0.4)
+    assert queries.get_existing_food_ids(db, [food.id, food.id, food.id + 10_000]) == {food.id}
+    assert queries.get_existing_food_ids(db, []) == set()
+
 # UserMacroLog Tests
 def test_log_user_food(db):
     """Test logging a food item consumed by a user."""
@@ -189,6 +207,161 @@ def test_get_user_food_logs(db):
     assert (food1.id, 1.0) in log_foods
     assert (food2.id, 1.5) in log_foods
 
+def test_log_user_foods_bulk(db):
+    """Test logging a whole meal of food items in one call."""
+    # Create test user and foods
+    user = queries.add_user(db, username="bulkmeal", email="bulkmeal@example.com", password_hash="bulkpass")
+    food1 = queries.add_food(db, name="Rice", calories=130, protein=2.7, carbs=28, fat=0.3)
+    food2 = queries.add_food(db, name="Broccoli", calories=34, protein=2.8, carbs=7, fat=0.4)
+    
+    # Log the meal
+    log_ids = queries.log_user_foods_bulk(db, user.id, [(food1.id, 1.5), (food2.id, 0.5)])
+    
+    # Verify IDs are returned in the order of the entries
+    assert log_ids is not None
+    assert len(log_ids) == 2
+    logs = {log.id: log for log in queries.get_user_food_logs(db, user.id)}
+    assert (logs[log_ids[0]].food_id, logs[log_ids[0]].quantity) == (food1.id, 1.5)
+    assert (logs[log_ids[1]].food_id, logs[log_ids[1]].quantity) == (food2.id, 0.5)
+    assert logs[log_ids[0]].timestamp == logs[log_ids[1]].timestamp
+
+def test_log_bulk_normalises_timestamp(db):
+    """Test bulk logs with an offset-aware timestamp are stored in naive UTC."""
+    user = queries.add_user(db, username="offsetmeal", email="offsetmeal@example.com", password_hash="offsetpass")
+    food = queries.add_food(db, name="Offset Croissant", calories=406, protein=8, carbs=46, fat=21)
+    micro = queries.add_micronutrient(db, name="Offset Nutrient", unit="mg")
+    eaten = datetime(2025, 3, 1, 1, 30, tzinfo=timezone(timedelta(hours=2)))
+    
+    queries.log_user_foods_bulk(db, user.id, [(food.id, 1.0)], timestamp=eaten)
+    queries.log_user_micronutrients_bulk(db, user.id, [(micro.id, 1.0)], timestamp=eaten)
+    
+    # Stored as 23:30 UTC the previous day, matching the day the summary was added to
+    utc = datetime(2025, 2, 28, 23, 30)
+    assert [log.timestamp for log in queries.get_user_food_logs(db, user.id)] == [utc]
+    assert [log.timestamp for log in queries.get_user_micronutrient_logs(db, user.id)] == [utc]
+    assert queries.get_user_daily_summary(db, user.id, utc.date()).calories == 406.0
+
+def test_log_user_foods_bulk_single_commit(db, monkeypatch):
+    """Test a 1,000-row batch is written with exactly one commit."""
+    user = queries.add_user(db, username="bigeater", email="bigeater@example.com", password_hash="bigpass")
+    food = queries.add_food(db, name="Grape", calories=3, protein=0, carbs=0.9, fat=0)
+    
+    # Count commits issued by the bulk writer
+    commits = []
+    original_commit = db.commit
+    def counting_commit():
+        commits.append(1)
+        original_commit()
+    monkeypatch.setattr(db, "commit", counting_commit)
+    
+    log_ids = queries.log_user_foods_bulk(db, user.id, [(food.id, 1.0)] * 1000)
+    
+    assert log_ids is not None
+    assert len(set(log_ids)) == 1000
+    assert len(commits) == 1
+    assert db.query(UserMacroLog).filter(UserMacroLog.user_id == user.id).count() == 1000
+
+def test_log_user_foods_bulk_rolls_back_as_unit(db):
+    """Test a failing row rolls back the whole batch."""
+    user = queries.add_user(db, username="badmeal", email="badmeal@example.com", password_hash="badpass")
+    food = queries.add_food(db, name="Toast", calories=75, protein=2.6, carbs=13, fat=1)
+    
+    # The second entry violates the NOT NULL constraint on quantity
+    log_ids = queries.log_user_foods_bulk(db, user.id, [(food.id, 1.0), (food.id, None)])
+    
+    assert log_ids is None
+    assert queries.get_user_food_logs(db, user.id) == []
+
+def test_log_user_food_with_micronutrients(db, count_queries):
+    """Test logging a food also logs its micronutrients in a fixed number of statements."""
+    user = queries.add_user(db, username="expander", email="expander@example.com", password_hash="expandpass")
+    food = queries.add_food(db, name="Fortified Cereal", calories=380, protein=8, carbs=84, fat=2)
+    micros = [queries.add_micronutrient(db, name=f"Fortified Nutrient {i}", unit="mg") for i in range(40)]
+    db.add_all([FoodMicronutrient(food_id=food.id, micronutrient_id=micro.id, amount=i + 1.0) for i, micro in enumerate(micros)])
+    db.commit()
+    user_id, food_id = user.id, food.id
+    day = datetime(2025, 2, 1, 8, 0, tzinfo=timezone.utc)
+    count_queries.clear()
+    
+    result = queries.log_user_food_with_micronutrients(db, user_id, food_id, 1.5, timestamp=day)
+    
+    # Log row, INSERT ... SELECT of the micronutrient logs, and the daily summary updates, not a statement per nutrient
+    assert len(count_queries) == 5
+    assert result is not None
+    log_id, micronutrient_count = result
+    assert micronutrient_count == 40
+    assert [log.id for log in queries.get_user_food_logs(db, user.id)] == [log_id]
+    amounts = {log.micronutrient_id: log.amount for log in queries.get_user_micronutrient_logs(db, user.id)}
+    assert amounts == {micro.id: 1.5 * (i + 1) for i, micro in enumerate(micros)}
+    assert {log.timestamp for log in queries.get_user_micronutrient_logs(db, user.id)} == {day.replace(tzinfo=None)}
+    
+    # The daily summaries include the expanded micronutrients as well as the macros
+    assert queries.get_user_daily_summary(db, user.id, day.date()).calories == 570.0
+    totals = {row.micronutrient_id: row.amount for row in queries.get_user_daily_micronutrient_summary(db, user.id, day.date())}
+    assert totals == amounts
+    
+    # A food without micronutrients logs none
+    plain = queries.add_food(db, name="Plain Water", calories=0, protein=0, carbs=0, fat=0)
+    assert queries.log_user_food_with_micronutrients(db, user.id, plain.id, 1.0, timestamp=day)[1] == 0
+
+def test_get_user_food_logs_page(db):
+    """Test paging through a user's food logs newest first with a cursor."""
+    user = queries.add_user(db, username="pager", email="pager@example.com", password_hash="pagepass")
+    food = queries.add_food(db, name="Yoghurt", calories=59, protein=10, carbs=3.6, fat=0.4)
+    
+    # Log five entries on separate days, two of them sharing a timestamp
+    start = datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc)
+    timestamps = [start, start + timedelta(days=1), start + timedelta(days=2), start + timedelta(days=2), start + timedelta(days=3)]
+    log_ids = [queries.log_user_foods_bulk(db, user.id, [(food.id, 1.0)], timestamp=ts)[0] for ts in timestamps]
+    
+    # Page through the whole history two at a time
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = queries.get_user_food_logs_page(db, user.id, limit=2, cursor=cursor)
+        seen.extend(log.id for log in page)
+        if cursor is None:
+            break
+    
+    # Verify every log is returned once, newest first with ties broken by ID
+    assert seen == [log_ids[4], log_ids[3], log_ids[2], log_ids[1], log_ids[0]]
+    
+    # Verify the date range bounds are inclusive/exclusive
+    page, cursor = queries.get_user_food_logs_page(db, user.id, since=start + timedelta(days=1), until=start + timedelta(days=3))
+    assert [log.id for log in page] == [log_ids[3], log_ids[2], log_ids[1]]
+    assert cursor is None
+    
+    # A page must hold at least one log
+    for limit in (0, -1):
+        with pytest.raises(ValueError):
+            queries.get_user_food_logs_page(db, user.id, limit=limit)
+
+def test_get_user_food_logs_with_details_query_count(db, count_queries):
+    """Test a day's logs with all nutrients load in a fixed number of queries."""
+    user = queries.add_user(db, username="detailuser", email="detail@example.com", password_hash="detailpass")
+    micros = [queries.add_micronutrient(db, name=f"Detail Nutrient {i}", unit="mg") for i in range(3)]
+    foods = [queries.add_food(db, name=f"Detail Food {i}", calories=100, protein=1, carbs=1, fat=1) for i in range(4)]
+    db.add_all([
+        FoodMicronutrient(food_id=food.id, micronutrient_id=micro.id, amount=1.0)
+        for food in foods for micro in micros
+    ])
+    db.commit()
+    user_id = user.id
+    queries.log_user_foods_bulk(db, user_id, [(food.id, 1.0) for food in foods])
+    db.expire_all()
+    count_queries.clear()
+    
+    # Load the logs and touch every relationship a log view would render
+    logs = queries.get_user_food_logs_with_details(db, user_id)
+    rendered = [
+        (log.food.name, sorted((fm.micronutrient.name, fm.amount) for fm in log.food.micronutrients))
+        for log in logs
+    ]
+    
+    assert len(rendered) == 4
+    assert all(len(nutrients) == 3 for _, nutrients in rendered)
+    assert len(count_queries) == 3
+
 # Micronutrient Tests
 def test_add_micronutrient(db):
     """Test adding a new micronutrient to the database."""
@@ -227,6 +400,55 @@ def test_get_micronutrient_by_name(db):
     missing_micro = queries.get_micronutrient_by_name(db, "Nonexistent Vitamin")
     assert missing_micro is None
 
+def test_get_or_create_micronutrients(db, count_queries):
+    """Test resolving names to IDs adds only the missing micronutrients, in one statement when all are new."""
+    names = {f"Resolved Nutrient {i}": "mg" for i in range(5)}
+    
+    count_queries.clear()
+    ids = queries.get_or_create_micronutrients(db, names)
+    assert len(count_queries) == 1
+    assert set(ids) == set(names)
+    
+    # Existing names keep their row and unit, and cost one more select
+    count_queries.clear()
+    again = queries.get_or_create_micronutrients(db, {"Resolved Nutrient 0": "g", "Resolved Nutrient 5": "μg"})
+    assert len(count_queries) == 2
+    assert again["Resolved Nutrient 0"] == ids["Resolved Nutrient 0"]
+    assert queries.get_micronutrient_by_name(db, "Resolved Nutrient 0").unit == "mg"
+    assert queries.get_or_create_micronutrient(db, "Resolved Nutrient 5", "mg") == again["Resolved Nutrient 5"]
+    assert queries.get_or_create_micronutrients(db, {}) == {}
+
+def test_get_or_create_food(db):
+    """Test a food is only added if its name is new, keeping the existing macros otherwise."""
+    food_id = queries.get_or_create_food(db, "Resolved Rye Bread", 259, 8.5, 48, 3.3)
+    assert queries.get_food_by_name(db, "Resolved Rye Bread").id == food_id
+    assert queries.get_or_create_food(db, "Resolved Rye Bread", 1, 1, 1, 1) == food_id
+    assert queries.get_food_by_name(db, "Resolved Rye Bread").calories == 259
+    
+    ids = queries.get_or_create_foods(db, {"Resolved Rye Bread": (1, 1, 1, 1), "Resolved Bagel": (250, 10, 49, 1.5)})
+    assert ids["Resolved Rye Bread"] == food_id
+    assert queries.get_food_by_name(db, "Resolved Bagel").id == ids["Resolved Bagel"]
+
+def test_get_or_create_micronutrients_concurrently(test_engine):
+    """Test concurrent workers resolving the same new names all get the same IDs without errors."""
+    names = {f"Contended Nutrient {i}": "mg" for i in range(20)}
+    factory = sessionmaker(bind=test_engine)
+    
+    def resolve(_):
+        with factory() as session:
+            return queries.get_or_create_micronutrients(session, names)
+    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(resolve, range(8)))
+    
+    assert all(result == results[0] for result in results)
+    assert len(set(results[0].values())) == 20
+
+def test_insert_missing_by_name_orders_rows(db):
+    """Test new names are inserted in name order, so concurrent inserts lock their index entries in the same order."""
+    statement = statements.insert_missing_by_name(db, Micronutrient, [{"name": "Zinc", "unit": "mg"}, {"name": "Boron", "unit": "mg"}])
+    assert [value for key, value in statement.compile().params.items() if key.startswith("name")] == ["Boron", "Zinc"]
+
 # FoodMicronutrient Tests
 def test_add_food_micronutrient(db):
     """Test adding micronutrient data to a food."""
@@ -280,6 +502,56 @@ def test_get_food_micronutrients(db):
     assert (micro1.id, 2.7) in micro_amounts
     assert (micro2.id, 194.0) in micro_amounts
 
+def test_add_food_micronutrient_is_per_food(db):
+    """Test two foods listing the same micronutrient each get their own row."""
+    apple = queries.add_food(db, name="Bramley Apple", calories=52, protein=0.3, carbs=14, fat=0.2)
+    pear = queries.add_food(db, name="Conference Pear", calories=57, protein=0.4, carbs=15, fat=0.1)
+    fibre = queries.add_micronutrient(db, name="Pectin", unit="g")
+    
+    apple_fibre = queries.add_food_micronutrient(db, apple.id, fibre.id, 1.5)
+    pear_fibre = queries.add_food_micronutrient(db, pear.id, fibre.id, 0.9)
+    
+    assert apple_fibre.id != pear_fibre.id
+    assert (pear_fibre.food_id, pear_fibre.amount) == (pear.id, 0.9)
+    # Adding it to the same food again returns the existing row
+    assert queries.add_food_micronutrient(db, apple.id, fibre.id, 3.0).id == apple_fibre.id
+
+def test_food_micronutrient_unique_per_food(db):
+    """Test a food can't list the same micronutrient twice."""
+    food = queries.add_food(db, name="Kiwi", calories=61, protein=1.1, carbs=15, fat=0.5)
+    micro = queries.add_micronutrient(db, name="Vitamin K1", unit="μg")
+    db.add_all([
+        FoodMicronutrient(food_id=food.id, micronutrient_id=micro.id, amount=40.3),
+        FoodMicronutrient(food_id=food.id, micronutrient_id=micro.id, amount=40.3),
+    ])
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+def test_set_food_micronutrients(db, count_queries):
+    """Test a food's nutrient profile is written and updated in one upsert statement."""
+    food = queries.add_food(db, name="Almonds", calories=579, protein=21, carbs=22, fat=50)
+    micros = [queries.add_micronutrient(db, name=f"Almond Nutrient {i}", unit="mg") for i in range(50)]
+    food_id, micro_ids = food.id, [micro.id for micro in micros]
+    version = queries.get_food_version(db, food_id)
+    count_queries.clear()
+    
+    written = queries.set_food_micronutrients(db, food_id, [(micro_id, 1.0) for micro_id in micro_ids])
+    
+    # The upsert and the food version bump
+    assert len(count_queries) == 2
+    assert written is not None
+    assert len(written) == 50
+    
+    # Updating some amounts and adding none leaves the rest alone, with the last amount winning for repeats
+    updated = queries.set_food_micronutrients(db, food_id, [(micro_ids[0], 2.0), (micro_ids[1], 3.0), (micro_ids[1], 4.0)])
+    assert sorted((fm.micronutrient_id, fm.amount) for fm in updated) == [(micro_ids[0], 2.0), (micro_ids[1], 4.0)]
+    amounts = {fm.micronutrient_id: fm.amount for fm in queries.get_food_micronutrients(db, food_id)}
+    assert len(amounts) == 50
+    assert (amounts[micro_ids[0]], amounts[micro_ids[1]], amounts[micro_ids[2]]) == (2.0, 4.0, 1.0)
+    assert queries.get_food_version(db, food_id) == version + 2
+    assert queries.set_food_micronutrients(db, food_id, []) == []
+
 # UserMicroLog Tests
 def test_log_user_micronutrient_consumption(db):
     """Test logging a user's micronutrient consumption."""
@@ -334,6 +606,63 @@ def test_get_user_micronutrient_logs(db):
     assert (micro1.id, 2.4) in log_micros
     assert (micro2.id, 320.0) in log_micros
 
+def test_log_user_micronutrients_bulk(db, monkeypatch):
+    """Test logging many micronutrient amounts in one transaction."""
+    user = queries.add_user(db, username="bulkmicro", email="bulkmicro@example.com", password_hash="bulkpass")
+    micro1 = queries.add_micronutrient(db, name="Potassium", unit="mg")
+    micro2 = queries.add_micronutrient(db, name="Calcium", unit="mg")
+    
+    # Count commits issued by the bulk writer
+    commits = []
+    original_commit = db.commit
+    def counting_commit():
+        commits.append(1)
+        original_commit()
+    monkeypatch.setattr(db, "commit", counting_commit)
+    
+    log_ids = queries.log_user_micronutrients_bulk(db, user.id, [(micro1.id, 400.0), (micro2.id, 120.0)])
+    
+    assert log_ids is not None
+    assert len(log_ids) == 2
+    assert len(commits) == 1
+    log_micros = [(log.micronutrient_id, log.amount) for log in queries.get_user_micronutrient_logs(db, user.id)]
+    assert (micro1.id, 400.0) in log_micros
+    assert (micro2.id, 120.0) in log_micros
+
+def test_get_user_micronutrient_logs_page(db):
+    """Test retrieving a limited page of micronutrient logs within a date range."""
+    user = queries.add_user(db, username="micropager", email="micropager@example.com", password_hash="pagepass")
+    micro = queries.add_micronutrient(db, name="Selenium", unit="μg")
+    
+    start = datetime(2025, 2, 1, tzinfo=timezone.utc)
+    for day in range(4):
+        queries.log_user_micronutrients_bulk(db, user.id, [(micro.id, float(day))], timestamp=start + timedelta(days=day))
+    
+    # First page holds the newest log in range and points at the next one
+    page, cursor = queries.get_user_micronutrient_logs_page(db, user.id, since=start + timedelta(days=1), limit=1)
+    assert [log.amount for log in page] == [3.0]
+    assert cursor is not None
+    
+    page, cursor = queries.get_user_micronutrient_logs_page(db, user.id, since=start + timedelta(days=1), limit=5, cursor=cursor)
+    assert [log.amount for log in page] == [2.0, 1.0]
+    assert cursor is None
+
+def test_get_food_with_details(db, count_queries):
+    """Test a food loads with its micronutrients and sources without lazy loads."""
+    food = queries.add_food(db, name="Detailed Kale", calories=49, protein=4.3, carbs=8.8, fat=0.9)
+    micro = queries.add_micronutrient(db, name="Vitamin A", unit="μg")
+    queries.add_food_micronutrient(db, food.id, micro.id, 500.0)
+    queries.add_food_source(db, food.id, "USDA", "11233")
+    food_id = food.id
+    db.expire_all()
+    count_queries.clear()
+    
+    detailed = queries.get_food_with_details(db, food_id)
+    
+    assert [(fm.micronutrient.name, fm.amount) for fm in detailed.micronutrients] == [("Vitamin A", 500.0)]
+    assert [source.external_id for source in detailed.sources] == ["11233"]
+    assert len(count_queries) == 3
+
 # FoodSource Tests
 def test_add_food_source(db):
     """Test adding source information to a food item."""
@@ -384,6 +713,48 @@ def test_get_food_sources(db):
     assert ("USDA", "13000") in source_info
     assert ("Custom", "STEAK-01") in source_info
 
+def test_add_duplicate_food_source(db):
+    """Test the same external ID cannot be linked twice for a source."""
+    food = queries.add_food(db, name="Lamb Chop", calories=294, protein=25, carbs=0, fat=21)
+    other_food = queries.add_food(db, name="Mutton", calories=294, protein=25, carbs=0, fat=21)
+    queries.add_food_source(db, food.id, "USDA", "17000")
+    
+    # Try to link another food to the same external entry
+    duplicate_source = queries.add_food_source(db, other_food.id, "USDA", "17000")
+    
+    assert duplicate_source is None
+
+def test_food_version_changes_with_details(db):
+    """Test a food's version is bumped when its micronutrients or sources change."""
+    food = queries.add_food(db, name="Pork Loin", calories=242, protein=27, carbs=0, fat=14)
+    assert queries.get_food_version(db, food.id) == 1
+    
+    niacin = queries.add_micronutrient(db, "Niacin", "mg")
+    queries.add_food_micronutrient(db, food.id, niacin.id, 8.6)
+    assert queries.get_food_version(db, food.id) == 2
+    
+    queries.add_food_source(db, food.id, "USDA", "10093")
+    assert queries.get_food_version(db, food.id) == 3
+    
+    assert queries.get_food_version(db, 999999) is None
+
+# Schema Tests
+def test_log_and_lookup_indexes(test_engine):
+    """Test the time-range and foreign key indexes are created."""
+    inspector = inspect(test_engine)
+    
+    def indexed_columns(table):
+        return {tuple(index["column_names"]): index["unique"] for index in inspector.get_indexes(table)}
+    
+    assert ("user_id", "timestamp") in indexed_columns("user_macro_log")
+    assert ("user_id", "timestamp") in indexed_columns("user_micro_log")
+    # Lookups by food_id use the leading column of the unique index
+    assert indexed_columns("food_micronutrients")[("food_id", "micronutrient_id")]
+    assert ("food_id",) not in indexed_columns("food_micronutrients")
+    assert ("micronutrient_id",) in indexed_columns("food_micronutrients")
+    assert ("food_id",) in indexed_columns("food_sources")
+    assert indexed_columns("food_sources")[("source_name", "external_id")]
+
 # Error Handling Tests
 def test_error_handling_get_user_by_username(db, monkeypatch):
     """Test error handling in get_user_by_username function."""
@@ -391,8 +762,8 @@ def test_error_handling_get_user_by_username(db, monkeypatch):
     def mock_query_exception(*args, **kwargs):
         raise SQLAlchemyError("Database error")
     
-    # Patch the query method
-    monkeypatch.setattr(db, "query", mock_query_exception)
+    # Patch the scalars method
+    monkeypatch.setattr(db, "scalars", mock_query_exception)
     
     # Call the function
     result = queries.get_user_by_username(db, "anyuser")
@@ -0,0 +1,149 @@
+import os
+import sys
+import asyncio
+import subprocess
+
+import pytest
+from sqlalchemy import text, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database import queries, async_queries
+from database.db import EngineSettings, RoutingSession, engine_options, create_database_engine, init_db
+from database.schema import User, Food
+
+def test_engine_settings_from_environ():
+    """Test pool and pragma settings are read from the environment."""
+    settings = EngineSettings.from_environ({
+        "DATABASE_POOL_SIZE": "20",
+        "DATABASE_MAX_OVERFLOW": "5",
+        "DATABASE_POOL_PRE_PING": "false",
+        "SQLITE_BUSY_TIMEOUT_MS": "250",
+    })
+    assert settings.pool_size == 20
+    assert settings.max_overflow == 5
+    assert settings.pool_pre_ping is False
+    assert settings.sqlite_busy_timeout_ms == 250
+    assert settings.sqlite_journal_mode == EngineSettings().sqlite_journal_mode
+
+def test_engine_options():
+    """Test pool options are only passed for PostgreSQL."""
+    settings = EngineSettings(pool_size=7, pool_recycle=60)
+    options = engine_options("postgresql://user:pw@host/db", settings)
+    assert options["pool_size"] == 7
+    assert options["pool_recycle"] == 60
+    assert options["pool_pre_ping"] is True
+    assert engine_options("sqlite:///nutrition_tracker.db", settings) == {"connect_args": {"check_same_thread": False}}
+    assert engine_options("sqlite+aiosqlite:///nutrition_tracker.db", settings) == {}
+
+def test_sqlite_pragmas(tmp_path):
+    """Test every new SQLite connection gets the configured pragmas."""
+    settings = EngineSettings(sqlite_busy_timeout_ms=1234, sqlite_cache_size_kib=2048, sqlite_mmap_size=1048576)
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'pragmas.db'}", settings)
+    try:
+        with engine.connect() as connection:
+            def pragma(name):
+                return connection.execute(text(f"PRAGMA {name}")).scalar()
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == 1234
+            assert pragma("cache_size") == -2048
+            assert pragma("mmap_size") == 1048576
+    finally:
+        engine.dispose()
+
+def test_import_does_not_touch_database(tmp_path):
+    """Test importing the module creates no engine, connection or tables."""
+    database_path = tmp_path / "lazy.db"
+    environ = {**os.environ, "DATABASE_URL": f"sqlite:///{database_path}", "PYTHONPATH": os.getcwd()}
+    subprocess.run(
+        [sys.executable, "-c", "import database.db as db; assert db.get_engine.cache_info().currsize == 0"],
+        env=environ, check=True,
+    )
+    assert not database_path.exists()
+
+def test_init_db(tmp_path):
+    """Test init_db creates the schema's tables."""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'init.db'}", EngineSettings())
+    try:
+        init_db(engine)
+        assert {"users", "foods", "user_macro_log", "user_daily_summary"} <= set(inspect(engine).get_table_names())
+    finally:
+        engine.dispose()
+
+def test_init_db_upgrades_existing_tables(tmp_path):
+    """Test init_db adds the columns and indexes a database created by an older schema lacks."""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'old.db'}", EngineSettings())
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE foods (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE, calories FLOAT NOT NULL, "
+                "protein FLOAT NOT NULL, carbs FLOAT NOT NULL, fat FLOAT NOT NULL)"
+            ))
+            connection.execute(text("INSERT INTO foods (name, calories, protein, carbs, fat) VALUES ('Old Oats', 380, 13, 67, 7)"))
+            connection.execute(text("CREATE TABLE user_macro_log (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, food_id INTEGER NOT NULL, quantity FLOAT NOT NULL, timestamp DATETIME)"))
+            connection.execute(text("CREATE TABLE food_micronutrients (id INTEGER PRIMARY KEY, food_id INTEGER NOT NULL, micronutrient_id INTEGER NOT NULL, amount FLOAT NOT NULL)"))
+            connection.execute(text("CREATE INDEX ix_food_micronutrients_food_id ON food_micronutrients (food_id)"))
+        
+        init_db(engine)
+        init_db(engine)
+        
+        assert "version" in {column["name"] for column in inspect(engine).get_columns("foods")}
+        assert "ix_user_macro_log_user_id_timestamp" in {index["name"] for index in inspect(engine).get_indexes("user_macro_log")}
+        assert {index["name"] for index in inspect(engine).get_indexes("food_micronutrients")} == {
+            "ix_food_micronutrients_food_id_micronutrient_id", "ix_food_micronutrients_micronutrient_id",
+        }
+        with Session(engine) as db:
+            assert db.scalars(select(Food.version).where(Food.name == "Old Oats")).one() == 1
+    finally:
+        engine.dispose()
+
+@pytest.fixture
+def primary_and_replica(tmp_path):
+    # Two separate databases, so it's visible which one each query went to
+    engines = [create_database_engine(f"sqlite:///{tmp_path / name}", EngineSettings()) for name in ("primary.db", "replica.db")]
+    for engine in engines:
+        init_db(engine)
+    yield engines
+    for engine in engines:
+        engine.dispose()
+
+def test_routing_session_reads_from_replica(primary_and_replica):
+    """Test getters go to the replica and writers to the primary."""
+    primary, replica = primary_and_replica
+    with RoutingSession(writer=replica, reader=replica) as db:
+        queries.add_user(db, "replica_user", "replica@example.com", "hash")
+
+    with RoutingSession(writer=primary, reader=replica) as db:
+        assert [user.username for user in queries.get_all_users(db)] == ["replica_user"]
+        assert queries.add_user(db, "primary_user", "primary@example.com", "hash") is not None
+    with Session(primary) as db:
+        assert [user.username for user in db.scalars(select(User))] == ["primary_user"]
+
+def test_routing_session_read_your_writes(primary_and_replica):
+    """Test a session reads from the primary after writing, unless read_your_writes is off."""
+    primary, replica = primary_and_replica
+    with RoutingSession(writer=primary, reader=replica) as db:
+        queries.add_user(db, "new_user", "new@example.com", "hash")
+        assert queries.get_user_by_username(db, "new_user") is not None
+
+    with RoutingSession(writer=primary, reader=replica, read_your_writes=False) as db:
+        queries.add_user(db, "lagging_user", "lagging@example.com", "hash")
+        assert queries.get_user_by_username(db, "lagging_user") is None
+
+def test_async_routing_session(primary_and_replica, tmp_path):
+    """Test routing options are passed through to the session behind an AsyncSession."""
+    async def main():
+        primary, replica = (
+            create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}") for name in ("primary.db", "replica.db")
+        )
+        try:
+            factory = async_sessionmaker(sync_session_class=RoutingSession, writer=primary.sync_engine, reader=replica.sync_engine)
+            async with factory() as db:
+                await async_queries.add_user(db, "async_primary_user", "async_primary@example.com", "hash")
+            async with factory() as db:
+                return await async_queries.get_user_by_username(db, "async_primary_user")
+        finally:
+            await primary.dispose()
+            await replica.dispose()
+    assert asyncio.run(main()) is None
@@ -0,0 +1,176 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import queries
+from database.importer import (
+    FoodRecord, SOURCE_USDA, SOURCE_OPEN_FOOD_FACTS, parse_open_food_facts, parse_usda_csv, parse_usda_api_food, import_records, load_micronutrients, write_batch,
+)
+from database.ingest import DUMP_USDA, DUMP_OPEN_FOOD_FACTS, parse_parallel, ingest
+from database.schema import Food, FoodSource
+from database.summaries import rebuild_daily_summaries
+
+OPEN_FOOD_FACTS_PRODUCTS = [
+    {
+        "code": "5000112637922",
+        "product_name": "Import Cola",
+        "brands": "Fizzco",
+        "nutriments": {"energy-kcal_100g": 42, "proteins_100g": 0, "carbohydrates_100g": 10.6, "fat_100g": 0, "sugars_100g": 10.6, "sodium_100g": 0.004},
+    },
+    {
+        "code": "3017620422003",
+        "product_name": "Import Hazelnut Spread",
+        "nutriments": {"energy-kcal_100g": 539, "proteins_100g": 6.3, "carbohydrates_100g": 57.5, "fat_100g": 30.9, "vitamin-e_100g": 0.0046, "nova-group_100g": 4},
+    },
+    # Skipped: no name, and missing macros
+    {"code": "1", "nutriments": {"energy-kcal_100g": 1, "proteins_100g": 1, "carbohydrates_100g": 1, "fat_100g": 1}},
+    {"code": "2", "product_name": "Import Mystery", "nutriments": {"energy-kcal_100g": 1}},
+]
+
+@pytest.fixture
+def open_food_facts_dump(tmp_path):
+    path = tmp_path / "products.jsonl"
+    path.write_text("\n".join(json.dumps(product) for product in OPEN_FOOD_FACTS_PRODUCTS) + "\n")
+    return str(path)
+
+@pytest.fixture
+def usda_dump(tmp_path):
+    (tmp_path / "nutrient.csv").write_text(
+        "id,name,unit_name\n1003,Protein,G\n1004,Total lipid (fat),G\n1005,Carbohydrate,G\n1008,Energy,KCAL\n1087,Import Calcium,MG\n1114,Import Vitamin D,UG\n"
+    )
+    (tmp_path / "food.csv").write_text(
+        "fdc_id,data_type,description\n100,sr_legacy_food,Import Cheddar\n101,sr_legacy_food,Import Water\n102,sr_legacy_food,Import Sardines\n"
+    )
+    (tmp_path / "food_nutrient.csv").write_text(
+        "id,fdc_id,nutrient_id,amount\n"
+        "1,99,1008,1\n"
+        "2,100,1008,403\n3,100,1003,24.9\n4,100,1004,33.1\n5,100,1005,1.3\n6,100,1087,721\n"
+        "7,101,1087,3\n"
+        "8,102,1008,208\n9,102,1003,24.6\n10,102,1004,11.5\n11,102,1005,0\n12,102,1114,4.8\n"
+    )
+    return str(tmp_path)
+
+def test_parse_open_food_facts(open_food_facts_dump):
+    """Test products are normalised and unusable ones skipped."""
+    records = list(parse_open_food_facts(open_food_facts_dump))
+    
+    assert [record.name for record in records] == ["Import Cola (Fizzco)", "Import Hazelnut Spread"]
+    assert records[0].carbs == 10.6
+    assert records[0].micronutrients == {"Sodium": (0.004, "g")}
+    assert records[1].micronutrients == {"Vitamin E": (0.0046, "g")}
+
+def test_parse_usda_api_food():
+    """Test foods from the FoodData Central search API are normalised like the CSV download."""
+    record = parse_usda_api_food({
+        "fdcId": 2345,
+        "description": "Import Oat Milk",
+        "brandOwner": "Oatco",
+        "foodNutrients": [
+            {"nutrientId": 1008, "nutrientName": "Energy", "unitName": "KCAL", "value": 46},
+            {"nutrientId": 1003, "nutrientName": "Protein", "unitName": "G", "value": 1},
+            {"nutrientId": 1004, "nutrientName": "Total lipid (fat)", "unitName": "G", "value": 1.5},
+            {"nutrientId": 1005, "nutrientName": "Carbohydrate, by difference", "unitName": "G", "value": 6.7},
+            {"nutrientId": 1087, "nutrientName": "Calcium, Ca", "unitName": "MG", "value": 120},
+        ],
+    })
+    
+    assert record.external_id == "2345"
+    assert record.name == "Import Oat Milk (Oatco)"
+    assert (record.calories, record.protein, record.carbs, record.fat) == (46, 1, 6.7, 1.5)
+    assert record.micronutrients == {"Calcium, Ca": (120, "mg")}
+    assert parse_usda_api_food({"fdcId": 1, "description": "Import Mystery", "foodNutrients": []}) is None
+
+def test_parse_usda_csv(usda_dump):
+    """Test foods are merge-joined with their nutrients."""
+    records = list(parse_usda_csv(usda_dump))
+    
+    assert [(record.external_id, record.name, record.calories) for record in records] == [("100", "Import Cheddar", 403.0), ("102", "Import Sardines", 208.0)]
+    assert records[0].micronutrients == {"Import Calcium": (721.0, "mg")}
+    assert records[1].micronutrients == {"Import Vitamin D": (4.8, "μg")}
+
+def test_import_records_is_idempotent(db, usda_dump):
+    """Test importing writes all four tables and a rerun doesn't duplicate anything."""
+    stats = import_records(db, parse_usda_csv(usda_dump), batch_size=1, progress=None)
+    assert stats.records == 2
+    import_records(db, parse_usda_csv(usda_dump), progress=None)
+    
+    cheddar = queries.get_food_by_name(db, "Import Cheddar")
+    assert cheddar.fat == 33.1
+    assert [(fm.micronutrient.name, fm.amount) for fm in queries.get_food_micronutrients(db, cheddar.id)] == [("Import Calcium", 721.0)]
+    assert db.query(FoodSource).filter(FoodSource.source_name == SOURCE_USDA, FoodSource.external_id.in_(["100", "102"])).count() == 2
+    assert db.query(Food).filter(Food.name.like("Import %")).count() == 2
+
+def test_reimport_keeps_summaries_consistent(db):
+    """Test re-importing a logged food with different macros doesn't change it, so deleting a log subtracts what was added."""
+    user = queries.add_user(db, username="reimporter", email="reimporter@example.com", password_hash="pass")
+    record = FoodRecord(SOURCE_USDA, "900", "Import Granola", 200, 5, 30, 8)
+    food_id = write_batch(db, [record], load_micronutrients(db))["Import Granola"]
+    day = datetime(2025, 6, 1, 9, 0, tzinfo=timezone.utc)
+    log_ids = queries.log_user_foods_bulk(db, user.id, [(food_id, 1.0), (food_id, 1.0)], timestamp=day)
+    
+    # A later dump has new macros and another source for the same name
+    write_batch(db, [FoodRecord(SOURCE_OPEN_FOOD_FACTS, "900-b", "Import Granola", 450, 9, 60, 20)], load_micronutrients(db))
+    granola = queries.get_food_by_name(db, "Import Granola")
+    assert granola.calories == 200
+    assert granola.version == 2
+    assert len(queries.get_food_sources(db, food_id)) == 2
+    
+    assert queries.delete_user_food_log(db, log_ids[0]) is True
+    assert queries.get_user_daily_summary(db, user.id, day.date()).calories == 200.0
+    rebuild_daily_summaries(db, user.id)
+    db.expire_all()
+    assert queries.get_user_daily_summary(db, user.id, day.date()).calories == 200.0
+
+def test_write_batch_converts_to_existing_units(db):
+    """Test Open Food Facts amounts in grams are stored in the unit of an existing micronutrient, and unconvertible ones are skipped."""
+    sodium_id = queries.get_or_create_micronutrient(db, "Import Sodium", "mg")
+    vitamin_a_id = queries.get_or_create_micronutrient(db, "Import Vitamin A", "IU")
+    record = FoodRecord(SOURCE_OPEN_FOOD_FACTS, "901", "Import Crackers", 420, 9, 70, 11, {"Import Sodium": (0.6, "g"), "Import Vitamin A": (0.0001, "g")})
+    food_id = write_batch(db, [record], load_micronutrients(db))["Import Crackers"]
+    
+    amounts = {fm.micronutrient_id: fm.amount for fm in queries.get_food_micronutrients(db, food_id)}
+    assert amounts == {sodium_id: pytest.approx(600.0)}
+    assert vitamin_a_id not in amounts
+
+def test_import_records_resumes_from_checkpoint(db, open_food_facts_dump, tmp_path):
+    """Test an interrupted import continues after the last committed batch."""
+    checkpoint = str(tmp_path / "import.checkpoint")
+    records = parse_open_food_facts(open_food_facts_dump)
+    
+    # Simulate an interruption after the first batch
+    first = import_records(db, [next(records)], batch_size=1, checkpoint=checkpoint, progress=None)
+    assert first.records == 1
+    
+    resumed = import_records(db, parse_open_food_facts(open_food_facts_dump), batch_size=1, checkpoint=checkpoint, progress=None)
+    assert resumed.records == 1
+    assert queries.get_food_by_name(db, "Import Hazelnut Spread") is not None
+
+def test_parse_parallel_keeps_input_order(usda_dump, open_food_facts_dump):
+    """Test worker processes return the same records as the serial parsers, chunk by chunk in input order."""
+    chunks = list(parse_parallel(DUMP_OPEN_FOOD_FACTS, open_food_facts_dump, workers=2, chunk_size=1))
+    assert len(chunks) == 4
+    assert [record for chunk in chunks for record in chunk] == list(parse_open_food_facts(open_food_facts_dump))
+    assert [record for chunk in parse_parallel(DUMP_USDA, usda_dump, workers=2, chunk_size=2) for record in chunk] == list(parse_usda_csv(usda_dump))
+
+def test_ingest(db, test_engine, usda_dump):
+    """Test the parallel pipeline writes the same rows as import_records."""
+    stats = ingest(sessionmaker(bind=test_engine), DUMP_USDA, usda_dump, workers=2, batch_size=1, progress=None)
+    
+    assert stats.records == 2
+    sardines = queries.get_food_by_name(db, "Import Sardines")
+    assert [(fm.micronutrient.name, fm.amount) for fm in queries.get_food_micronutrients(db, sardines.id)] == [("Import Vitamin D", 4.8)]
+    assert [source.external_id for source in queries.get_food_sources(db, sardines.id)] == ["102"]
+
+def test_ingest_raises_writer_errors(tmp_path, usda_dump):
+    """Test a failing writer stops the pipeline and its error reaches the caller."""
+    # A database without the tables
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    try:
+        with pytest.raises(OperationalError):
+            ingest(sessionmaker(bind=engine), DUMP_USDA, usda_dump, workers=1, batch_size=1, progress=None)
+    finally:
+        engine.dispose()
@@ -0,0 +1,44 @@
+import logging
+
+import pytest
+from sqlalchemy import event
+
+from database import instrumentation, queries
+from database.instrumentation import track_queries, instrument_engine
+
+@pytest.fixture(autouse=True)
+def instrumented(test_engine):
+    # The test engine is built directly rather than through create_database_engine, so isn't instrumented
+    instrument_engine(test_engine)
+    yield
+    event.remove(test_engine, "before_cursor_execute", instrumentation._before_cursor_execute)
+    event.remove(test_engine, "after_cursor_execute", instrumentation._after_cursor_execute)
+
+def test_track_queries_counts_statements(db):
+    """Test statements run inside track_queries are counted and timed."""
+    with track_queries() as stats:
+        queries.add_food(db, "Tracked Pear", 57, 0.4, 15, 0.1)
+        queries.get_food_by_name(db, "Tracked Pear")
+    assert stats.count >= 2
+    assert stats.seconds > 0
+
+    queries.get_food_by_name(db, "Tracked Pear")
+    assert stats.count >= 2
+
+def test_track_queries_nests(db):
+    """Test an inner track_queries doesn't count towards the outer one."""
+    with track_queries() as outer:
+        with track_queries() as inner:
+            queries.get_food_by_name(db, "No such food")
+        assert inner.count == 1
+        assert outer.count == 0
+
+def test_slow_query_log(db, monkeypatch, caplog):
+    """Test statements over the threshold are logged with their duration."""
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_THRESHOLD_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="database.slow_query"), track_queries() as stats:
+        queries.get_food_by_name(db, "No such food")
+    record = next(record for record in caplog.records if record.name == "database.slow_query")
+    assert "FROM foods" in record.statement
+    assert record.duration_ms >= 0
+    assert stats.slow == 1
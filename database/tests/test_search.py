@@ -0,0 +1,101 @@
+from sqlalchemy import insert
+
+from database import queries
+from database.schema import Food, FoodSource
+from database.search import FoodSearchIndex, FOOD_SEARCH_INDEX, search_foods
+
+def build_index():
+    index = FoodSearchIndex()
+    index.add(1, "Chicken Breast, Raw")
+    index.add(2, "Chicken Thigh, Roasted")
+    index.add(3, "Chickpeas, Canned")
+    index.add(4, "Peanut Butter, Smooth", aliases=["0737628064502"])
+    return index
+
+def test_search_exact_and_prefix():
+    """Test exact token matches rank above prefix completions."""
+    index = build_index()
+    
+    assert [result.food_id for result in index.search("chicken")] == [1, 2]
+    assert [result.food_id for result in index.search("chick")] == [1, 2, 3]
+    assert [result.food_id for result in index.search("chicken ro")] == [2]
+
+def test_search_typo_tolerant():
+    """Test misspelt terms still find the intended food."""
+    index = build_index()
+    
+    assert index.search("chiken brest")[0].food_id == 1
+    assert index.search("peanutt")[0].food_id == 4
+    assert index.search("xyzzy") == []
+
+def test_search_aliases():
+    """Test foods can be found by an external ID such as a barcode."""
+    index = build_index()
+    
+    assert [result.food_id for result in index.search("0737628064502")] == [4]
+
+def test_search_common_token_prefers_closest_names():
+    """Test a token shared by more foods than the candidate limit still finds the closest names."""
+    index = FoodSearchIndex()
+    for food_id in range(5_000):
+        index.add(food_id, f"Milk Chocolate Bar Variety {food_id}")
+    index.add(5_000, "Milk")
+    index.add(5_001, "Milk, Semi Skimmed")
+    
+    assert [result.name for result in index.search("milk", limit=2)] == ["Milk", "Milk, Semi Skimmed"]
+    assert index.search("milk skimmed")[0].food_id == 5_001
+
+def test_search_common_terms_together():
+    """Test a query whose terms are all common still finds the foods matching every term."""
+    index = FoodSearchIndex()
+    for food_id in range(2_000):
+        index.add(food_id, f"Apple {food_id}")
+        index.add(2_000 + food_id, f"Pie {food_id}")
+    index.add(4_000, "Apple Pie With Cinnamon Crumble")
+    
+    assert [result.food_id for result in index.search("apple pie")] == [4_000]
+
+def test_search_load_ranks_postings(db):
+    """Test an index loaded in bulk ranks a common token's foods shortest name first."""
+    db.execute(insert(Food), [
+        {"name": f"Zorblax Variety {i}", "calories": 1, "protein": 0, "carbs": 0, "fat": 0} for i in range(1_100)
+    ])
+    db.add(Food(name="Zorblax", calories=1, protein=0, carbs=0, fat=0))
+    db.commit()
+    
+    index = FoodSearchIndex()
+    index.load(db)
+    assert [result.name for result in index.search("zorblax", limit=2)] == ["Zorblax", "Zorblax Variety 0"]
+    
+    # Foods added one at a time afterwards are inserted in rank order
+    index.add(10**9, "Zorblax 1")
+    assert [result.name for result in index.search("zorblax", limit=2)] == ["Zorblax", "Zorblax 1"]
+
+def test_search_reload_adds_new_rows(db):
+    """Test reloading an index picks up foods and sources written elsewhere, without duplicating loaded ones."""
+    index = FoodSearchIndex()
+    index.load(db)
+    
+    # Written without going through queries, as another process would
+    food = Food(name="Reload Farro", calories=340, protein=15, carbs=72, fat=2.5)
+    db.add(food)
+    db.flush()
+    db.add(FoodSource(food_id=food.id, source_name="OpenFoodFacts", external_id="RF-42"))
+    db.commit()
+    assert index.search("reload farro") == []
+    
+    index.load(db)
+    assert [result.food_id for result in index.search("reload farro")] == [food.id]
+    assert [result.food_id for result in index.search("rf 42")] == [food.id]
+
+def test_search_foods_updates_incrementally(db):
+    """Test foods added after the index is loaded are searchable straight away."""
+    queries.add_food(db, name="Search Quinoa", calories=120, protein=4.4, carbs=21, fat=1.9)
+    assert [result.name for result in search_foods(db, "search quin")] == ["Search Quinoa"]
+    assert FOOD_SEARCH_INDEX.loaded
+    
+    food = queries.add_food(db, name="Search Quince", calories=57, protein=0.4, carbs=15, fat=0.1)
+    queries.add_food_source(db, food.id, "OpenFoodFacts", "SQ-1234")
+    
+    assert [result.name for result in search_foods(db, "search quin")] == ["Search Quince", "Search Quinoa"]
+    assert [result.name for result in search_foods(db, "sq 1234")] == ["Search Quince"]
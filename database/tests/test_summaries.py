@@ -0,0 +1,82 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from database import queries
+from database.summaries import rebuild_daily_summaries
+
+def test_daily_summary_maintained_on_write(db):
+    """Test logging and deleting food updates the daily macro summary."""
+    user = queries.add_user(db, username="summaryuser", email="summary@example.com", password_hash="pass")
+    porridge = queries.add_food(db, name="Porridge", calories=150, protein=5, carbs=27, fat=3)
+    banana = queries.add_food(db, name="Summary Banana", calories=105, protein=1.3, carbs=27, fat=0.4)
+    day = datetime(2025, 4, 1, 7, 30, tzinfo=timezone.utc)
+    
+    log_ids = queries.log_user_foods_bulk(db, user.id, [(porridge.id, 1.0), (banana.id, 2.0)], timestamp=day)
+    summary = queries.get_user_daily_summary(db, user.id, date(2025, 4, 1))
+    assert summary is not None
+    assert (summary.calories, summary.carbs) == (360.0, 81.0)
+    assert summary.protein == pytest.approx(7.6)
+    
+    # Deleting a log takes it back out of the total
+    assert queries.delete_user_food_log(db, log_ids[1]) is True
+    db.refresh(summary)
+    assert summary.calories == 150.0
+    assert queries.delete_user_food_log(db, log_ids[1]) is False
+
+def test_daily_micronutrient_summary_maintained_on_write(db):
+    """Test logging and deleting micronutrients updates the per-micronutrient summary."""
+    user = queries.add_user(db, username="microsummary", email="microsummary@example.com", password_hash="pass")
+    iodine = queries.add_micronutrient(db, name="Iodine", unit="μg")
+    copper = queries.add_micronutrient(db, name="Copper", unit="mg")
+    day = datetime(2025, 4, 2, 12, 0, tzinfo=timezone.utc)
+    
+    log_ids = queries.log_user_micronutrients_bulk(db, user.id, [(iodine.id, 50.0), (copper.id, 0.4), (iodine.id, 25.0)], timestamp=day)
+    queries.delete_user_micronutrient_log(db, log_ids[1])
+    
+    totals = {row.micronutrient_id: row.amount for row in queries.get_user_daily_micronutrient_summary(db, user.id, date(2025, 4, 2))}
+    assert totals == {iodine.id: 75.0, copper.id: 0.0}
+
+def test_rebuild_daily_summaries(db):
+    """Test rebuilding from raw logs reproduces the incrementally maintained summaries."""
+    user = queries.add_user(db, username="rebuilduser", email="rebuild@example.com", password_hash="pass")
+    food = queries.add_food(db, name="Rebuild Soup", calories=90, protein=4, carbs=12, fat=2)
+    micro = queries.add_micronutrient(db, name="Vitamin K", unit="μg")
+    for day in (3, 3, 4):
+        timestamp = datetime(2025, 4, day, 18, 0, tzinfo=timezone.utc)
+        queries.log_user_foods_bulk(db, user.id, [(food.id, 1.5)], timestamp=timestamp)
+        queries.log_user_micronutrients_bulk(db, user.id, [(micro.id, 10.0)], timestamp=timestamp)
+    
+    def snapshot():
+        db.expire_all()
+        return [
+            (queries.get_user_daily_summary(db, user.id, date(2025, 4, day)).calories,
+             [row.amount for row in queries.get_user_daily_micronutrient_summary(db, user.id, date(2025, 4, day))])
+            for day in (3, 4)
+        ]
+    
+    incremental = snapshot()
+    assert incremental == [(270.0, [20.0]), (135.0, [10.0])]
+    assert rebuild_daily_summaries(db, user.id) == 2
+    assert snapshot() == incremental
+
+def test_delete_food_log_with_micronutrients(db):
+    """Test deleting a food logged with its micronutrients removes them too, matching a rebuild."""
+    user = queries.add_user(db, username="derivedsummary", email="derivedsummary@example.com", password_hash="pass")
+    kale = queries.add_food(db, name="Summary Kale", calories=49, protein=4.3, carbs=9, fat=0.9)
+    calcium = queries.add_micronutrient(db, name="Summary Calcium", unit="mg")
+    queries.add_food_micronutrient(db, kale.id, calcium.id, 150.0)
+    day = datetime(2025, 4, 5, 12, 0, tzinfo=timezone.utc)
+    
+    log_id, _ = queries.log_user_food_with_micronutrients(db, user.id, kale.id, 2.0, timestamp=day)
+    queries.log_user_micronutrients_bulk(db, user.id, [(calcium.id, 10.0)], timestamp=day)
+    assert queries.delete_user_food_log(db, log_id) is True
+    
+    def totals():
+        db.expire_all()
+        return {row.micronutrient_id: row.amount for row in queries.get_user_daily_micronutrient_summary(db, user.id, date(2025, 4, 5))}
+    
+    assert [log.amount for log in queries.get_user_micronutrient_logs(db, user.id)] == [10.0]
+    assert totals() == {calcium.id: 10.0}
+    rebuild_daily_summaries(db, user.id)
+    assert totals() == {calcium.id: 10.0}
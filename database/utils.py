@@ -0,0 +1,92 @@
+import base64
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Amounts of each unit in micrograms, for comparing amounts given in different units
+UNIT_MICROGRAMS = {"g": 1_000_000.0, "mg": 1_000.0, "μg": 1.0}
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Normalise a datetime to naive UTC, the form timestamps are stored in.
+
+    Naive datetimes are assumed to already be in UTC.
+
+    Args:
+        value (datetime, optional): Datetime to normalise
+
+    Returns:
+        Naive UTC datetime, or None if no value was given
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def convert_amount(amount: float, unit: str, to_unit: str) -> Optional[float]:
+    """
+    Convert an amount of a nutrient from one unit of mass to another.
+
+    Args:
+        amount (float): Amount in the original unit
+        unit (str): Original unit
+        to_unit (str): Unit to convert to
+
+    Returns:
+        Amount in the new unit, or None if either unit isn't a known unit of mass
+    """
+    if unit == to_unit:
+        return amount
+    if unit not in UNIT_MICROGRAMS or to_unit not in UNIT_MICROGRAMS:
+        return None
+    return amount * UNIT_MICROGRAMS[unit] / UNIT_MICROGRAMS[to_unit]
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """
+    Encode the (timestamp, id) position of a row as an opaque page cursor.
+
+    Args:
+        timestamp (datetime): Timestamp of the last row on the page
+        row_id (int): ID of the last row on the page
+
+    Returns:
+        URL-safe cursor token
+    """
+    raw = f"{to_utc_naive(timestamp).isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a page cursor created by encode_cursor.
+
+    Args:
+        cursor (str): Cursor token
+
+    Returns:
+        (timestamp, id) position the cursor points at
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid page cursor.") from e
+
+def dialect_insert(db: Session, model):
+    """
+    Create an INSERT construct for the session's database that supports ON CONFLICT clauses.
+
+    Args:
+        db (Session): Database session
+        model: Mapped class or table to insert into
+
+    Returns:
+        SQLite or PostgreSQL Insert construct
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
@@ -44,9 +44,9 @@ function FoodSearch() {
     setError('');
 
     try {
-      const apiKey = 'DEMO_KEY'; // Replace with your USDA API key
+      // Searched through our backend, which holds the USDA API key and caches results
       const response = await fetch(
-        `https://api.nal.usda.gov/fdc/v1/foods/search?query=${encodeURIComponent(searchQuery)}&api_key=${apiKey}`
+        `${import.meta.env.VITE_API_BASE_URL}/api/v1/foods/usda/search?q=${encodeURIComponent(searchQuery)}`
       );
 
       if (!response.ok) {
@@ -54,7 +54,7 @@ function FoodSearch() {
       }
 
       const data: USDAResponse = await response.json();
-      console.log('Raw USDA API Response:', data); // Log the entire response to inspect the structure
+      console.log('Raw USDA search response:', data); // Log the entire response to inspect the structure
 
       if (data && data.foods && data.foods.length > 0) {
         setFoodData(data);